@@ -6,17 +6,31 @@ from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uvicorn
 import asyncio
+import time
 from datetime import datetime
+import json
 import uuid
 
 from backend.services.rag_service import RAGService
-from backend.services.translation_service import TranslationService
-from backend.services.logging_service import LoggingService
+from backend.services.translation_service import LOCAL_LANGUAGES, TranslationService
+from backend.services.logging_service import LOGS_DIR, LoggingService
 from backend.services.cache_service import CacheService
+from backend.services.coalescing_service import RequestCoalescer
+from backend.services.semantic_cache_service import SemanticCacheService, SEMANTIC_CACHE_ENABLED
+from backend.services.text_normalization import cache_scope, make_cache_key, normalize_question
+from backend.services.queue_worker import OfflineQueueWorker, RAG_QUEUE_WORKER
+from backend.services.warm_cache import CacheWarmer, WARM_CACHE_ON_STARTUP, mine_questions, query_log_paths
+from backend.services import sqlite_store
+from backend.services.metrics_service import REGISTRY, CONTENT_TYPE, METRICS_ENABLED, stage
+from backend.services.tracing_service import PROFILE_SORT_KEYS, SamplingProfiler, TraceBuffer, span, start_trace
+from backend.services.worker_coordination import (
+    API_LEADER_LOCK, API_LEADER_RETRY_SECONDS, API_WORKERS, LeaderLock, memory_samples, process_memory,
+)
 
 app = FastAPI(title="AI Agriculture Advisor API", version="1.0.0")
 
@@ -49,6 +63,74 @@ rag_service = RAGService()
 translation_service = TranslationService()
 logging_service = LoggingService()
 cache_service = CacheService()
+# Optional paraphrase-tolerant tier: maps similar questions onto existing cache keys
+semantic_cache = SemanticCacheService() if SEMANTIC_CACHE_ENABLED else None
+# Coalesces concurrent /chat requests that share a cache key into one RAG call
+request_coalescer = RequestCoalescer()
+# Drains questions queued while the remote was offline and caches their answers
+queue_worker: Optional[OfflineQueueWorker] = None
+# Precomputed answers for the most frequent questions (see warm_cache.py); built at startup
+cache_warmer: Optional[CacheWarmer] = None
+# Held by the one worker process that runs the background duties (see worker_coordination.py)
+leader_lock = LeaderLock(API_LEADER_LOCK)
+_election_task: Optional[asyncio.Task] = None
+
+# Metrics (see /metrics); per-stage latencies go to pipeline_stage_seconds via `stage()`
+CHAT_RESPONSES = REGISTRY.counter("chat_responses_total", "Answered /chat requests by backend", ["backend", "from_cache"])
+CHAT_LANGUAGES = REGISTRY.counter("chat_detected_language_total", "Answered /chat requests by detected language", ["language"])
+# Per-request traces (slowest / recent kept for /debug/traces) and 1-in-N cProfile sampling
+trace_buffer = TraceBuffer()
+profiler = SamplingProfiler()
+HTTP_SECONDS = REGISTRY.histogram("http_request_seconds", "End-to-end request latency", ["path", "status"])
+
+
+def _cache_samples():
+    stats = cache_service.stats()
+    tiers = [("memory", stats["memory"]), ("sqlite", stats["sqlite"])]
+    if semantic_cache is not None:
+        tiers.append(("semantic", semantic_cache.stats()))
+    tiers.append(("translation", translation_service.stats()))
+    for tier, tier_stats in tiers:
+        yield {"tier": tier, "result": "hit"}, tier_stats["hits"]
+        yield {"tier": tier, "result": "miss"}, tier_stats["misses"]
+
+
+REGISTRY.callback("cache_lookups_total", "Cache lookups by tier and result", "counter", _cache_samples, ["tier", "result"])
+REGISTRY.callback("rag_queue_depth", "Questions waiting in the offline queue", "gauge",
+                  lambda: [({}, rag_service.queue_depth())])
+REGISTRY.callback("rag_remote_up", "1 when the endpoint's circuit breaker admits requests", "gauge",
+                  lambda: [({"endpoint": ep.url}, int(ep.breaker.available())) for ep in rag_service.router.endpoints],
+                  ["endpoint"])
+REGISTRY.callback("process_memory_bytes", "This worker's memory: rss, pss, uss (private) and shared", "gauge",
+                  memory_samples, ["kind"])
+REGISTRY.callback("coalesced_requests_total", "/chat requests served by another request's RAG call", "counter",
+                  lambda: [({}, request_coalescer.stats()["coalesced"])])
+
+
+@app.middleware("http")
+async def _time_requests(request, call_next):
+    if not METRICS_ENABLED:
+        return await call_next(request)
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template so unknown URLs cannot blow up the label set
+    path = getattr(request.scope.get("route"), "path", "unmatched")
+    body = getattr(response, "body_iterator", None)
+    if body is None:
+        HTTP_SECONDS.observe(time.perf_counter() - t0, path=path, status=response.status_code)
+        return response
+
+    # call_next returns once the headers are ready; /chat/stream and /ask/stream are only
+    # done when the last chunk is sent (or the client goes away), so time the body too
+    async def _timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            HTTP_SECONDS.observe(time.perf_counter() - t0, path=path, status=response.status_code)
+
+    response.body_iterator = _timed_body()
+    return response
 
 
 @app.on_event("startup")
@@ -64,6 +146,63 @@ async def startup_event():
     except Exception as e:
         # Ensure startup doesn't crash; RAGService already handles fallback, but log anyway
         logging_service.log_error(question_id=None, error=f"RAG initialization failed: {e}")
+    # Mock answers are not worth persisting; warming needs a remote
+    if WARM_CACHE_ON_STARTUP and rag_service.remote_mode:
+        global cache_warmer
+        cache_warmer = CacheWarmer(
+            cache_service, _answer_question, rag_service.corpus_version,
+            lambda: mine_questions(query_log_paths(LOGS_DIR)),
+        )
+        cache_warmer.regenerate = False  # until this worker is elected leader
+        # Warmed answers go to the memory tier before the first request; refresh runs behind
+        await cache_warmer.preload()
+    # With API_WORKERS > 1 the once-per-box duties run in one elected worker
+    global _election_task
+    if not _try_lead():
+        _election_task = asyncio.ensure_future(_elect_leader())
+    if cache_warmer is not None:
+        cache_warmer.start()
+
+
+def _try_lead() -> bool:
+    """Take over queue draining, cache eviction and cache warming if no other worker holds them."""
+    if not leader_lock.try_acquire():
+        return False
+    # Periodic TTL / size eviction of the persistent cache tier
+    cache_service.start_maintenance()
+    global queue_worker
+    if rag_service.remote_mode and RAG_QUEUE_WORKER:
+        queue_worker = OfflineQueueWorker(rag_service, on_result=_complete_queued)
+        queue_worker.start()
+    if cache_warmer is not None:
+        cache_warmer.regenerate = True
+    return True
+
+
+async def _elect_leader() -> None:
+    # The lock is freed by the kernel when the leader exits; the first worker to retry takes over
+    while not _try_lead():
+        await asyncio.sleep(API_LEADER_RETRY_SECONDS)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """FastAPI shutdown: close pooled connections and flush SQLite writes."""
+    if _election_task is not None:
+        _election_task.cancel()
+    cache_service.stop_maintenance()
+    if queue_worker is not None:
+        await queue_worker.stop()
+    if cache_warmer is not None:
+        await cache_warmer.stop()
+    try:
+        await rag_service.close()
+    except Exception as e:
+        logging_service.log_error(question_id=None, error=f"RAG shutdown failed: {e}")
+    await asyncio.to_thread(sqlite_store.close_all)
+    # Flush buffered log records last so shutdown errors above are kept
+    await asyncio.to_thread(logging_service.close)
+    leader_lock.release()
 
 
 # Request/Response models
@@ -103,9 +242,9 @@ async def health_check():
     # include RAG remote/ML information
     ml_online = False
     remote_url = getattr(rag_service, "remote_url", None)
-    # ml_online true if remote_mode and remote_url present
+    # ml_online true if any remote endpoint's circuit breaker admits requests
     try:
-        ml_online = bool(getattr(rag_service, "remote_mode", False)) and bool(remote_url)
+        ml_online = rag_service.remote_online()
     except Exception:
         ml_online = False
     return {
@@ -114,26 +253,189 @@ async def health_check():
         "service": "agri-advisor-api",
         "ml_online": ml_online,
         "remote_url": remote_url,
+        "remote_urls": getattr(rag_service, "remote_urls", []),
     }
 
 
+def _cache_scope(request: ChatRequest, language: str) -> str:
+    """Request parameters a semantic cache hit must match exactly.
+
+    The language is part of it: an Amharic question that embeds close to a
+    cached English one must not get the English answer (or the reverse).
+    """
+    return cache_scope(request.k, request.translate_local, language)
+
+
+NOT_FOUND_ANSWER = "I could not find this information in the documents."
+
+
+def _detect_language(question: str) -> str:
+    with stage("language_detection"):
+        return translation_service.detect_geez_script(question)
+
+
+async def _detect_and_translate(original_question: str, detected_language: Optional[str] = None):
+    """Return (processed_question, translated, detected_language).
+
+    Pass `detected_language` when the caller already detected it (for the cache scope).
+    """
+    # Normalize language before retrieval (demo-safe): detect Ge'ez and translate to English
+    if detected_language is None:
+        detected_language = _detect_language(original_question)
+    if detected_language in LOCAL_LANGUAGES:
+        with stage("translation"):
+            processed = await translation_service.atranslate_to_english(original_question, detected_language)
+        return processed, True, detected_language
+    return original_question, False, detected_language
+
+
+def _format_sources(sources) -> List[dict]:
+    return [
+        {
+            "text": source.get("text", ""),
+            "metadata": source.get("metadata", {})
+        }
+        for source in sources or []
+    ]
+
+
+async def _lookup_cache(original_question: str, cache_key: str, scope: str) -> Optional[dict]:
+    """Exact (normalized) key first, then the optional semantic tier."""
+    with stage("cache_lookup"):
+        cached_response = await cache_service.aget(cache_key)
+        if not cached_response and semantic_cache is not None:
+            match = await semantic_cache.alookup(normalize_question(original_question), scope)
+            if match:
+                cached_response = await cache_service.aget(match[0])
+    return cached_response
+
+
+async def _store_response(original_question: str, cache_key: str, scope: str, response_data: dict) -> None:
+    await cache_service.aset(cache_key, response_data)
+    if semantic_cache is not None:
+        await semantic_cache.aadd(normalize_question(original_question), scope, cache_key)
+
+
+# Placeholder answers that must not be cached (the real answer arrives later)
+UNCACHEABLE_BACKENDS = {"remote-offline", "error"}
+
+
+async def _build_response_data(rag_result, translated: bool, detected_language: str) -> dict:
+    """Turn a RAGService result into the cacheable `/chat` response fields."""
+    # Ensure rag_result is a dict with expected keys (safety)
+    if not isinstance(rag_result, dict):
+        logging_service.log_error(question_id=None, error=f"Unexpected rag_result type: {type(rag_result)}")
+        rag_result = {"answer": "", "sources": [], "backend": "remote-offline", "answer_local": None}
+    # Enforce groundedness: if retrieval returned no sources, answer with a clear refusal
+    # (placeholder answers such as "queued" are passed through)
+    if not rag_result.get("sources") and rag_result.get("backend") not in UNCACHEABLE_BACKENDS:
+        rag_result["answer"] = NOT_FOUND_ANSWER
+
+    # Translate answer back if original was in local language
+    final_answer = rag_result.get("answer") if rag_result.get("answer") is not None else ""
+    if translated and final_answer:
+        with stage("translation"):
+            final_answer = await translation_service.atranslate_from_english(final_answer, detected_language)
+
+    return {
+        "answer": final_answer,
+        "backend": rag_result.get("backend", "mock-rag"),
+        "sources": _format_sources(rag_result.get("sources", [])),
+        "answer_local": rag_result.get("answer_local") if rag_result.get("answer_local") is not None else None,
+    }
+
+
+def _queue_context(original_question: str, cache_key: str, scope: str, translated: bool,
+                   detected_language: str) -> dict:
+    """Stored with a question queued while the remote is offline; see `_complete_queued`."""
+    return {
+        "original_question": original_question,
+        "cache_key": cache_key,
+        "scope": scope,
+        "translated": translated,
+        "detected_language": detected_language,
+    }
+
+
+async def _answer_question(original_question: str, k: int, cache_key: str, scope: str,
+                           detected_language: Optional[str] = None) -> dict:
+    """Run detection, translation and RAG for a question and cache the result.
+
+    Returns the cacheable response fields (without `question_id`) plus the
+    `translated` / `detected_language` flags needed for logging. Shared by all
+    coalesced callers, so it must not depend on any per-request state.
+    """
+    processed_question, translated, detected_language = await _detect_and_translate(
+        original_question, detected_language
+    )
+
+    # Retrieval MUST embed only the clean user question (no system prompt)
+    retrieval_question = processed_question
+
+    # Get RAG response (k is handled and capped inside RAGService). If the
+    # remote is offline the question is queued with what is needed to cache
+    # the eventual answer under this request's key.
+    queue_context = _queue_context(original_question, cache_key, scope, translated, detected_language)
+    with stage("rag_query"):
+        rag_result = await rag_service.query(retrieval_question, k=k, queue_context=queue_context)
+
+    response_data = await _build_response_data(rag_result, translated, detected_language)
+
+    # Cache the response
+    cached = response_data["backend"] not in UNCACHEABLE_BACKENDS
+    if cached:
+        await _store_response(original_question, cache_key, scope, response_data)
+
+    return {
+        "response": response_data,
+        "cached": cached,
+        "translated": translated,
+        "detected_language": detected_language,
+    }
+
+
+async def _complete_queued(context: dict, rag_result: dict) -> None:
+    """Queue worker callback: cache a late answer under the original request's key."""
+    if not context.get("cache_key"):
+        return
+    response_data = await _build_response_data(
+        rag_result, bool(context.get("translated")), context.get("detected_language", "en")
+    )
+    await _store_response(context.get("original_question", ""), context["cache_key"], context.get("scope", ""), response_data)
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
     Main chat endpoint that processes questions through RAG pipeline.
     Supports translation for Amharic and Tigrigna (Ge'ez script).
+
+    Concurrent requests with the same cache key are coalesced: one leader runs
+    the RAG pipeline and the followers reuse its result, each with its own
+    `question_id` and log record.
+
+    Each request is traced (spans for cache, detection, translation, RAG and
+    remote call) and the trace is written into its query log record.
     """
+    question_id = str(uuid.uuid4())
+    with start_trace(question_id, "/chat", buffer=trace_buffer, k=request.k) as trace, profiler.maybe_profile():
+        return await _chat(request, question_id, trace)
+
+
+async def _chat(request: ChatRequest, question_id: str, trace) -> ChatResponse:
     try:
-        question_id = str(uuid.uuid4())
         original_question = request.question
-        processed_question = original_question
         translated = False
         detected_language = "en"
         
-        # Check cache first
-        cache_key = f"{original_question}_{request.k}_{request.translate_local}"
-        cached_response = cache_service.get(cache_key)
+        # Check cache first: exact (normalized) key, then the optional semantic tier
+        cache_key = make_cache_key(original_question, request.k, request.translate_local)
+        # Detection is a cheap script scan; the semantic tier only matches within one language
+        detected_language = _detect_language(original_question)
+        scope = _cache_scope(request, detected_language)
+        cached_response = await _lookup_cache(original_question, cache_key, scope)
         if cached_response:
+            translated = detected_language in LOCAL_LANGUAGES
             logging_service.log_query(
                 question_id=question_id,
                 question=original_question,
@@ -142,84 +444,56 @@ async def chat(request: ChatRequest):
                 backend=cached_response["backend"],
                 translated=translated,
                 detected_language=detected_language,
-                from_cache=True
-            )
-            return ChatResponse(
-                answer=cached_response["answer"],
-                backend=cached_response["backend"],
-                sources=[Source(**s) for s in cached_response["sources"]],
-                question_id=question_id
+                from_cache=True,
+                trace=trace.to_dict() if trace is not None else None,
             )
+            CHAT_RESPONSES.inc(backend=cached_response["backend"], from_cache="true")
+            CHAT_LANGUAGES.inc(language=detected_language)
+            with stage("serialization"):
+                return ChatResponse(
+                    answer=cached_response["answer"],
+                    backend=cached_response["backend"],
+                    sources=[Source(**s) for s in cached_response["sources"]],
+                    question_id=question_id
+                )
         
-        # Normalize language before retrieval (demo-safe): detect Ge'ez and translate to English
-        detected_language = translation_service.detect_geez_script(original_question)
-        if detected_language in ["am", "ti"]:
-            processed_question = translation_service.translate_to_english(original_question, detected_language)
-            translated = True
-        
-        # Retrieval MUST embed only the clean user question (no system prompt)
-        retrieval_question = processed_question
-
-        # Get RAG response (k is handled and capped inside RAGService)
-        rag_result = await rag_service.query(retrieval_question, k=request.k)
-
-        # Ensure rag_result is a dict with expected keys (safety)
-        if not isinstance(rag_result, dict):
-            logging_service.log_error(question_id=question_id, error=f"Unexpected rag_result type: {type(rag_result)}")
-            rag_result = {"answer": "", "sources": [], "backend": "remote-offline", "answer_local": None}
-        # Enforce groundedness: if retrieval returned no sources, answer with a clear refusal
-        if not rag_result.get("sources"):
-            rag_result["answer"] = "I could not find this information in the documents."
-
-        # Translate answer back if original was in local language
-        final_answer = rag_result.get("answer") if rag_result.get("answer") is not None else ""
-        if translated and final_answer:
-            final_answer = translation_service.translate_from_english(final_answer, detected_language)
-        
-        # Format sources
-        formatted_sources = [
-            {
-                "text": source.get("text", ""),
-                "metadata": source.get("metadata", {})
-            }
-            for source in rag_result.get("sources", [])
-        ]
-        
-        response_data = {
-            "answer": final_answer,
-            "backend": rag_result.get("backend", "mock-rag"),
-            "sources": formatted_sources,
-            "question_id": question_id,
-            "answer_local": rag_result.get("answer_local") if rag_result.get("answer_local") is not None else None,
-        }
-        
-        # Cache the response
-        cache_service.set(cache_key, response_data)
+        # Followers only see the wait here; the leader's trace gets the pipeline spans
+        with span("answer"):
+            result, coalesced = await request_coalescer.run(
+                cache_key, lambda: _answer_question(original_question, request.k, cache_key, scope, detected_language)
+            )
+        response_data = dict(result["response"], question_id=question_id)
         
         # Log the query
         logging_service.log_query(
             question_id=question_id,
             question=original_question,
-            answer=final_answer,
-            sources=formatted_sources,
-            backend=rag_result.get("backend", "mock-rag"),
-            translated=translated,
-            detected_language=detected_language,
-            from_cache=False
+            answer=response_data["answer"],
+            sources=response_data["sources"],
+            backend=response_data["backend"],
+            translated=result["translated"],
+            detected_language=result["detected_language"],
+            from_cache=False,
+            coalesced=coalesced,
+            trace=trace.to_dict() if trace is not None else None,
         )
+        CHAT_RESPONSES.inc(backend=response_data["backend"], from_cache="false")
+        CHAT_LANGUAGES.inc(language=result["detected_language"])
         
-        return ChatResponse(**response_data)
+        with stage("serialization"):
+            return ChatResponse(**response_data)
         
     except Exception as e:
         # Never return HTTP 500 for /chat; return a safe fallback response
-        logging_service.log_error(question_id=question_id if 'question_id' in locals() else None, error=str(e))
+        logging_service.log_error(question_id=question_id, error=str(e))
         fallback = {
             "answer": "ML service error or internal error. Your question has been queued.",
             "backend": "error",
             "sources": [],
-            "question_id": question_id if 'question_id' in locals() else str(uuid.uuid4()),
+            "question_id": question_id,
             "answer_local": None,
         }
+        CHAT_RESPONSES.inc(backend="error", from_cache="false")
         return ChatResponse(**fallback)
 
 
@@ -233,6 +507,125 @@ async def ask_alias(request: ChatRequest):
     return await chat(request)
 
 
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _chat_events(request: ChatRequest):
+    """SSE stream for `/chat/stream`: meta, sources, token..., done.
+
+    Sources are sent before any answer token so the client can render them
+    while the answer is generated. Answers to translated (Ge'ez) questions are
+    sent as one token after translation back. The assembled answer is cached
+    and logged exactly like `/chat`. Streams are not coalesced.
+    """
+    question_id = str(uuid.uuid4())
+    with start_trace(question_id, "/chat/stream", buffer=trace_buffer, k=request.k) as trace:
+        async for chunk in _stream_events(request, question_id, trace):
+            yield chunk
+
+
+async def _stream_events(request: ChatRequest, question_id: str, trace):
+    original_question = request.question
+    yield _sse("meta", {"question_id": question_id})
+    try:
+        cache_key = make_cache_key(original_question, request.k, request.translate_local)
+        detected_language = _detect_language(original_question)
+        scope = _cache_scope(request, detected_language)
+        cached_response = await _lookup_cache(original_question, cache_key, scope)
+        if cached_response:
+            yield _sse("sources", cached_response["sources"])
+            yield _sse("token", cached_response["answer"])
+            yield _sse("done", {"question_id": question_id, "backend": cached_response["backend"], "from_cache": True})
+            logging_service.log_query(
+                question_id=question_id,
+                question=original_question,
+                answer=cached_response["answer"],
+                sources=cached_response["sources"],
+                backend=cached_response["backend"],
+                from_cache=True,
+                trace=trace.to_dict() if trace is not None else None,
+            )
+            return
+
+        processed_question, translated, detected_language = await _detect_and_translate(
+            original_question, detected_language
+        )
+        sources: List[dict] = []
+        tokens: List[str] = []
+        done: dict = {}
+        first_token = True
+        queue_context = _queue_context(original_question, cache_key, scope, translated, detected_language)
+        async for event in rag_service.query_stream(processed_question, k=request.k, queue_context=queue_context):
+            if first_token and event["event"] == "token" and trace is not None:
+                trace.add_span("time_to_first_token", 0.0, trace.elapsed_ms())
+                first_token = False
+            if event["event"] == "sources":
+                sources = _format_sources(event["data"])
+                yield _sse("sources", sources)
+            elif event["event"] == "token":
+                tokens.append(event["data"])
+                # Answers without sources are settled below; translated ones are sent once translated
+                if sources and not translated:
+                    yield _sse("token", event["data"])
+            elif event["event"] == "done":
+                done = event["data"] or {}
+
+        backend = done.get("backend", "mock-rag")
+        final_answer = "".join(tokens)
+        # Same rule as _build_response_data: placeholders such as "queued" are passed through
+        if not sources and backend not in UNCACHEABLE_BACKENDS:
+            final_answer = NOT_FOUND_ANSWER
+            yield _sse("token", final_answer)
+        elif (translated or not sources) and final_answer:
+            if translated:
+                with stage("translation"):
+                    final_answer = await translation_service.atranslate_from_english(final_answer, detected_language)
+            yield _sse("token", final_answer)
+
+        response_data = {
+            "answer": final_answer,
+            "backend": backend,
+            "sources": sources,
+            "answer_local": done.get("answer_local"),
+        }
+        yield _sse("done", {"question_id": question_id, "backend": response_data["backend"], "from_cache": False})
+
+        if response_data["backend"] not in UNCACHEABLE_BACKENDS:
+            await _store_response(original_question, cache_key, scope, response_data)
+        logging_service.log_query(
+            question_id=question_id,
+            question=original_question,
+            answer=final_answer,
+            sources=sources,
+            backend=response_data["backend"],
+            translated=translated,
+            detected_language=detected_language,
+            from_cache=False,
+            trace=trace.to_dict() if trace is not None else None,
+        )
+    except Exception as e:
+        logging_service.log_error(question_id=question_id, error=str(e))
+        yield _sse("error", {"question_id": question_id, "answer": "ML service error or internal error."})
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming `/chat`: Server-Sent Events with sources first, then answer tokens."""
+    return StreamingResponse(
+        _chat_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/ask/stream")
+async def ask_stream_alias(request: ChatRequest):
+    """Alias of `/chat/stream` matching the remote ML API's `/ask/stream`."""
+    return await chat_stream(request)
+
+
 @app.post("/debug/remote_preview")
 async def debug_remote_preview(question: str, k: int = 3):
     """Hit the remote RAG directly and return raw response (for debugging)."""
@@ -248,10 +641,17 @@ async def debug_remote_preview(question: str, k: int = 3):
 
 @app.post("/debug/flush_queue")
 async def debug_flush_queue(background: BackgroundTasks):
-    """Trigger a background flush of queued requests. Returns immediately."""
+    """Trigger a background flush of queued requests. Returns immediately.
+
+    Wakes the queue worker when it runs; otherwise a one-off worker drains the
+    queue, and its answers are cached like the background worker's.
+    """
     if not rag_service:
         raise HTTPException(status_code=500, detail="RAG service not configured")
-    background.add_task(rag_service.flush_pending_requests)
+    if queue_worker is not None and queue_worker.running:
+        queue_worker.wake()
+        return {"ok": True, "msg": "Queue worker woken"}
+    background.add_task(OfflineQueueWorker(rag_service, on_result=_complete_queued).drain)
     return {"ok": True, "msg": "Flush scheduled"}
 
 
@@ -272,6 +672,38 @@ async def feedback(request: FeedbackRequest):
         raise HTTPException(status_code=500, detail=f"Error storing feedback: {str(e)}")
 
 
+@app.get("/debug/traces")
+async def debug_traces(limit: int = 20, question_id: Optional[str] = None):
+    """Slowest and most recent request traces, or the trace of one `question_id`."""
+    if question_id:
+        trace = trace_buffer.find(question_id)
+        if trace is None:
+            raise HTTPException(status_code=404, detail="Trace not found (only recent and slowest are kept)")
+        return trace
+    return {"slowest": trace_buffer.slowest(limit), "recent": trace_buffer.recent(limit)}
+
+
+@app.get("/debug/profile")
+async def debug_profile(limit: int = 40, sort: str = "cumulative", reset: bool = False):
+    """Aggregated cProfile stats of sampled requests (PROFILE_SAMPLE_RATE=N samples 1 in N)."""
+    if sort not in PROFILE_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key; use one of {sorted(PROFILE_SORT_KEYS)}")
+    report = await asyncio.to_thread(profiler.report, limit, sort)
+    if reset:
+        profiler.reset()
+    return Response(content=report, media_type="text/plain; charset=utf-8")
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of counters, per-stage histograms and queue depth."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    # Callback metrics read SQLite (queue depth); render off the event loop
+    body = await asyncio.to_thread(REGISTRY.render)
+    return Response(content=body, media_type=CONTENT_TYPE)
+
+
 @app.get("/rag_status")
 async def rag_status():
     """Return lightweight status of the RAG service for diagnostics.
@@ -292,12 +724,26 @@ async def rag_status():
             "mock_mode": bool(rag_service.mock_mode),
             "chunks_loaded": len(rag_service.chunk_texts) if getattr(rag_service, "chunk_texts", None) is not None else 0,
             "index_count": idx_count,
-            "backend": rag_service.backend_name
+            "backend": rag_service.backend_name,
+            "remote": rag_service.router.stats() if rag_service.remote_mode else None,
+            "coalescing": request_coalescer.stats(),
+            "cache": cache_service.stats(),
+            "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+            "translation": translation_service.stats(),
+            "logging": logging_service.stats(),
+            "profiling": profiler.stats(),
+            "queue": await asyncio.to_thread(queue_worker.stats) if queue_worker is not None else None,
+            "warm_cache": cache_warmer.stats() if cache_warmer is not None else None,
+            "worker": {**process_memory(), "leader": leader_lock.held},
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading RAG status: {e}")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if API_WORKERS > 1:
+        # Worker processes import the app by name; each has its own memory cache tier
+        uvicorn.run("backend.app.main:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
 
@@ -0,0 +1,102 @@
+"""Load benchmark: per-request vs micro-batched inference in rag_check.py.
+
+Fires `--requests` questions from evaluation/questions.jsonl at a fixed
+concurrency through the server's `InferenceExecutor` over `answer_batch`.
+It runs twice, first with batches of one (RAG_BATCHING=false), then with
+micro-batching, and reports throughput and latency percentiles for both.
+
+Usage (from backend/scripts, with the data/ directory in place):
+    python bench_batching.py --requests 64 --concurrency 16 --max-batch 8 --max-wait-ms 10 --workers 1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+QUESTIONS_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "evaluation", "questions.jsonl"))
+
+
+def load_questions(path=QUESTIONS_PATH):
+    with open(path, "r", encoding="utf-8") as fh:
+        return [json.loads(line)["question"] for line in fh if line.strip()]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+def run(call, questions, n_requests, concurrency, k):
+    latencies = []
+
+    def one(i):
+        t0 = time.perf_counter()
+        call(questions[i % len(questions)], k)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - t0
+    return {
+        "requests": n_requests,
+        "seconds": elapsed,
+        "throughput_rps": n_requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=None, help="model workers (default RAG_INFER_WORKERS)")
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    os.environ["RAG_BATCHING"] = "false"  # the benchmark builds its own executors
+    import rag_check
+    from inference_executor import RAG_INFER_WORKERS, InferenceExecutor
+
+    questions = load_questions()
+    rag_check.answer_with_sources(questions[0], args.k)  # warm-up
+    workers = args.workers or RAG_INFER_WORKERS
+
+    def executor(max_batch, max_wait_ms):
+        # Queue as deep as the concurrency: the benchmark measures throughput, not admission control
+        return InferenceExecutor(rag_check.answer_batch, workers=workers, max_queue=args.concurrency,
+                                 max_batch_size=max_batch, max_wait_ms=max_wait_ms, name="bench-infer")
+
+    single = executor(1, 0.0)
+    baseline = run(lambda q, k: single.submit((q, k)).result(), questions, args.requests, args.concurrency, args.k)
+
+    batching = executor(args.max_batch, args.max_wait_ms)
+    batched = run(lambda q, k: batching.submit((q, k)).result(), questions, args.requests, args.concurrency, args.k)
+    batched["avg_batch_size"] = batching.stats()["avg_batch_size"]
+
+    results = {"config": vars(args), "unbatched": baseline, "batched": batched,
+               "speedup": batched["throughput_rps"] / baseline["throughput_rps"]}
+    for name in ("unbatched", "batched"):
+        r = results[name]
+        print(f"{name:<10} {r['throughput_rps']:.2f} req/s  p50 {r['p50_ms']:.0f} ms  p95 {r['p95_ms']:.0f} ms")
+    print(f"speedup    {results['speedup']:.2f}x  (avg batch {batched['avg_batch_size']:.1f})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Startup benchmark for the local RAG server.
+
+Measures, each in a fresh interpreter:
+
+- import:           `import rag_check` (heavy libraries are deferred)
+- eager_load:       import + loading every component synchronously, i.e. what
+                    the server cost before `/health` could answer previously
+- time_to_health:   uvicorn start until `/health` returns 200
+- time_to_ready:    uvicorn start until `/ready` returns 200 (background load)
+
+Usage (from backend/scripts):
+    python bench_startup.py --port 8765 [--json startup.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _timed_python(code: str) -> float:
+    out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _wait_for(url: str, deadline: float) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return time.perf_counter() - t0
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    results = {
+        "import_s": _timed_python(
+            "import time; t=time.perf_counter(); import rag_check; print(time.perf_counter()-t)"),
+        "eager_load_s": _timed_python(
+            "import time; t=time.perf_counter(); import rag_check; rag_check.components.load_all(); "
+            "print(time.perf_counter()-t)"),
+    }
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "rag_check:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BASE_DIR,
+    )
+    try:
+        t0 = time.perf_counter()
+        results["time_to_health_s"] = _wait_for(f"http://127.0.0.1:{args.port}/health", args.timeout)
+        _wait_for(f"http://127.0.0.1:{args.port}/ready", args.timeout)
+        results["time_to_ready_s"] = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    for key, value in results.items():
+        print(f"{key:<18} {value:8.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Sparse BM25 index over chunks.jsonl for hybrid retrieval.
+
+Dense embeddings blur exact names (teff varieties such as Quncho, fertilizer
+products such as NPS / DAP); BM25 matches them literally. The index is built
+offline as a CSR inverted index. The per-(term, chunk) BM25 weight is
+precomputed at build time. So a query gathers the postings of its terms and
+sums them per chunk with one `np.bincount`, with no per-document work in
+Python.
+
+Layout of an index directory (arrays are opened with mmap):
+
+    manifest.json      count, avgdl, k1, b, source file stamp
+    vocab.json         terms, in term-id order
+    indptr.npy         int64[V + 1] posting offsets per term
+    doc_ids.npy        int32[nnz] chunk ids, grouped by term
+    weights.npy        float32[nnz] BM25 term weight of that chunk
+
+Chunk ids are line numbers in chunks.jsonl, the same ids as the FAISS index
+and the chunk store. `rrf_fuse` merges ranked id lists with reciprocal-rank
+fusion.
+
+Build once with `python bm25_index.py build`. When hybrid retrieval is on,
+rag_check.py also builds the index on first start if it is missing or older
+than chunks.jsonl.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
+for _path in (BASE_DIR, ROOT_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from chunk_store import CHUNKS_PATH, DATA_DIR, _iter_chunks, _stamp
+from backend.services.text_normalization import normalize_question
+
+INDEX_DIR = os.path.join(DATA_DIR, "bm25")
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or should "
+    "that the their this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized words (case, punctuation, Ge'ez spelling variants folded), minus stopwords."""
+    return [t for t in normalize_question(text).split() if t not in STOPWORDS]
+
+
+def build_bm25_index(chunks_path: str = CHUNKS_PATH, out_dir: str = INDEX_DIR,
+                     k1: float = 1.5, b: float = 0.75) -> str:
+    """Tokenize chunks.jsonl and write the CSR index to `out_dir` (atomically)."""
+    vocab: Dict[str, int] = {}
+    term_ids: List[int] = []
+    doc_ids: List[int] = []
+    tfs: List[int] = []
+    lengths: List[int] = []
+    for doc, chunk in enumerate(_iter_chunks(chunks_path)):
+        tokens = tokenize(chunk.get("text", ""))
+        lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_ids.append(doc)
+            tfs.append(tf)
+
+    n_docs = len(lengths)
+    term_arr = np.asarray(term_ids, dtype=np.int64)
+    doc_arr = np.asarray(doc_ids, dtype=np.int32)
+    tf_arr = np.asarray(tfs, dtype=np.float32)
+    dl = np.asarray(lengths, dtype=np.float32)
+    avgdl = float(dl.mean()) if n_docs else 0.0
+
+    df = np.bincount(term_arr, minlength=len(vocab)).astype(np.float32)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * dl[doc_arr] / (avgdl or 1.0))
+    weights = (idf[term_arr] * tf_arr * (k1 + 1) / (tf_arr + norm)).astype(np.float32)
+
+    order = np.argsort(term_arr, kind="stable")  # keeps chunk ids ascending within a term
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(df.astype(np.int64), out=indptr[1:])
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".bm25-", dir=parent)
+    try:
+        np.save(os.path.join(tmp, "indptr.npy"), indptr)
+        np.save(os.path.join(tmp, "doc_ids.npy"), doc_arr[order])
+        np.save(os.path.join(tmp, "weights.npy"), weights[order])
+        with open(os.path.join(tmp, "vocab.json"), "w", encoding="utf-8") as fh:
+            json.dump(sorted(vocab, key=vocab.get), fh, ensure_ascii=False)
+        manifest = {
+            "version": FORMAT_VERSION,
+            "count": n_docs,
+            "terms": len(vocab),
+            "postings": int(len(doc_arr)),
+            "avgdl": avgdl,
+            "k1": k1,
+            "b": b,
+            "sources": {"chunks": _stamp(chunks_path)},
+        }
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, ensure_ascii=False, indent=2)
+        if os.path.exists(out_dir):
+            old = out_dir + ".old"
+            shutil.rmtree(old, ignore_errors=True)
+            os.rename(out_dir, old)
+            os.rename(tmp, out_dir)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.rename(tmp, out_dir)
+        return out_dir
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def is_stale(index_dir: str = INDEX_DIR, chunks_path: str = CHUNKS_PATH) -> bool:
+    try:
+        with open(os.path.join(index_dir, MANIFEST), "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return True
+    if manifest.get("version") != FORMAT_VERSION:
+        return True
+    return manifest.get("sources", {}).get("chunks") != _stamp(chunks_path)
+
+
+class BM25Index:
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST), "r", encoding="utf-8") as fh:
+            self.manifest = json.load(fh)
+        with open(os.path.join(index_dir, "vocab.json"), "r", encoding="utf-8") as fh:
+            self.vocab = {term: i for i, term in enumerate(json.load(fh))}
+        self.indptr = np.load(os.path.join(index_dir, "indptr.npy"), mmap_mode="r")
+        self.doc_ids = np.load(os.path.join(index_dir, "doc_ids.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(index_dir, "weights.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return int(self.manifest["count"])
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for `query` (float32[count])."""
+        terms = [self.vocab[t] for t in tokenize(query) if t in self.vocab]
+        if not terms:
+            return np.zeros(len(self), dtype=np.float32)
+        # Repeated query terms count once per occurrence, as in the BM25 sum
+        ids = np.concatenate([self.doc_ids[self.indptr[t]:self.indptr[t + 1]] for t in terms])
+        w = np.concatenate([self.weights[self.indptr[t]:self.indptr[t + 1]] for t in terms])
+        return np.bincount(ids, weights=w, minlength=len(self)).astype(np.float32)
+
+    def search(self, query: str, k: int) -> Tuple[List[int], List[float]]:
+        """Top-k chunk ids with a positive score, best first."""
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k <= 0:
+            return [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[scores[top] > 0]
+        return [int(i) for i in top], [float(s) for s in scores[top]]
+
+    def search_batch(self, queries: Sequence[str], k: int) -> List[List[int]]:
+        return [self.search(q, k)[0] for q in queries]
+
+
+def open_bm25_index(index_dir: str = INDEX_DIR, chunks_path: str = CHUNKS_PATH) -> BM25Index:
+    """Open the index, (re)building it first when missing or stale."""
+    if is_stale(index_dir, chunks_path):
+        build_bm25_index(chunks_path, index_dir)
+    return BM25Index(index_dir)
+
+
+def rrf_fuse(rankings: Iterable[Sequence[int]], k: int, rrf_k: int = 60) -> List[int]:
+    """Reciprocal-rank fusion: score(id) = sum over rankings of 1 / (rrf_k + rank)."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking, start=1):
+            scores[idx] = scores.get(idx, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda i: (-scores[i], i))[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="build the BM25 inverted index from chunks.jsonl")
+    b.add_argument("--chunks", default=CHUNKS_PATH)
+    b.add_argument("--out", default=INDEX_DIR)
+    b.add_argument("--k1", type=float, default=1.5)
+    b.add_argument("--b", type=float, default=0.75)
+    q = sub.add_parser("query", help="top-k chunk ids and scores for a question")
+    q.add_argument("question")
+    q.add_argument("--index", default=INDEX_DIR)
+    q.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        out = build_bm25_index(args.chunks, args.out, args.k1, args.b)
+        m = BM25Index(out).manifest
+        size = sum(os.path.getsize(os.path.join(out, f)) for f in os.listdir(out))
+        print(f"indexed {m['count']} chunks, {m['terms']} terms, {m['postings']} postings, "
+              f"{size / 1e6:.1f} MB in {time.perf_counter() - t0:.1f}s -> {out}")
+    else:
+        index = BM25Index(args.index)
+        t0 = time.perf_counter()
+        ids, scores = index.search(args.question, args.k)
+        print(f"{(time.perf_counter() - t0) * 1000:.2f} ms")
+        for i, s in zip(ids, scores):
+            print(f"{i:>8} {s:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Memory-mapped chunk store for the local RAG server.
+
+Replaces the in-RAM `chunk_texts` list and the pickled metadata with a compact
+on-disk layout that is opened with mmap and decoded lazily, only for the
+top-k hits. Pages live in the OS page cache, so every worker process on the
+box shares one copy.
+
+Layout of a store directory:
+
+    manifest.json            count, metadata columns, source file stamps
+    texts.offsets.npy        uint64[count + 1] byte offsets into texts.bin
+    texts.bin                UTF-8 chunk texts, concatenated
+    meta.<col>.offsets.npy   uint64[count + 1] offsets into meta.<col>.bin
+    meta.<col>.bin           JSON-encoded values (empty = key absent)
+
+Build once with `python chunk_store.py build` (rag_check.py also builds it on
+first start when it is missing or older than chunks.jsonl / metadata.pkl).
+"""
+import argparse
+import json
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CHUNKS_PATH = os.path.join(DATA_DIR, "chunks", "chunks.jsonl")
+METADATA_PATH = os.path.join(DATA_DIR, "vectorstore", "metadata.pkl")
+STORE_DIR = os.path.join(DATA_DIR, "chunkstore")
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def _stamp(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def _safe_column(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(name))
+
+
+class _ColumnWriter:
+    def __init__(self, directory: str, prefix: str):
+        self.blob = open(os.path.join(directory, f"{prefix}.bin"), "wb")
+        self.offsets_path = os.path.join(directory, f"{prefix}.offsets.npy")
+        self.offsets: List[int] = [0]
+
+    def append(self, data: bytes) -> None:
+        self.blob.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self) -> None:
+        self.blob.close()
+        np.save(self.offsets_path, np.asarray(self.offsets, dtype=np.uint64))
+
+
+def _iter_chunks(chunks_path: str) -> Iterable[dict]:
+    with open(chunks_path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_store(records: Iterable[tuple], out_dir: str, sources: Optional[dict] = None) -> str:
+    """Write [(text, metadata_dict), ...] as a store at `out_dir` (atomically)."""
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".chunkstore-", dir=parent)
+    try:
+        texts = _ColumnWriter(tmp, "texts")
+        columns: Dict[str, _ColumnWriter] = {}
+        count = 0
+        for text, meta in records:
+            texts.append((text or "").encode("utf-8"))
+            meta = meta if isinstance(meta, dict) else ({"value": meta} if meta is not None else {})
+            for key in meta:
+                if key not in columns:
+                    col = _ColumnWriter(tmp, f"meta.{_safe_column(key)}")
+                    col.offsets.extend([0] * count)  # earlier rows lack this key
+                    columns[key] = col
+            for key, col in columns.items():
+                col.append(json.dumps(meta[key], ensure_ascii=False).encode("utf-8") if key in meta else b"")
+            count += 1
+        texts.close()
+        for col in columns.values():
+            col.close()
+        manifest = {
+            "version": FORMAT_VERSION,
+            "count": count,
+            "columns": {key: _safe_column(key) for key in columns},
+            "sources": sources or {},
+        }
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, ensure_ascii=False, indent=2)
+
+        # Swap into place; a concurrent builder that got there first wins
+        if os.path.exists(out_dir):
+            old = out_dir + ".old"
+            shutil.rmtree(old, ignore_errors=True)
+            os.rename(out_dir, old)
+            os.rename(tmp, out_dir)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            try:
+                os.rename(tmp, out_dir)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+        return out_dir
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def build_chunk_store(chunks_path: str = CHUNKS_PATH, metadata_path: str = METADATA_PATH,
+                      out_dir: str = STORE_DIR) -> str:
+    """Convert chunks.jsonl (+ metadata.pkl when present) into a store."""
+    metadatas = None
+    if metadata_path and os.path.exists(metadata_path):
+        with open(metadata_path, "rb") as fh:
+            metadatas = pickle.load(fh)
+
+    def records():
+        for i, chunk in enumerate(_iter_chunks(chunks_path)):
+            if metadatas is not None and i < len(metadatas):
+                meta = metadatas[i]
+            else:
+                meta = {key: value for key, value in chunk.items() if key != "text"}
+            yield chunk.get("text", ""), meta
+
+    sources = {"chunks": _stamp(chunks_path), "metadata": _stamp(metadata_path) if metadata_path else None}
+    return write_store(records(), out_dir, sources)
+
+
+def is_stale(store_dir: str = STORE_DIR, chunks_path: str = CHUNKS_PATH, metadata_path: str = METADATA_PATH) -> bool:
+    """True when the store is missing or was built from different source files."""
+    try:
+        with open(os.path.join(store_dir, MANIFEST), "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return True
+    if manifest.get("version") != FORMAT_VERSION:
+        return True
+    sources = manifest.get("sources", {})
+    metadata = _stamp(metadata_path) if metadata_path else None
+    return sources.get("chunks") != _stamp(chunks_path) or sources.get("metadata") != metadata
+
+
+class _MappedColumn:
+    def __init__(self, directory: str, prefix: str):
+        self.offsets = np.load(os.path.join(directory, f"{prefix}.offsets.npy"), mmap_mode="r")
+        path = os.path.join(directory, f"{prefix}.bin")
+        self._fh = open(path, "rb")
+        # mmap of an empty file is not allowed
+        self.blob = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    def get(self, i: int) -> bytes:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.blob[start:end]
+
+    def close(self) -> None:
+        if isinstance(self.blob, mmap.mmap):
+            self.blob.close()
+        self._fh.close()
+
+
+class ChunkStore:
+    """Read-only, lazily decoded view of a chunk store.
+
+    Behaves like the old `chunk_texts` list (`len(store)`, `store[i]` -> text)
+    and adds `metadata(i)`.
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, MANIFEST), "r", encoding="utf-8") as fh:
+            self.manifest = json.load(fh)
+        self._texts = _MappedColumn(store_dir, "texts")
+        self._columns = {key: _MappedColumn(store_dir, f"meta.{name}")
+                         for key, name in self.manifest["columns"].items()}
+
+    def __len__(self) -> int:
+        return int(self.manifest["count"])
+
+    def __getitem__(self, i: int) -> str:
+        return self.text(i)
+
+    def text(self, i: int) -> str:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._texts.get(i).decode("utf-8")
+
+    def metadata(self, i: int) -> dict:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        meta = {}
+        for key, col in self._columns.items():
+            raw = col.get(i)
+            if raw:
+                meta[key] = json.loads(raw)
+        return meta
+
+    def close(self) -> None:
+        self._texts.close()
+        for col in self._columns.values():
+            col.close()
+
+
+def open_chunk_store(store_dir: str = STORE_DIR, chunks_path: str = CHUNKS_PATH,
+                     metadata_path: str = METADATA_PATH) -> ChunkStore:
+    """Open the store, (re)building it first when missing or stale."""
+    if is_stale(store_dir, chunks_path, metadata_path):
+        build_chunk_store(chunks_path, metadata_path, store_dir)
+    return ChunkStore(store_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="convert chunks.jsonl + metadata.pkl into a chunk store")
+    b.add_argument("--chunks", default=CHUNKS_PATH)
+    b.add_argument("--metadata", default=METADATA_PATH)
+    b.add_argument("--out", default=STORE_DIR)
+    args = parser.parse_args()
+
+    out = build_chunk_store(args.chunks, args.metadata, args.out)
+    store = ChunkStore(out)
+    size = sum(os.path.getsize(os.path.join(out, f)) for f in os.listdir(out))
+    print(f"wrote {len(store)} chunks, {len(store.manifest['columns'])} metadata columns, "
+          f"{size / 1e6:.1f} MB -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Staged, lazily loaded components for the local RAG server.
+
+Each component (index, chunks, embedder, generator, translator) has a loader
+that does its own heavy imports, so importing rag_check.py is cheap and
+`/health` answers immediately. Components are loaded either in a background
+thread at startup or on first use; callers that need one before it is ready
+block until its load finishes. Per-component state and load time are exposed
+for the readiness endpoint. `thread_load_seconds()` tells a caller how long
+its own thread has spent loading or waiting for components, so timings (the
+inference executor's batch estimate) can leave that one-off cost out.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger("rag")
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+_local = threading.local()
+
+
+def thread_load_seconds() -> float:
+    """Seconds the current thread has spent in `Component.get` calls that were not ready yet."""
+    return getattr(_local, "seconds", 0.0)
+
+
+class Component:
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self.loader = loader
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self._value: Any = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Return the loaded value, loading it now (or waiting for a load in progress)."""
+        if self.state == READY:
+            return self._value
+        t0 = time.perf_counter()
+        try:
+            with self._lock:
+                if self.state != READY:
+                    self._load()
+                if self.state == FAILED:
+                    raise RuntimeError(f"component {self.name!r} failed to load: {self.error}")
+                return self._value
+        finally:
+            _local.seconds = thread_load_seconds() + time.perf_counter() - t0
+
+    def _load(self) -> None:
+        self.state = LOADING
+        t0 = time.perf_counter()
+        try:
+            self._value = self.loader()
+            self.state = READY
+            self.error = None
+        except Exception as e:
+            self.state = FAILED
+            self.error = str(e)
+            logger.exception(f"loading {self.name} failed")
+        self.seconds = time.perf_counter() - t0
+        if self.state == READY:
+            logger.info(f"{self.name} ready in {self.seconds:.2f}s")
+
+    def set(self, value: Any) -> None:
+        """Install a value directly (stand-ins, hot swaps)."""
+        with self._lock:
+            self._value = value
+            self.state = READY
+            self.error = None
+
+    def status(self) -> dict:
+        return {"state": self.state, "seconds": self.seconds, "error": self.error}
+
+
+class ComponentRegistry:
+    def __init__(self):
+        self._components: Dict[str, Component] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any]) -> Component:
+        comp = Component(name, loader)
+        self._components[name] = comp
+        return comp
+
+    def __getitem__(self, name: str) -> Component:
+        return self._components[name]
+
+    def get(self, name: str) -> Any:
+        return self._components[name].get()
+
+    def set(self, name: str, value: Any) -> None:
+        self._components[name].set(value)
+
+    def load_all(self, names: Optional[Iterable[str]] = None) -> None:
+        for name in names or list(self._components):
+            try:
+                self._components[name].get()
+            except Exception:
+                pass  # recorded in the component status
+
+    def start_background(self, names: Optional[Iterable[str]] = None) -> None:
+        """Load components in order in a daemon thread (idempotent)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.load_all, args=(names,), name="rag-loader", daemon=True)
+        self._thread.start()
+
+    def ready(self, names: Optional[Iterable[str]] = None) -> bool:
+        return all(self._components[n].state == READY for n in (names or self._components))
+
+    def status(self) -> dict:
+        return {name: comp.status() for name, comp in self._components.items()}
@@ -0,0 +1,123 @@
+"""Context assembly for the local RAG server: dedup, sentence selection, token budget.
+
+Before, the prompt was the full top-k chunks joined together, and the
+tokenizer cut the end off at `max_length`. For each question this module:
+
+1. drops chunks whose word trigrams are mostly (>= `dedup_threshold`)
+   covered by higher-ranked chunks, since overlapping chunking windows repeat text;
+2. splits the rest into sentences (Latin and Ethiopic punctuation) and drops
+   repeated sentences;
+3. scores each sentence by cosine similarity to the query embedding (one
+   batched encode over every sentence of every question);
+4. greedily packs the best sentences into `budget` tokens, at most
+   `max_sentences` per chunk, and emits them per chunk in retrieval order and
+   original sentence order, so each context still reads as a passage.
+
+Embedding and token counting are passed in as callables, so the module has no
+model dependency.
+"""
+import re
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+from backend.services.text_normalization import normalize_question
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?።፧])\s+|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text or "") if s and s.strip()]
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = normalize_question(text).split()
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def dedup_chunks(texts: Sequence[str], threshold: float = 0.8) -> List[int]:
+    """Indexes of the chunks to keep (in order); later near-duplicates are dropped."""
+    seen: set = set()
+    keep = []
+    for i, text in enumerate(texts):
+        sh = _shingles(text)
+        if sh and len(sh & seen) / len(sh) >= threshold:
+            continue
+        seen |= sh
+        keep.append(i)
+    return keep
+
+
+def _unit(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def build_contexts(query_vecs: np.ndarray, chunk_lists: Sequence[Sequence[str]],
+                   embed_fn: Callable[[List[str]], np.ndarray],
+                   count_tokens: Callable[[List[str]], List[int]],
+                   budget: int = 400, max_sentences: int = 4, dedup_threshold: float = 0.8) -> List[dict]:
+    """Pack each question's retrieved chunks into at most `budget` tokens.
+
+    Returns one dict per question:
+        contexts      packed passages, one per chunk that kept a sentence
+        tokens        tokens in the packed passages
+        tokens_full   tokens in the original chunks (what was fed before)
+        chunks_dropped  near-duplicate chunks removed
+    """
+    # Flatten every candidate sentence of every question for one encode / count
+    plans = []
+    sentences: List[str] = []
+    for chunks in chunk_lists:
+        keep = dedup_chunks(chunks, dedup_threshold)
+        seen = set()
+        rows = []  # (chunk_rank, position, flat index)
+        for rank in keep:
+            for pos, sentence in enumerate(split_sentences(chunks[rank])):
+                key = normalize_question(sentence)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                rows.append((rank, pos, len(sentences)))
+                sentences.append(sentence)
+        plans.append((keep, rows))
+
+    full_counts = count_tokens([c for chunks in chunk_lists for c in chunks]) if chunk_lists else []
+    if sentences:
+        sentence_counts = count_tokens(sentences)
+        scores = (_unit(np.asarray(embed_fn(sentences), dtype="float32")) @
+                  _unit(np.asarray(query_vecs, dtype="float32")).T)
+    else:
+        sentence_counts, scores = [], np.zeros((0, len(chunk_lists)), dtype="float32")
+
+    results = []
+    offset = 0
+    for q, (chunks, (keep, rows)) in enumerate(zip(chunk_lists, plans)):
+        tokens_full = int(sum(full_counts[offset:offset + len(chunks)]))
+        offset += len(chunks)
+        chosen, per_chunk, used = [], {}, 0
+        for rank, pos, flat in sorted(rows, key=lambda r: -scores[r[2], q]):
+            cost = sentence_counts[flat]
+            if per_chunk.get(rank, 0) >= max_sentences:
+                continue
+            # The best sentence always goes in, even over budget (tokenizer truncation still applies)
+            if chosen and used + cost > budget:
+                continue
+            chosen.append((rank, pos, flat))
+            per_chunk[rank] = per_chunk.get(rank, 0) + 1
+            used += cost
+        contexts = []
+        for rank in keep:
+            picked = sorted((pos, flat) for r, pos, flat in chosen if r == rank)
+            if picked:
+                contexts.append(" ".join(sentences[flat] for _, flat in picked))
+        results.append({
+            "contexts": contexts,
+            "tokens": int(used),
+            "tokens_full": tokens_full,
+            "chunks_dropped": len(chunks) - len(keep),
+        })
+    return results
@@ -0,0 +1,152 @@
+"""Query-embedding cache for the local RAG server.
+
+Query embeddings are kept in one preallocated float32 matrix (`capacity` x
+`dim`). An LRU-ordered dict maps the normalized question (see
+`backend/services/text_normalization.py`, so case / punctuation / Ge'ez
+spelling variants share a slot) to its row. Evicting the least recently used
+key frees its row for the next miss, so memory stays fixed after the first
+`capacity` misses.
+
+`encode(texts, encode_fn)` answers hits from the matrix and encodes only the
+misses, de-duplicated, in one batched `encode_fn` call. The cache can be saved
+to an `.npz` file (written atomically) and loaded at startup, so a restart
+keeps the popular queries. A file written for a different embedding model or
+dimension is ignored.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from backend.services.text_normalization import normalize_question
+
+
+class EmbeddingCache:
+    def __init__(self, capacity: int, model_name: str = "", path: Optional[str] = None):
+        self.capacity = max(1, int(capacity))
+        self.model_name = model_name
+        self.path = path
+        self._vectors: Optional[np.ndarray] = None  # allocated once the dimension is known
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @staticmethod
+    def key(text: str) -> str:
+        return normalize_question(text)
+
+    def _allocate(self, dim: int) -> None:
+        self._vectors = np.zeros((self.capacity, dim), dtype="float32")
+        self._free = list(range(self.capacity - 1, -1, -1))
+
+    def _put(self, key: str, vector: np.ndarray) -> None:
+        if self._vectors is None:
+            self._allocate(vector.shape[-1])
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                _, slot = self._slots.popitem(last=False)
+                self.evictions += 1
+            self._slots[key] = slot
+        else:
+            self._slots.move_to_end(key)
+        self._vectors[slot] = vector
+
+    def encode(self, texts: Sequence[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Embeddings for `texts` (float32, one row each); misses go through `encode_fn` once."""
+        keys = [self.key(t) for t in texts]
+        hit_rows, miss_rows = {}, {}
+        with self._lock:
+            for row, key in enumerate(keys):
+                slot = self._slots.get(key)
+                if slot is not None:
+                    self._slots.move_to_end(key)
+                    hit_rows[row] = self._vectors[slot].copy()
+                else:
+                    # First text seen for a key is the one encoded
+                    miss_rows.setdefault(key, texts[row])
+            self.hits += len(hit_rows)
+            self.misses += len(keys) - len(hit_rows)
+
+        encoded = {}
+        if miss_rows:
+            t0 = time.perf_counter()
+            vectors = np.asarray(encode_fn(list(miss_rows.values())), dtype="float32")
+            elapsed = time.perf_counter() - t0
+            encoded = dict(zip(miss_rows.keys(), vectors))
+            with self._lock:
+                self.encoded += len(miss_rows)
+                self.encode_seconds += elapsed
+                for key, vector in encoded.items():
+                    self._put(key, vector)
+
+        return np.stack([hit_rows[row] if row in hit_rows else encoded[keys[row]] for row in range(len(keys))])
+
+    def seconds_saved(self) -> float:
+        """Estimated encode time avoided: hits x mean encode time per text."""
+        return self.hits * (self.encode_seconds / self.encoded) if self.encoded else 0.0
+
+    # Persistence
+    def save(self, path: Optional[str] = None) -> Optional[str]:
+        path = path or self.path
+        if not path:
+            return None
+        with self._lock:
+            if self._vectors is None or not self._slots:
+                return None
+            keys = list(self._slots.keys())  # least recently used first
+            vectors = self._vectors[list(self._slots.values())]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"  # pre-forked workers save on shutdown concurrently
+        np.savez(tmp, keys=np.array(keys), vectors=vectors, model=np.array(self.model_name))
+        os.replace(tmp, path)
+        return path
+
+    def load(self, path: Optional[str] = None) -> int:
+        """Load a saved cache; returns the number of entries restored (0 when missing or stale)."""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["model"]) != self.model_name:
+                    return 0
+                keys, vectors = data["keys"].tolist(), data["vectors"].astype("float32")
+        except Exception:
+            return 0
+        with self._lock:
+            if self._vectors is not None and self._vectors.shape[1] != vectors.shape[1]:
+                return 0
+            # Most recent entries last, so they survive if capacity shrank
+            for key, vector in list(zip(keys, vectors))[-self.capacity:]:
+                self._put(key, vector)
+        return min(len(keys), self.capacity)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._slots),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "encoded": self.encoded,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "encode_seconds_saved": round(self.seconds_saved(), 3),
+            "bytes": int(self._vectors.nbytes) if self._vectors is not None else 0,
+            "path": self.path,
+        }
@@ -0,0 +1,383 @@
+"""Offline retrieval + generation evaluation over evaluation/questions.jsonl.
+
+Embeds every labeled question in one batch and runs one batched FAISS search
+against the index rag_check.py loads (RAG_INDEX_TYPE etc. apply), then
+generates answers in batches grouped by (crop, language). Reports, overall
+and per crop / per language:
+
+- speed: embed, search, context assembly and generate time per question
+  (batch time / size)
+- context tokens: packed into the prompt (`tokens`) vs the full retrieved
+  chunks (`full`); packing is off unless RAG_CONTEXT_TOKENS is set
+- quality proxies (no gold answers exist, so these are heuristics):
+    context_kw   share of the question's keywords found in the retrieved chunks
+    crop_prec    share of retrieved chunks that mention the question's crop
+    answer_kw    share of the question's keywords found in the answer
+    packed_kw    share of the question's keywords kept in the packed context
+    grounding    share of the answer's keywords found in the retrieved chunks
+    not_found    share of questions answered with "No relevant documents found."
+
+With `--baseline previous.json` it also reports, per question, the overlap of
+retrieved chunk ids and the token F1 of answers against the earlier run, and
+the change in context tokens and generate time. That is the check that an
+index, caching or prompt speedup did not change what the system retrieves and
+answers.
+
+Runs offline on CPU: when the embedding / generation models or the FAISS
+index are unavailable, a hashing embedder (flat index built in memory over the
+chunk store) and an extractive generator are used instead (`--embedder`,
+`--generator` force a choice).
+
+Usage (from backend/scripts):
+    python evaluate_rag.py --k 5 --json eval_flat.json
+    RAG_INDEX_TYPE=ivf_pq RAG_NPROBE=8 python evaluate_rag.py --baseline eval_flat.json
+    python evaluate_rag.py --hybrid --k 3 --baseline eval_flat.json
+    python evaluate_rag.py --json eval_full.json && RAG_CONTEXT_TOKENS=400 python evaluate_rag.py --baseline eval_full.json
+    python evaluate_rag.py --embedder hashing --generator extractive --chunks /path/to/chunks.jsonl
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+QUESTIONS_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "evaluation", "questions.jsonl"))
+
+NOT_FOUND = "No relevant documents found."
+STOPWORDS = {
+    "the", "and", "for", "are", "what", "which", "when", "how", "does", "can", "should", "with", "from",
+    "that", "this", "best", "main", "into", "their", "there", "have", "has", "its", "about", "you", "your",
+    "use", "used", "grow", "growing", "ethiopia", "ethiopian", "farmers", "farmer", "will", "would", "is",
+    "in", "of", "to", "on", "a", "an", "do", "i", "it", "be", "by", "or", "at", "as",
+}
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?።])\s+")
+
+
+def load_questions(path=QUESTIONS_PATH):
+    with open(path, "r", encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def keywords(text: str) -> set:
+    return {w for w in _WORD_RE.findall(text.lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def share(part: set, whole: set) -> float:
+    return len(part & whole) / len(whole) if whole else 0.0
+
+
+def token_f1(a: str, b: str) -> float:
+    ta, tb = _WORD_RE.findall(a.lower()), _WORD_RE.findall(b.lower())
+    if not ta or not tb:
+        return float(ta == tb)
+    common = sum(min(ta.count(w), tb.count(w)) for w in set(ta))
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(ta), common / len(tb)
+    return 2 * precision * recall / (precision + recall)
+
+
+# ---------------- STAND-INS ----------------
+class HashingEncoder:
+    """SentenceTransformer-like `encode` over the dependency-free hashing embedder."""
+
+    def __init__(self, dim: int = 512):
+        from backend.services.semantic_cache_service import HashingEmbedder
+
+        self._embedder = HashingEmbedder(dim)
+
+    def encode(self, texts, **kwargs):
+        return self._embedder.encode(list(texts))
+
+
+def extractive_generate(questions, id_lists, packed, max_sentences: int = 2):
+    """Stand-in generator: the context sentences sharing the most question keywords."""
+    answers = []
+    for question, ids, p in zip(questions, id_lists, packed):
+        if not ids:
+            answers.append(NOT_FOUND)
+            continue
+        q_kw = keywords(question)
+        sentences = [s for c in p["contexts"] for s in _SENTENCE_RE.split(c) if s.strip()]
+        ranked = sorted(sentences, key=lambda s: len(q_kw & keywords(s)), reverse=True)
+        answers.append(" ".join(ranked[:max_sentences]))
+    return answers
+
+
+def _ensure_chunks(rag_check, chunks_path):
+    if chunks_path:
+        from chunk_store import ChunkStore, build_chunk_store
+
+        tmp = tempfile.mkdtemp(prefix="eval-")
+        store_dir = build_chunk_store(chunks_path, None, os.path.join(tmp, "chunkstore"))
+        rag_check.components.set("chunks", ChunkStore(store_dir))
+        if rag_check.RAG_HYBRID:
+            from bm25_index import open_bm25_index
+
+            rag_check.components.set("bm25", open_bm25_index(os.path.join(tmp, "bm25"), chunks_path))
+    return rag_check.get_chunks()
+
+
+def setup_components(rag_check, embedder_mode: str, chunks_path=None) -> dict:
+    """Install stand-ins where real components are unavailable; returns what is used."""
+    import faiss
+
+    chunks = _ensure_chunks(rag_check, chunks_path)
+    used = {"chunks": len(chunks)}
+
+    real_embedder = embedder_mode in ("auto", "model")
+    if real_embedder:
+        try:
+            rag_check.get_embedder()
+        except Exception as e:
+            if embedder_mode == "model":
+                raise
+            print(f"embedding model unavailable ({e}); using the hashing stand-in")
+            real_embedder = False
+    if not real_embedder:
+        rag_check.components.set("embedder", HashingEncoder())
+    used["embedder"] = rag_check.EMBED_MODEL if real_embedder else "hashing"
+
+    index = None
+    if real_embedder and not chunks_path:
+        try:
+            index = rag_check.get_index()
+            used["index"] = rag_check.RAG_INDEX_TYPE
+        except Exception as e:
+            print(f"FAISS index unavailable ({e}); building a flat index in memory")
+    if index is None:
+        texts = [chunks.text(i) for i in range(len(chunks))]
+        vectors = rag_check.get_embedder().encode(texts, convert_to_numpy=True, batch_size=64).astype("float32")
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        rag_check.components.set("index", index)
+        used["index"] = "flat (in-memory)"
+    return used
+
+
+def pick_generator(rag_check, mode: str):
+    if mode in ("auto", "model"):
+        try:
+            rag_check.get_generator()
+            return rag_check.GEN_MODEL, rag_check.generate_batch
+        except Exception as e:
+            if mode == "model":
+                raise
+            print(f"generation model unavailable ({e}); using the extractive stand-in")
+    return "extractive", extractive_generate
+
+
+# ---------------- EVALUATION ----------------
+def _span_ms(trace, name: str) -> float:
+    return sum(s["duration_ms"] for s in trace.spans if s["name"] == name) if trace is not None else 0.0
+
+
+def evaluate(rag_check, questions: list, k: int, gen_batch: int, generate) -> dict:
+    from backend.services.tracing_service import span, start_trace
+
+    texts = [q["question"] for q in questions]
+
+    # Headline: every question in one batched encode + search
+    with start_trace(None, "retrieve_all") as trace:
+        id_lists = rag_check.retrieve_ids_batch(texts, [k] * len(texts))
+    overall_timing = {"embed_ms": _span_ms(trace, "embed"), "search_ms": _span_ms(trace, "search"),
+                      "bm25_ms": _span_ms(trace, "bm25")}
+
+    # Per (crop, language) cell: timed batches for the breakdown
+    cells = defaultdict(list)
+    for row, q in enumerate(questions):
+        cells[(q.get("crop", "?"), q.get("language", "?"))].append(row)
+
+    answers = [None] * len(questions)
+    packed = [None] * len(questions)
+    per_row_ms = [dict() for _ in questions]
+    generate_total = context_total = 0.0
+    for rows in cells.values():
+        cell_texts = [texts[r] for r in rows]
+        with start_trace(None, "cell") as trace:
+            rag_check.retrieve_ids_batch(cell_texts, [k] * len(rows))
+        # Hybrid retrieval: search covers dense search, BM25 and fusion
+        embed_ms, search_ms = _span_ms(trace, "embed"), _span_ms(trace, "search") + _span_ms(trace, "bm25")
+        for start in range(0, len(rows), gen_batch):
+            batch = rows[start:start + gen_batch]
+            batch_texts, batch_ids = [texts[r] for r in batch], [id_lists[r] for r in batch]
+            t0 = time.perf_counter()
+            batch_packed = rag_check.assemble_contexts(batch_texts, batch_ids)
+            t1 = time.perf_counter()
+            with span("generate"):
+                out = generate(batch_texts, batch_ids, batch_packed)
+            ctx_ms, gen_ms = (t1 - t0) * 1000, (time.perf_counter() - t1) * 1000
+            context_total += ctx_ms
+            generate_total += gen_ms
+            for r, answer, p in zip(batch, out, batch_packed):
+                answers[r], packed[r] = answer, p
+                per_row_ms[r]["context_ms"] = ctx_ms / len(batch)
+                per_row_ms[r]["generate_ms"] = gen_ms / len(batch)
+        for r in rows:
+            per_row_ms[r]["embed_ms"] = embed_ms / len(rows)
+            per_row_ms[r]["search_ms"] = search_ms / len(rows)
+    overall_timing["context_ms"] = context_total
+    overall_timing["generate_ms"] = generate_total
+
+    # With packing off the server does not count tokens; count the whole chunks here for the report
+    unpacked = [r for r, p in enumerate(packed) if p["tokens"] is None]
+    counts = iter(rag_check.count_tokens([c for r in unpacked for c in packed[r]["contexts"]]))
+    for r in unpacked:
+        n = sum(next(counts) for _ in packed[r]["contexts"])
+        packed[r] = {**packed[r], "tokens": n, "tokens_full": n}
+
+    chunks = rag_check.get_chunks()
+    records = []
+    for row, q in enumerate(questions):
+        ids = id_lists[row]
+        contexts = [chunks.text(i) for i in ids]
+        ctx_kw = set().union(*(keywords(c) for c in contexts)) if contexts else set()
+        q_kw = keywords(q["question"])
+        a_kw = keywords(answers[row] or "")
+        packed_kw = set().union(*(keywords(c) for c in packed[row]["contexts"])) if packed[row]["contexts"] else set()
+        crop = (q.get("crop") or "").lower()
+        records.append({
+            "id": q.get("id", row),
+            "crop": q.get("crop"),
+            "language": q.get("language"),
+            "category": q.get("category"),
+            "question": q["question"],
+            "retrieved": ids,
+            "answer": answers[row],
+            "context_kw": share(ctx_kw, q_kw),
+            "crop_prec": (sum(crop in c.lower() for c in contexts) / len(contexts))
+            if contexts and crop and crop != "general" else None,
+            "packed_kw": share(packed_kw, q_kw),
+            "answer_kw": share(a_kw, q_kw),
+            "grounding": share(ctx_kw, a_kw),
+            "not_found": answers[row] == NOT_FOUND,
+            "tokens": packed[row]["tokens"],
+            "tokens_full": packed[row]["tokens_full"],
+            **per_row_ms[row],
+        })
+    return {"timing": overall_timing, "records": records}
+
+
+METRICS = ("embed_ms", "search_ms", "context_ms", "generate_ms", "tokens", "tokens_full",
+           "context_kw", "packed_kw", "crop_prec", "answer_kw", "grounding", "not_found")
+
+
+def summarize(records: list, by=None) -> dict:
+    groups = defaultdict(list)
+    for r in records:
+        groups[r[by] if by else "all"].append(r)
+    out = {}
+    for key, rows in sorted(groups.items(), key=lambda kv: str(kv[0])):
+        row = {"n": len(rows)}
+        for m in METRICS:
+            values = [float(r[m]) for r in rows if r.get(m) is not None]
+            row[m] = sum(values) / len(values) if values else None
+        out[str(key)] = row
+    return out
+
+
+def compare(records: list, baseline_path: str, k: int) -> dict:
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        previous = json.load(fh)
+    baseline = {r["id"]: r for r in previous["records"]}
+    rows = []
+    for r in records:
+        b = baseline.get(r["id"])
+        if b is None:
+            continue
+        overlap = len(set(r["retrieved"]) & set(b["retrieved"])) / max(1, min(k, len(b["retrieved"]) or k))
+        rows.append({"id": r["id"], "retrieval_overlap": overlap, "answer_f1": token_f1(r["answer"] or "", b["answer"] or "")})
+    n = len(rows) or 1
+    return {
+        "questions": len(rows),
+        "retrieval_overlap": sum(x["retrieval_overlap"] for x in rows) / n,
+        "answer_f1": sum(x["answer_f1"] for x in rows) / n,
+        "overall": {m: (previous["summary"]["overall"]["all"].get(m), summarize(records)["all"][m])
+                    for m in ("tokens", "context_ms", "generate_ms")},
+        "changed": sorted((x for x in rows if x["retrieval_overlap"] < 1.0), key=lambda x: x["retrieval_overlap"]),
+    }
+
+
+def _fmt(v, pct=False):
+    if v is None:
+        return "-"
+    return f"{v * 100:.0f}%" if pct else f"{v:.2f}"
+
+
+def print_table(title: str, summary: dict):
+    print(f"\n{title:<10} {'n':>3} {'embed':>7} {'search':>7} {'ctx':>7} {'gen':>8} {'tok':>6} {'full':>6} "
+          f"{'ctx_kw':>7} {'pk_kw':>6} {'crop':>6} {'ans_kw':>7} {'ground':>7} {'nf':>5}   (ms / tokens per question)")
+    for key, r in summary.items():
+        print(f"{key:<10} {r['n']:>3} {_fmt(r['embed_ms']):>7} {_fmt(r['search_ms']):>7} {_fmt(r['context_ms']):>7} "
+              f"{_fmt(r['generate_ms']):>8} {r['tokens'] or 0:>6.0f} {r['tokens_full'] or 0:>6.0f} "
+              f"{_fmt(r['context_kw'], True):>7} {_fmt(r['packed_kw'], True):>6} {_fmt(r['crop_prec'], True):>6} "
+              f"{_fmt(r['answer_kw'], True):>7} {_fmt(r['grounding'], True):>7} {_fmt(r['not_found'], True):>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--gen-batch", type=int, default=8, help="questions per generate() call")
+    parser.add_argument("--embedder", choices=("auto", "model", "hashing"), default="auto")
+    parser.add_argument("--generator", choices=("auto", "model", "extractive"), default="auto")
+    parser.add_argument("--hybrid", action="store_true", help="BM25 + dense fusion (sets RAG_HYBRID)")
+    parser.add_argument("--chunks", help="evaluate over this chunks.jsonl instead of the server's chunk store")
+    parser.add_argument("--baseline", help="earlier --json output to compare retrieval / answers against")
+    parser.add_argument("--json", help="write summary and per-question records to this path")
+    args = parser.parse_args()
+
+    if args.hybrid:
+        os.environ["RAG_HYBRID"] = "true"
+    os.environ["RAG_BATCHING"] = "false"  # no server-side batcher thread needed
+    os.environ["RAG_EMBED_CACHE_SIZE"] = "0"  # time the encoder, not query-embedding cache hits
+    import rag_check
+
+    questions = load_questions(args.questions)
+    used = setup_components(rag_check, args.embedder, args.chunks)
+    used["retrieval"] = "hybrid" if rag_check.RAG_HYBRID else "dense"
+    used["generator"], generate = pick_generator(rag_check, args.generator)
+    print("components: " + ", ".join(f"{k}={v}" for k, v in used.items()))
+
+    result = evaluate(rag_check, questions, args.k, max(1, args.gen_batch), generate)
+    records = result["records"]
+    t = result["timing"]
+    print(f"all {len(records)} questions in one batch: embed {t['embed_ms']:.1f} ms, search {t['search_ms']:.1f} ms"
+          + (f", bm25 + fusion {t['bm25_ms']:.1f} ms" if t["bm25_ms"] else "") + "; "
+          f"context {t['context_ms']:.1f} ms, generate {t['generate_ms']:.1f} ms in batches of {args.gen_batch}")
+    packed_tokens, full_tokens = sum(r["tokens"] for r in records), sum(r["tokens_full"] for r in records)
+    print(f"context tokens: {packed_tokens} packed vs {full_tokens} retrieved "
+          f"({(1 - packed_tokens / full_tokens) * 100 if full_tokens else 0:.0f}% saved, "
+          f"RAG_CONTEXT_TOKENS={rag_check.RAG_CONTEXT_TOKENS})")
+
+    summary = {"overall": summarize(records), "crop": summarize(records, "crop"), "language": summarize(records, "language")}
+    print_table("overall", summary["overall"])
+    print_table("crop", summary["crop"])
+    print_table("language", summary["language"])
+
+    out = {"components": used, "k": args.k, "timing": t, "summary": summary, "records": records}
+    if args.baseline:
+        out["baseline"] = compare(records, args.baseline, args.k)
+        b = out["baseline"]
+        print(f"\nvs {args.baseline}: retrieval overlap {b['retrieval_overlap'] * 100:.1f}%, "
+              f"answer token F1 {b['answer_f1']:.3f} over {b['questions']} questions; "
+              f"{len(b['changed'])} with changed retrieval")
+        for m, (before, after) in b["overall"].items():
+            if before is not None and after is not None:
+                delta = (after - before) / before * 100 if before else 0.0
+                print(f"  {m:<12} {before:10.2f} -> {after:10.2f} per question ({delta:+.0f}%)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(out, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
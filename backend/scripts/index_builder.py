@@ -0,0 +1,238 @@
+"""Build compressed / approximate FAISS indexes for the local RAG server.
+
+Index types (all inner product over L2-normalized embeddings, i.e. cosine):
+
+- flat:     exact search (the original `faiss_index`)
+- ivf_flat: inverted lists over k-means cells; tune `nprobe` at query time
+- ivf_pq:   IVF + product quantization (m bytes per vector); tune `nprobe`
+- hnsw:     graph index; tune `efSearch` at query time
+
+Vectors come from the existing flat `faiss_index` when present (no
+re-embedding), otherwise `chunks.jsonl` is embedded with the same model as
+rag_check.py.
+
+Usage (from backend/scripts):
+    python index_builder.py build --type ivf_pq --nlist 256 --pq-m 16
+    python index_builder.py build --type hnsw --hnsw-m 32 --ef-construction 200
+    python index_builder.py report --k 5 --json index_report.json
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+VECTOR_DIR = os.path.join(DATA_DIR, "vectorstore")
+CHUNKS_PATH = os.path.join(DATA_DIR, "chunks", "chunks.jsonl")
+QUESTIONS_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "evaluation", "questions.jsonl"))
+EMBED_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def index_path(index_type: str = "flat", vector_dir: str = VECTOR_DIR) -> str:
+    """`faiss_index` for flat, `faiss_index.<type>` for the others."""
+    name = "faiss_index" if index_type == "flat" else f"faiss_index.{index_type}"
+    return os.path.join(vector_dir, name)
+
+
+# ---------------- SEARCH PARAMETERS ----------------
+def get_search_params(index) -> dict:
+    import faiss
+
+    params = {}
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params["nprobe"] = int(ivf.nprobe)
+        params["nlist"] = int(ivf.nlist)
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        params["efSearch"] = int(hnsw.efSearch)
+    return params
+
+
+def set_search_params(index, nprobe=None, ef_search=None) -> dict:
+    """Apply query-time knobs that the index supports; returns the resulting params."""
+    import faiss
+
+    if nprobe is not None:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = max(1, min(int(nprobe), int(ivf.nlist)))
+    if ef_search is not None:
+        hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+        if hnsw is not None:
+            hnsw.efSearch = max(1, int(ef_search))
+    return get_search_params(index)
+
+
+# ---------------- BUILD ----------------
+def load_vectors(vector_dir: str = VECTOR_DIR, chunks_path: str = CHUNKS_PATH, model_name: str = EMBED_MODEL) -> np.ndarray:
+    import faiss
+
+    flat_path = index_path("flat", vector_dir)
+    if os.path.exists(flat_path):
+        flat = faiss.read_index(flat_path)
+        if isinstance(flat, faiss.IndexIDMap2):
+            # Updated by ingest.py: rows by chunk id; removed chunks stay zero so later ids keep their position
+            ids = faiss.vector_to_array(flat.id_map)
+            vectors = np.zeros((int(ids.max()) + 1 if len(ids) else 0, flat.d), dtype="float32")
+            vectors[ids] = faiss.downcast_index(flat.index).reconstruct_n(0, flat.ntotal)
+        else:
+            vectors = flat.reconstruct_n(0, flat.ntotal).astype("float32")
+    else:
+        from sentence_transformers import SentenceTransformer
+
+        with open(chunks_path, "r", encoding="utf-8") as fh:
+            texts = [json.loads(line)["text"] for line in fh if line.strip()]
+        vectors = SentenceTransformer(model_name).encode(texts, convert_to_numpy=True, batch_size=64).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def default_nlist(n: int) -> int:
+    # ~4*sqrt(n) cells, but keep >= 39 training points per cell
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def build_index(vectors: np.ndarray, index_type: str, nlist=None, pq_m: int = 16, pq_nbits: int = 8,
+                hnsw_m: int = 32, ef_construction: int = 200):
+    import faiss
+
+    n, d = vectors.shape
+    metric = faiss.METRIC_INNER_PRODUCT
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(d)
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatIP(d)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist, metric)
+        else:
+            if d % pq_m:
+                raise ValueError(f"--pq-m ({pq_m}) must divide the embedding dimension ({d})")
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m, pq_nbits, metric)
+        index.train(vectors)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m, metric)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        raise ValueError(f"unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    index.add(vectors)
+    return index
+
+
+# ---------------- REPORT ----------------
+def _load_queries(model_name: str = EMBED_MODEL) -> np.ndarray:
+    import faiss
+    from sentence_transformers import SentenceTransformer
+
+    with open(QUESTIONS_PATH, "r", encoding="utf-8") as fh:
+        questions = [json.loads(line)["question"] for line in fh if line.strip()]
+    q = SentenceTransformer(model_name).encode(questions, convert_to_numpy=True).astype("float32")
+    faiss.normalize_L2(q)
+    return q
+
+
+def _index_bytes(index) -> int:
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def evaluate(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies = []
+    found = np.empty_like(truth)
+    for row in range(len(queries)):
+        t0 = time.perf_counter()
+        _, I = index.search(queries[row: row + 1], k)
+        latencies.append(time.perf_counter() - t0)
+        found[row] = I[0]
+    recall = np.mean([len(set(found[r]) & set(truth[r])) / k for r in range(len(queries))])
+    latencies.sort()
+    return {
+        "recall_at_k": float(recall),
+        "mean_ms": float(np.mean(latencies) * 1000),
+        "p95_ms": float(latencies[int(0.95 * (len(latencies) - 1))] * 1000),
+    }
+
+
+def report(k: int = 5, vector_dir: str = VECTOR_DIR, queries=None) -> list:
+    """recall@k (vs exact flat search), latency and memory for every built index."""
+    import faiss
+
+    flat = faiss.read_index(index_path("flat", vector_dir))
+    queries = _load_queries() if queries is None else queries
+    _, truth = flat.search(queries, k)
+
+    rows = []
+    for index_type in INDEX_TYPES:
+        path = index_path(index_type, vector_dir)
+        if not os.path.exists(path):
+            continue
+        index = faiss.read_index(path)
+        params = get_search_params(index)
+        if "nprobe" in params:
+            sweep = [("nprobe", v) for v in (1, 4, 8, 16, 32, 64) if v <= params["nlist"]]
+        elif "efSearch" in params:
+            sweep = [("efSearch", v) for v in (16, 32, 64, 128, 256)]
+        else:
+            sweep = [(None, None)]
+        for knob, value in sweep:
+            if knob == "nprobe":
+                set_search_params(index, nprobe=value)
+            elif knob == "efSearch":
+                set_search_params(index, ef_search=value)
+            row = {"index_type": index_type, "param": knob, "value": value,
+                   "ntotal": int(index.ntotal), "bytes": _index_bytes(index)}
+            row.update(evaluate(index, queries, truth, k))
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="build an index from chunks.jsonl / the flat index")
+    b.add_argument("--type", choices=INDEX_TYPES, required=True)
+    b.add_argument("--nlist", type=int, help="IVF cells (default ~4*sqrt(n))")
+    b.add_argument("--pq-m", type=int, default=16, help="PQ sub-quantizers (bytes per vector)")
+    b.add_argument("--pq-nbits", type=int, default=8)
+    b.add_argument("--hnsw-m", type=int, default=32)
+    b.add_argument("--ef-construction", type=int, default=200)
+    b.add_argument("--vector-dir", default=VECTOR_DIR)
+
+    r = sub.add_parser("report", help="recall@k vs latency vs memory for all built indexes")
+    r.add_argument("--k", type=int, default=5)
+    r.add_argument("--vector-dir", default=VECTOR_DIR)
+    r.add_argument("--json", help="write the report to this path")
+
+    args = parser.parse_args()
+    if args.cmd == "build":
+        import faiss
+
+        vectors = load_vectors(args.vector_dir)
+        t0 = time.perf_counter()
+        index = build_index(vectors, args.type, args.nlist, args.pq_m, args.pq_nbits, args.hnsw_m, args.ef_construction)
+        path = index_path(args.type, args.vector_dir)
+        faiss.write_index(index, path)
+        print(f"built {args.type} over {index.ntotal} vectors in {time.perf_counter() - t0:.1f}s -> {path} "
+              f"({os.path.getsize(path) / 1e6:.1f} MB)")
+    else:
+        rows = report(args.k, args.vector_dir)
+        print(f"{'index':<9} {'param':<9} {'value':>6} {'recall@' + str(args.k):>9} {'mean ms':>8} {'p95 ms':>8} {'MB':>8}")
+        for row in rows:
+            print(f"{row['index_type']:<9} {row['param'] or '-':<9} {row['value'] or '-':>6} "
+                  f"{row['recall_at_k']:>9.3f} {row['mean_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['bytes'] / 1e6:>8.2f}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as fh:
+                json.dump(rows, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Bounded inference executor for the local RAG server.
+
+`/ask` used to run in FastAPI's default threadpool. Every request got its own
+thread and its own torch `generate`, so under load N generations competed for
+the cores, all of them slowed down, and nothing bounded the backlog. This
+executor puts a fixed number of model workers behind a bounded queue:
+
+- `workers` threads each take a micro-batch (up to `max_batch_size` items,
+  waiting at most `max_wait_ms` for it to fill) and run `batch_fn` on it.
+- torch's intra-op pool is process-wide. It is set once to
+  `threads` (default: the current torch thread count // workers), so the
+  concurrent generates together use the cores without oversubscribing them.
+  FAISS's OpenMP pool gets the same cap.
+- Admission: `submit` raises `Overloaded` at once when the queue is full, or
+  when the estimated queue wait plus one batch's compute time (EWMA of recent
+  batches) would pass the request's deadline. A job that a free worker can
+  start right away is always admitted. The estimate leaves out time spent
+  loading model components, and it halves every `RAG_SERVICE_HALF_LIFE`
+  seconds without a completed batch, so one slow batch cannot keep turning
+  requests away. Jobs whose deadline passed while queued are dropped before
+  compute. The server answers 503 with `Retry-After`
+  (the estimated time to drain the queue) rather than letting requests pile up.
+- Each job records `queue_wait` and `compute` seconds. A job whose future is
+  cancelled while queued is skipped.
+
+`call(fn)` runs a standalone callable (the streaming generate) in a worker
+slot under the same admission rules. Bulk work that is not a request (ingest
+embeddings) passes `estimate=False`, so its run time does not feed the batch
+estimate that admission uses.
+"""
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, List, Optional, Sequence
+
+RAG_INFER_WORKERS = int(os.getenv("RAG_INFER_WORKERS", "1"))
+RAG_INFER_QUEUE = int(os.getenv("RAG_INFER_QUEUE", "32"))  # queued jobs beyond this are rejected
+RAG_INFER_THREADS = int(os.getenv("RAG_INFER_THREADS", "0"))  # torch threads per worker; 0 = cores // workers
+RAG_DEADLINE_MS = float(os.getenv("RAG_DEADLINE_MS", "15000"))  # default per-request deadline (the API's read timeout)
+RAG_SERVICE_HALF_LIFE = float(os.getenv("RAG_SERVICE_HALF_LIFE", "60"))  # seconds; 0 = the estimate never decays
+
+_EWMA_ALPHA = 0.3
+
+
+class Overloaded(Exception):
+    """Rejected by admission control; `reason` is "queue_full" or "deadline"."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"inference overloaded ({reason}); retry after {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Job:
+    __slots__ = ("item", "fn", "deadline", "estimate", "future", "enqueued", "started", "finished")
+
+    def __init__(self, item: Any, fn: Optional[Callable[[], Any]], deadline: Optional[float], estimate: bool = True):
+        self.item = item
+        self.fn = fn  # standalone callable; None for batched items
+        self.deadline = deadline  # time.monotonic() value
+        self.estimate = estimate  # whether its compute time feeds the batch estimate
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def queue_wait(self) -> float:
+        return (self.started or time.monotonic()) - self.enqueued
+
+    @property
+    def compute(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        return self.future.result(timeout)
+
+
+class InferenceExecutor:
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]], workers: int = RAG_INFER_WORKERS,
+                 max_queue: int = RAG_INFER_QUEUE, max_batch_size: int = 1, max_wait_ms: float = 0.0,
+                 threads: int = RAG_INFER_THREADS, name: str = "rag-infer",
+                 setup_seconds: Optional[Callable[[], float]] = None,
+                 service_half_life: float = RAG_SERVICE_HALF_LIFE):
+        """`batch_fn` takes a list of items and returns one result per item, in order.
+
+        `setup_seconds()` returns the time the calling thread has spent so far on one-off
+        setup (lazy model loads); it is subtracted from batch times before they reach the estimate.
+        """
+        self.batch_fn = batch_fn
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.threads = max(0, int(threads))
+        self.name = name
+        self.setup_seconds = setup_seconds
+        self.service_half_life = max(0.0, float(service_half_life))
+        self._service: Optional[float] = None  # EWMA seconds per batch, as of `_service_at`
+        self._service_at = 0.0
+        self._threads_set = False
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "deadline": 0}
+        self.expired = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.items = 0
+        self._start()
+        if hasattr(os, "register_at_fork"):
+            # Threads do not survive fork(); pre-forked workers (prefork.py) need their own
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self) -> None:
+        self._queue: Deque[Job] = deque()
+        self._cond = threading.Condition()
+        self.running = 0
+        self._threads = [threading.Thread(target=self._loop, name=f"{self.name}-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    # Admission
+    def _service_estimate(self, now: float) -> Optional[float]:
+        """EWMA seconds per batch, halved every `service_half_life` seconds since the last batch."""
+        if self._service is None or not self.service_half_life:
+            return self._service
+        return self._service * 0.5 ** (max(0.0, now - self._service_at) / self.service_half_life)
+
+    def _drain_seconds(self, queued: int, now: float) -> Optional[float]:
+        """Estimated time until the running batches and `queued` waiting jobs have all finished."""
+        service = self._service_estimate(now)
+        if service is None:
+            return None
+        batches = math.ceil(queued / self.max_batch_size) + self.running
+        return math.ceil(batches / self.workers) * service
+
+    def retry_after(self) -> float:
+        with self._cond:
+            drain = self._drain_seconds(len(self._queue), time.monotonic())
+        return float(max(1, math.ceil(drain or 0.0)))
+
+    def _refusal(self, start: float, deadline: Optional[float]) -> Optional[Overloaded]:
+        """Why a job arriving at `start` would be rejected now, or None. Caller holds the lock."""
+        queued = len(self._queue)
+        if not queued and self.running < self.workers:
+            return None  # a free worker starts it now, whatever the estimate says
+        wait = self._drain_seconds(queued, start)
+        retry = float(max(1, math.ceil(wait or 0.0)))
+        if queued >= self.max_queue:
+            return Overloaded("queue_full", retry)
+        if deadline is not None and wait is not None and start + wait + self._service_estimate(start) > deadline:
+            return Overloaded("deadline", retry)
+        return None
+
+    def _admit(self, job: Job) -> Job:
+        with self._cond:
+            refusal = self._refusal(job.enqueued, job.deadline)
+            if refusal is not None:
+                self.rejected[refusal.reason] += 1
+                raise refusal
+            self._queue.append(job)
+            self.admitted += 1
+            self._cond.notify()
+        return job
+
+    def submit(self, item: Any, deadline: Optional[float] = None) -> Job:
+        """Queue `item` for a batch; raises `Overloaded` instead of queueing a job that cannot make it."""
+        return self._admit(Job(item, None, deadline))
+
+    def call(self, fn: Callable[[], Any], deadline: Optional[float] = None, estimate: bool = True) -> Job:
+        """Run `fn()` alone in a worker slot, under the same admission rules.
+
+        With `estimate=False` its run time is left out of the batch estimate (work unlike a request).
+        """
+        return self._admit(Job(None, fn, deadline, estimate))
+
+    def check(self, deadline: Optional[float] = None) -> None:
+        """Raise `Overloaded` if a job submitted now would be rejected (nothing is queued)."""
+        with self._cond:
+            refusal = self._refusal(time.monotonic(), deadline)
+            if refusal is not None:
+                self.rejected[refusal.reason] += 1
+                raise refusal
+
+    # Workers
+    def _collect(self) -> List[Job]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            first = self._queue.popleft()
+            if first.fn is not None:
+                self.running += 1
+                return [first]
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if self._queue:
+                    if self._queue[0].fn is not None:
+                        break
+                    batch.append(self._queue.popleft())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self.running += 1
+            return batch
+
+    def _set_threads(self) -> None:
+        # Process-wide pools: set once, after the model libraries are loaded
+        if "torch" not in sys.modules:
+            return
+        torch = sys.modules["torch"]
+        n = self.threads or max(1, torch.get_num_threads() // self.workers)
+        torch.set_num_threads(n)
+        if "faiss" in sys.modules:
+            sys.modules["faiss"].omp_set_num_threads(n)
+        self.threads = n
+        self._threads_set = True
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                self._run(batch)
+            finally:
+                with self._cond:
+                    self.running -= 1
+
+    def _run(self, batch: List[Job]) -> None:
+        if not self._threads_set:
+            self._set_threads()
+        now = time.monotonic()
+        live = []
+        for job in batch:
+            if not job.future.set_running_or_notify_cancel():
+                self.cancelled += 1  # the caller went away while it was queued
+            elif job.deadline is not None and now > job.deadline:
+                # Too late to be useful: the caller has given up or is about to
+                self.expired += 1
+                job.future.set_exception(Overloaded("deadline", self.retry_after()))
+            else:
+                job.started = now
+                live.append(job)
+        if not live:
+            return
+        setup = self.setup_seconds() if self.setup_seconds else 0.0
+        try:
+            if live[0].fn is not None:
+                results = [live[0].fn()]
+            else:
+                results = self.batch_fn([job.item for job in live])
+                if len(results) != len(live):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(live)} items")
+        except Exception as e:
+            finished = time.monotonic()
+            for job in live:
+                job.finished = finished
+                job.future.set_exception(e)
+            self.failed += len(live)
+            return
+        finished = time.monotonic()
+        # Lazy component loads happen once; they say nothing about the next batch
+        elapsed = finished - now - ((self.setup_seconds() - setup) if self.setup_seconds else 0.0)
+        with self._cond:
+            if live[0].estimate:
+                previous = self._service_estimate(finished)
+                self._service = max(0.0, elapsed) if previous is None else (
+                    _EWMA_ALPHA * max(0.0, elapsed) + (1 - _EWMA_ALPHA) * previous)
+                self._service_at = finished
+            self.batches += 1
+            self.items += len(live)
+            self.completed += len(live)
+        for job, res in zip(live, results):
+            job.finished = finished
+            job.future.set_result(res)
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._queue)
+            service = self._service_estimate(time.monotonic())
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads or None,
+            "max_queue": self.max_queue,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": queued,
+            "running": self.running,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "expired": self.expired,
+            "cancelled": self.cancelled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+            "batch_ms_ewma": round(service * 1000.0, 3) if service is not None else None,
+        }
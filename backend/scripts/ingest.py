@@ -0,0 +1,504 @@
+"""Incremental ingestion for the local RAG server: add, replace or remove documents in place.
+
+Adding one extension manual used to mean regenerating `faiss_index`,
+`metadata.pkl` and `chunks.jsonl` and restarting rag_check.py. `ingest()`
+instead:
+
+1. chunks each document paragraph by paragraph (`chunk_text`). An edit only
+   changes the chunks of the paragraphs it touches.
+2. keys every chunk by the sha1 of its text. A chunk whose text already
+   belongs to that document keeps its id and is not embedded again. A chunk
+   whose text exists elsewhere in the corpus reuses that vector from the index.
+   Only genuinely new text reaches the encoder.
+3. appends new chunks with the next free ids. Chunk ids stay line numbers in
+   chunks.jsonl, the same ids as the FAISS index, the chunk store and BM25.
+4. tombstones chunks that were removed or changed: their line keeps its
+   position with empty text and `{"deleted": true}`. Their vectors are removed
+   from id-mapped indexes. The flat index is converted to `IndexIDMap2` on the
+   first ingest, and IVF indexes keep ids natively. HNSW cannot remove
+   vectors, so rag_check.py filters tombstoned ids out of its results.
+5. rewrites chunks.jsonl / metadata.pkl, the chunk store and (if built) the
+   BM25 index. Every file is swapped into place atomically, under a lock
+   shared with other ingests and with the server's reload.
+
+rag_check.py notices the new files (`RAG_RELOAD_CHECK_SECONDS`) or is told
+through `POST /ingest`. It then hot-swaps the chunk store, BM25 and the index
+while in-flight requests finish on the objects they already hold.
+
+A document is {"doc_id", "text", ...metadata}; `doc_id` defaults to
+`source`. Chunks from the original build belong to the document named by
+their `doc_id` / `source` metadata, so re-ingesting a manual under the same
+name replaces it.
+
+Usage (from backend/scripts):
+    python ingest.py add manuals/teff_2024.md manuals/new_maize.txt --meta crop=maize
+    python ingest.py add documents.jsonl          # one {"doc_id", "text", ...} per line
+    python ingest.py remove old_manual.pdf
+    python ingest.py status
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
+for _path in (BASE_DIR, ROOT_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from chunk_store import CHUNKS_PATH, DATA_DIR, METADATA_PATH, STORE_DIR, build_chunk_store
+from bm25_index import INDEX_DIR as BM25_DIR, build_bm25_index
+from index_builder import EMBED_MODEL, INDEX_TYPES, VECTOR_DIR, index_path
+from backend.services.worker_coordination import FileLock
+
+INGEST_DIR = os.path.join(DATA_DIR, "ingest")
+STATE_PATH = os.path.join(INGEST_DIR, "state.json")
+INGEST_LOCK = os.path.join(INGEST_DIR, ".lock")
+
+RAG_CHUNK_WORDS = int(os.getenv("RAG_CHUNK_WORDS", "200"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "40"))  # words repeated between windows of a long paragraph
+RAG_CHUNK_MIN_WORDS = int(os.getenv("RAG_CHUNK_MIN_WORDS", "20"))  # shorter paragraphs (headings) join the next one
+
+_SENTENCE_END = re.compile(r"(?<=[.!?።፧፨])\s+")  # Latin and Ge'ez (። ፧ ፨) sentence ends
+_PARAGRAPH = re.compile(r"\n\s*\n")
+
+
+# ---------------- CHUNKING ----------------
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _windows(sentences: List[str], max_words: int, overlap: int) -> List[str]:
+    chunks, window, words = [], [], 0
+    for sentence in sentences:
+        n = len(sentence.split())
+        if window and words + n > max_words:
+            chunks.append(" ".join(window))
+            # Carry the last sentences (up to `overlap` words) into the next window
+            carry, kept = [], 0
+            for s in reversed(window):
+                kept += len(s.split())
+                if kept > overlap:
+                    break
+                carry.insert(0, s)
+            window, words = carry, sum(len(s.split()) for s in carry)
+        window.append(sentence)
+        words += n
+    if window:
+        chunks.append(" ".join(window))
+    return chunks
+
+
+def chunk_text(text: str, max_words: int = RAG_CHUNK_WORDS, overlap: int = RAG_CHUNK_OVERLAP,
+               min_words: int = RAG_CHUNK_MIN_WORDS) -> List[str]:
+    """Split a document into chunks; deterministic, so unchanged paragraphs give identical chunks.
+
+    Paragraphs (blank-line separated) are chunked independently. Short ones
+    are joined to the paragraph that follows. Long ones become windows of
+    whole sentences. Sentences longer than `max_words` are cut by words.
+    """
+    paragraphs, pending = [], ""
+    for para in _PARAGRAPH.split(text.replace("\r\n", "\n")):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        para = f"{pending} {para}" if pending else para
+        if len(para.split()) < min_words:
+            pending = para
+        else:
+            paragraphs.append(para)
+            pending = ""
+    if pending:
+        paragraphs.append(pending)
+
+    chunks = []
+    for para in paragraphs:
+        sentences = []
+        for sentence in _SENTENCE_END.split(para):
+            words = sentence.split()
+            sentences.extend(" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words))
+        chunks.extend(_windows(sentences, max_words, min(overlap, max_words // 2)))
+    return chunks
+
+
+# ---------------- CORPUS ----------------
+def _doc_id(meta: dict) -> Optional[str]:
+    value = meta.get("doc_id") or meta.get("source")
+    return str(value) if value is not None else None
+
+
+def _write_atomic(path: str, write: Callable) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class _Corpus:
+    """chunks.jsonl (+ metadata.pkl) as rows indexed by chunk id; only changed rows are re-serialized."""
+
+    def __init__(self, chunks_path: str, metadata_path: str):
+        self.chunks_path = chunks_path
+        self.metadata_path = metadata_path
+        self.lines: List[str] = []
+        if os.path.exists(chunks_path):
+            with open(chunks_path, "r", encoding="utf-8") as fh:
+                self.lines = [line.rstrip("\n") for line in fh if line.strip()]
+        self.metadatas = None
+        if metadata_path and os.path.exists(metadata_path):
+            with open(metadata_path, "rb") as fh:
+                self.metadatas = pickle.load(fh)
+        self.texts: List[str] = []
+        self.metas: List[dict] = []
+        for i, line in enumerate(self.lines):
+            chunk = json.loads(line)
+            self.texts.append(chunk.get("text", ""))
+            if self.metadatas is not None and i < len(self.metadatas) and isinstance(self.metadatas[i], dict):
+                self.metas.append(self.metadatas[i])
+            else:
+                self.metas.append({key: value for key, value in chunk.items() if key != "text"})
+        self.changed = False
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def deleted(self, i: int) -> bool:
+        return bool(self.metas[i].get("deleted"))
+
+    def documents(self) -> Dict[str, List[int]]:
+        docs: Dict[str, List[int]] = {}
+        for i, meta in enumerate(self.metas):
+            doc = _doc_id(meta)
+            if doc is not None and not self.deleted(i):
+                docs.setdefault(doc, []).append(i)
+        return docs
+
+    def set(self, i: int, text: str, meta: dict) -> None:
+        row = {"text": text, **meta}
+        if i == len(self.lines):
+            self.lines.append("")
+            self.texts.append("")
+            self.metas.append({})
+        self.lines[i] = json.dumps(row, ensure_ascii=False)
+        self.texts[i] = text
+        self.metas[i] = meta
+        self.changed = True
+
+    def tombstone(self, i: int) -> None:
+        doc = _doc_id(self.metas[i])
+        self.set(i, "", {"deleted": True, "doc_id": doc} if doc is not None else {"deleted": True})
+
+    def save(self) -> None:
+        def write_chunks(tmp):
+            with open(tmp, "w", encoding="utf-8") as fh:
+                for line in self.lines:
+                    fh.write(line + "\n")
+
+        _write_atomic(self.chunks_path, write_chunks)
+        if self.metadatas is not None:
+            def write_metadata(tmp):
+                with open(tmp, "wb") as fh:
+                    pickle.dump(self.metas, fh)
+
+            _write_atomic(self.metadata_path, write_metadata)
+
+
+# ---------------- INDEXES ----------------
+def is_id_mapped(index) -> bool:
+    """True when `index` stores explicit chunk ids (IndexIDMap2, IVF) and can drop vectors by id."""
+    import faiss
+
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) or faiss.try_extract_index_ivf(index) is not None
+
+
+def _id_mapped_flat(flat):
+    """Same vectors, ids 0..n-1, behind an IndexIDMap2 (one-off conversion of a built flat index)."""
+    import faiss
+
+    mapped = faiss.IndexIDMap2(faiss.IndexFlat(flat.d, flat.metric_type))
+    if flat.ntotal:
+        mapped.add_with_ids(flat.reconstruct_n(0, flat.ntotal), np.arange(flat.ntotal, dtype="int64"))
+    return mapped
+
+
+def _update_index(path: str, new_ids: np.ndarray, vectors: np.ndarray, removed: Sequence[int]) -> dict:
+    import faiss
+
+    index = faiss.read_index(path)
+    if isinstance(index, faiss.IndexFlat):
+        index = _id_mapped_flat(index)
+    dropped = 0
+    if is_id_mapped(index):
+        if removed:
+            dropped = int(index.remove_ids(np.asarray(sorted(removed), dtype="int64")))
+        if len(new_ids):
+            index.add_with_ids(vectors, new_ids)
+    elif len(new_ids):
+        index.add(vectors)  # positional (HNSW): never shrinks, so ids continue at ntotal
+    _write_atomic(path, lambda tmp: faiss.write_index(index, tmp))
+    return {"ntotal": int(index.ntotal), "removed": dropped, "id_mapped": is_id_mapped(index)}
+
+
+def _reuse_vectors(index_files: Dict[str, str], ids: List[int]) -> Dict[int, np.ndarray]:
+    """Stored vectors for `ids`, from the first index that can reconstruct them (flat first)."""
+    import faiss
+
+    for path in index_files.values():
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            return {i: index.reconstruct(int(i)) for i in ids}
+        except Exception:
+            continue  # e.g. IVF without a direct map: try the next one, else re-embed
+    return {}
+
+
+def _check_positional(path: str, count: int) -> None:
+    """Positional indexes (HNSW) must hold exactly one vector per chunk line to take appended ids."""
+    import faiss
+
+    index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    if not isinstance(index, faiss.IndexFlat) and not is_id_mapped(index) and index.ntotal != count:
+        raise RuntimeError(f"{path} has {index.ntotal} vectors for {count} chunks; rebuild it with index_builder.py")
+
+
+def _create_flat(path: str, d: int) -> str:
+    import faiss
+
+    _write_atomic(path, lambda tmp: faiss.write_index(faiss.IndexIDMap2(faiss.IndexFlatIP(d)), tmp))
+    return path
+
+
+# ---------------- STATE ----------------
+def _dump_json(data, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+
+
+def read_state(state_path: str = STATE_PATH) -> dict:
+    try:
+        with open(state_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {"generation": 0, "count": None, "deleted": []}
+
+
+def deleted_ids(state_path: str = STATE_PATH) -> frozenset:
+    return frozenset(read_state(state_path).get("deleted", ()))
+
+
+def _normalize_document(doc: dict) -> dict:
+    doc = dict(doc)
+    text = doc.pop("text", None)
+    meta = dict(doc.pop("metadata", None) or {})
+    meta.update(doc)
+    doc_id = _doc_id(meta)
+    if not doc_id or text is None:
+        raise ValueError("every document needs a text and a doc_id (or source)")
+    meta["doc_id"] = doc_id
+    meta.setdefault("source", doc_id)
+    return {"doc_id": doc_id, "text": text, "metadata": meta}
+
+
+def ingest(documents: Iterable[dict] = (), remove: Iterable[str] = (),
+           encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None, dry_run: bool = False,
+           chunks_path: str = CHUNKS_PATH, metadata_path: str = METADATA_PATH, vector_dir: str = VECTOR_DIR,
+           store_dir: str = STORE_DIR, bm25_dir: str = BM25_DIR, state_path: str = STATE_PATH,
+           lock_path: str = INGEST_LOCK) -> dict:
+    """Add / replace `documents` and drop the documents named in `remove`; returns a report.
+
+    `encode_fn(texts)` embeds new chunk texts (default: a SentenceTransformer
+    with RAG_EMBED_MODEL). Nothing is written with `dry_run`.
+    """
+    documents = list({doc["doc_id"]: doc for doc in map(_normalize_document, documents)}.values())
+    added_docs = {doc["doc_id"] for doc in documents}
+    remove = [str(doc) for doc in remove if str(doc) not in added_docs]  # re-adding a document replaces it
+    t0 = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with FileLock(lock_path):
+        corpus = _Corpus(chunks_path, metadata_path)
+        count = len(corpus)
+        docs = corpus.documents()
+        by_hash = {}
+        for i, text in enumerate(corpus.texts):
+            if not corpus.deleted(i):
+                by_hash.setdefault(content_hash(text), i)
+
+        report = {"documents": len(documents), "unchanged_documents": 0, "removed_documents": 0,
+                  "missing_documents": [], "kept": 0, "added": 0, "embedded": 0, "reused": 0, "deleted": 0}
+        tombstones = set()
+        for doc in remove:
+            if doc in docs:
+                tombstones.update(docs[doc])
+                report["removed_documents"] += 1
+            else:
+                report["missing_documents"].append(doc)
+
+        new_rows = []  # (text, meta, hash)
+        for doc in documents:
+            old: Dict[str, List[int]] = {}
+            for i in docs.get(doc["doc_id"], ()):
+                old.setdefault(content_hash(corpus.texts[i]), []).append(i)
+            added_before = len(new_rows)
+            for n, piece in enumerate(chunk_text(doc["text"])):
+                h = content_hash(piece)
+                meta = {**doc["metadata"], "chunk": n}
+                if old.get(h):
+                    i = old[h].pop(0)
+                    report["kept"] += 1
+                    if corpus.metas[i] != meta and not dry_run:
+                        corpus.set(i, piece, meta)  # same text, new metadata: no re-embedding
+                else:
+                    new_rows.append((piece, meta, h))
+            leftover = [i for ids in old.values() for i in ids]
+            tombstones.update(leftover)
+            if not leftover and len(new_rows) == added_before:
+                report["unchanged_documents"] += 1
+
+        # One vector per distinct new text: from an index when the text is already in the corpus, else embedded
+        distinct: Dict[str, str] = {}
+        for text, _, h in new_rows:
+            distinct.setdefault(h, text)
+        index_files = {t: index_path(t, vector_dir) for t in INDEX_TYPES if os.path.exists(index_path(t, vector_dir))}
+        reusable = {h: by_hash[h] for h in distinct if h in by_hash}
+        if dry_run:
+            to_embed = [h for h in distinct if h not in reusable]
+        else:
+            stored = _reuse_vectors(index_files, list(reusable.values())) if reusable else {}
+            vectors_by_hash = {h: stored[i] for h, i in reusable.items() if i in stored}
+            to_embed = [h for h in distinct if h not in vectors_by_hash]
+        embed_set = set(to_embed)
+        report.update(added=len(new_rows), embedded=len(to_embed), deleted=len(tombstones),
+                      reused=sum(1 for _, _, h in new_rows if h not in embed_set))
+        if dry_run or (not new_rows and not tombstones and not corpus.changed):
+            report.update(dry_run=dry_run, count=count, seconds=round(time.perf_counter() - t0, 3))
+            return report
+        if not index_files and count:
+            raise RuntimeError(f"no FAISS index in {vector_dir} for the existing {count} chunks; "
+                               "build it before ingesting")
+        for t, path in index_files.items():
+            _check_positional(path, count)
+
+        if to_embed:
+            import faiss
+
+            if encode_fn is None:
+                encode_fn = _default_encoder()
+            embedded = np.asarray(encode_fn([distinct[h] for h in to_embed]), dtype="float32")
+            faiss.normalize_L2(embedded)
+            vectors_by_hash.update(zip(to_embed, embedded))
+        new_ids = np.arange(count, count + len(new_rows), dtype="int64")
+        vectors = (np.stack([vectors_by_hash[h] for _, _, h in new_rows]).astype("float32")
+                   if new_rows else np.zeros((0, 1), dtype="float32"))
+        if not index_files and new_rows:
+            index_files = {"flat": _create_flat(index_path("flat", vector_dir), vectors.shape[1])}
+
+        for i in sorted(tombstones):
+            corpus.tombstone(i)
+        for i, (text, meta, _) in zip(new_ids, new_rows):
+            corpus.set(int(i), text, meta)
+
+        report["indexes"] = {t: _update_index(path, new_ids, vectors, tombstones) for t, path in index_files.items()}
+        corpus.save()
+        build_chunk_store(chunks_path, metadata_path, store_dir)
+        if os.path.isdir(bm25_dir):
+            build_bm25_index(chunks_path, bm25_dir)
+
+        state = read_state(state_path)
+        state = {"generation": int(state.get("generation", 0)) + 1, "count": len(corpus),
+                 "deleted": [i for i in range(len(corpus)) if corpus.deleted(i)], "updated": time.time()}
+        _write_atomic(state_path, lambda tmp: _dump_json(state, tmp))
+        report.update(dry_run=False, count=len(corpus), generation=state["generation"],
+                      seconds=round(time.perf_counter() - t0, 3))
+        return report
+
+
+def _default_encoder() -> Callable[[List[str]], np.ndarray]:
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(os.getenv("RAG_EMBED_MODEL", EMBED_MODEL))
+    return lambda texts: model.encode(texts, convert_to_numpy=True, batch_size=64)
+
+
+def status(chunks_path: str = CHUNKS_PATH, metadata_path: str = METADATA_PATH, vector_dir: str = VECTOR_DIR,
+           state_path: str = STATE_PATH) -> dict:
+    import faiss
+
+    corpus = _Corpus(chunks_path, metadata_path)
+    indexes = {}
+    for t in INDEX_TYPES:
+        path = index_path(t, vector_dir)
+        if os.path.exists(path):
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            indexes[t] = {"ntotal": int(index.ntotal), "id_mapped": is_id_mapped(index)}
+    deleted = sum(1 for i in range(len(corpus)) if corpus.deleted(i))
+    state = read_state(state_path)
+    return {"chunks": len(corpus), "live": len(corpus) - deleted, "deleted": deleted,
+            "documents": len(corpus.documents()), "generation": state.get("generation", 0),
+            "updated": state.get("updated"), "indexes": indexes}
+
+
+# ---------------- CLI ----------------
+def _read_documents(paths: Sequence[str], extra_meta: dict) -> List[dict]:
+    """.jsonl / .json files hold documents; any other file is one document named by its path."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(root, name) for root, _, names in sorted(os.walk(path))
+                         for name in sorted(names) if not name.startswith("."))
+        else:
+            files.append(path)
+    docs = []
+    for path in files:
+        if path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf-8") as fh:
+                docs.extend(json.loads(line) for line in fh if line.strip())
+        elif path.endswith(".json"):
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            docs.extend(data if isinstance(data, list) else [data])
+        else:
+            with open(path, "r", encoding="utf-8") as fh:
+                docs.append({"doc_id": os.path.basename(path), "text": fh.read()})
+    return [{**extra_meta, **doc} for doc in docs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    a = sub.add_parser("add", help="add or replace documents (text files, or .jsonl / .json of documents)")
+    a.add_argument("paths", nargs="+")
+    a.add_argument("--meta", action="append", default=[], metavar="KEY=VALUE",
+                   help="metadata for every document, e.g. crop=teff (repeatable)")
+    a.add_argument("--dry-run", action="store_true", help="report what would change; write nothing")
+    r = sub.add_parser("remove", help="tombstone every chunk of the given documents")
+    r.add_argument("doc_ids", nargs="+")
+    r.add_argument("--dry-run", action="store_true")
+    sub.add_parser("status", help="chunk / document / tombstone counts and index sizes")
+    args = parser.parse_args()
+
+    if args.cmd == "status":
+        print(json.dumps(status(), indent=2))
+        return
+    if args.cmd == "add":
+        meta = dict(item.split("=", 1) for item in args.meta)
+        report = ingest(_read_documents(args.paths, meta), dry_run=args.dry_run)
+    else:
+        report = ingest(remove=args.doc_ids, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Open-loop load benchmark for the FastAPI backend, run in-process.
+
+Replays questions from evaluation/questions.jsonl and/or the historical
+backend/logs/query_log.jsonl against `backend.app.main:app` through httpx's
+ASGI transport. The remote RAG is replaced by a local stub with configurable
+latency, jitter and failure rate. Arrivals are open-loop (Poisson, or bursts),
+and latency is measured from each request's *scheduled* start, so a slow
+server cannot hide its queueing delay by slowing the client down.
+
+Scenarios:
+
+- cold:         empty cache, healthy remote
+- warm:         every question answered once first, then measured
+- remote_down:  the stub refuses all connections (breakers / offline queue)
+- burst:        the same average rate, arriving in bursts of --burst-size
+
+For each scenario: p50/p95/p99/max latency, throughput, cache hit rate, error
+rate (HTTP errors and `backend == "error"`), offline rate and remote calls.
+Caches, queue and logs live in a temporary directory.
+
+Usage:
+    python backend/scripts/load_bench.py --rate 50 --duration 10 --latency-ms 200 --json bench.json
+    python backend/scripts/load_bench.py --scenarios warm,burst --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
+for _path in (BASE_DIR, ROOT_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from bench_batching import percentile
+
+QUESTIONS_PATH = os.path.join(ROOT_DIR, "evaluation", "questions.jsonl")
+QUERY_LOG_PATH = os.path.join(ROOT_DIR, "backend", "logs", "query_log.jsonl")
+SCENARIOS = ("cold", "warm", "remote_down", "burst")
+STUB_URL = "http://stub-remote"
+
+# Metrics compared by --compare, with the direction that counts as better
+COMPARE = {"p50_ms": -1, "p95_ms": -1, "p99_ms": -1, "throughput_rps": 1, "error_rate": -1, "cache_hit_rate": 1}
+
+
+def load_questions(source: str) -> list:
+    paths = {"eval": [QUESTIONS_PATH], "log": [QUERY_LOG_PATH], "both": [QUESTIONS_PATH, QUERY_LOG_PATH]}[source]
+    questions = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    q = json.loads(line).get("question")
+                except ValueError:
+                    continue
+                if q:
+                    questions.append(q)
+    return questions
+
+
+def poisson_arrivals(rate: float, duration: float, rng: random.Random) -> list:
+    offsets, t = [], rng.expovariate(rate)
+    while t < duration:
+        offsets.append(t)
+        t += rng.expovariate(rate)
+    return offsets
+
+
+def burst_arrivals(rate: float, duration: float, burst_size: int, rng: random.Random) -> list:
+    """Bursts of `burst_size` simultaneous requests, Poisson-spaced, same mean rate."""
+    return [t for start in poisson_arrivals(rate / burst_size, duration, rng) for t in [start] * burst_size]
+
+
+class StubRemote:
+    """Stand-in for the remote RAG server's /ask and /health."""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, failure_rate: float, rng: random.Random):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.down = False
+        self.calls = 0
+        self.rng = rng
+
+    async def handler(self, request):
+        import httpx
+
+        if self.down:
+            raise httpx.ConnectError("stub remote is down", request=request)
+        if request.url.path == "/health":
+            return httpx.Response(200, json={"status": "ok"})
+        if request.url.path != "/ask":
+            return httpx.Response(404)
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000.0)
+        if self.rng.random() < self.failure_rate:
+            return httpx.Response(500, json={"detail": "injected failure"})
+        body = json.loads(request.content)
+        return httpx.Response(200, json={
+            "answer": f"Stub answer to: {body['question']}",
+            "sources": [{"text": "stub context", "metadata": {"source": "stub"}}] * int(body.get("k", 3)),
+        })
+
+
+def _cache_hits(main) -> int:
+    # Semantic matches are then read through cache_service, so they are counted here too
+    stats = main.cache_service.stats()
+    return stats["memory"]["hits"] + stats["sqlite"]["hits"]
+
+
+def _reset(main, stub: StubRemote) -> None:
+    main.cache_service.clear()
+    if main.semantic_cache is not None:
+        main.semantic_cache.clear()
+    main.rag_service.clear_queue()
+    main.rag_service.router.reset()
+    stub.down = False
+    stub.calls = 0
+
+
+async def run_scenario(name: str, main, client, stub: StubRemote, questions: list, args, rng: random.Random) -> dict:
+    _reset(main, stub)
+    if name == "warm":
+        for q in dict.fromkeys(questions):
+            await client.post("/chat", json={"question": q, "k": args.k})
+        stub.calls = 0
+    if name == "remote_down":
+        stub.down = True
+
+    if name == "burst":
+        arrivals = burst_arrivals(args.rate, args.duration, args.burst_size, rng)
+    else:
+        arrivals = poisson_arrivals(args.rate, args.duration, rng)
+    picks = [rng.choice(questions) for _ in arrivals]
+
+    latencies, statuses, backends = [], Counter(), Counter()
+
+    async def one(question: str, scheduled: float):
+        try:
+            r = await client.post("/chat", json={"question": question, "k": args.k})
+            statuses[r.status_code] += 1
+            if r.status_code == 200:
+                backends[r.json().get("backend")] += 1
+        except Exception as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - scheduled)
+
+    hits_before = _cache_hits(main)
+    t0 = time.perf_counter()
+    tasks = []
+    for offset, question in zip(arrivals, picks):
+        delay = t0 + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(question, t0 + offset)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+
+    n = len(arrivals)
+    errors = sum(v for k, v in statuses.items() if k != 200) + backends.get("error", 0)
+    return {
+        "requests": n,
+        "offered_rps": n / args.duration if args.duration else 0.0,
+        "seconds": elapsed,
+        "throughput_rps": n / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+        "cache_hit_rate": (_cache_hits(main) - hits_before) / n if n else 0.0,
+        "error_rate": errors / n if n else 0.0,
+        "offline_rate": backends.get("remote-offline", 0) / n if n else 0.0,
+        "remote_calls": stub.calls,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "backends": dict(backends),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    from backend.app import main
+
+    rng = random.Random(args.seed)
+    stub = StubRemote(args.latency_ms, args.jitter_ms, args.failure_rate, random.Random(args.seed + 1))
+    questions = load_questions(args.questions)
+
+    main.rag_service._async_client = httpx.AsyncClient(transport=httpx.MockTransport(stub.handler))
+    await main.startup_event()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in args.scenarios:
+                results[name] = await run_scenario(name, main, client, stub, questions, args, rng)
+                print_row(name, results[name])
+    finally:
+        await main.shutdown_event()
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def print_header():
+    print(f"{'scenario':<12} {'req':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'hit%':>6} {'err%':>6} {'offl%':>6} {'remote':>7}")
+
+
+def print_row(name: str, r: dict):
+    print(f"{name:<12} {r['requests']:>6} {r['throughput_rps']:>8.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+          f"{r['p99_ms']:>9.1f} {r['cache_hit_rate'] * 100:>6.1f} {r['error_rate'] * 100:>6.1f} "
+          f"{r['offline_rate'] * 100:>6.1f} {r['remote_calls']:>7}")
+
+
+def compare(current: dict, baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    print(f"\nvs {baseline_path} (commit {baseline.get('meta', {}).get('commit', '?')}):")
+    for name, row in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        parts = []
+        for metric, better in COMPARE.items():
+            old, new = base.get(metric), row.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            flag = "!" if change * better < -10 else ""
+            parts.append(f"{metric} {old:.3g}->{new:.3g} ({change:+.0f}%){flag}")
+        print(f"  {name:<12} " + ", ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {SCENARIOS}")
+    parser.add_argument("--questions", choices=("eval", "log", "both"), default="both")
+    parser.add_argument("--rate", type=float, default=50.0, help="mean arrivals per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of arrivals per scenario")
+    parser.add_argument("--burst-size", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="stub remote mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of stub answers that are HTTP 500")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this path")
+    parser.add_argument("--compare", help="baseline results JSON to diff against")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+
+    # Isolate state and point the app at the stub before it is imported
+    workdir = tempfile.mkdtemp(prefix="load-bench-")
+    os.environ.setdefault("CACHE_DB_PATH", os.path.join(workdir, "cache.db"))
+    os.environ.setdefault("RAG_QUEUE_DB_PATH", os.path.join(workdir, "queue.db"))
+    os.environ.setdefault("LOGS_DIR", os.path.join(workdir, "logs"))
+    os.environ["RAG_REMOTE_URLS"] = STUB_URL
+    os.environ["RAG_MOCK"] = "false"
+    os.environ.setdefault("RAG_QUEUE_WORKER", "false")
+    os.environ.setdefault("RAG_HEALTH_INTERVAL", "0")
+
+    print_header()
+    scenarios = asyncio.run(run(args))
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+            "workdir": workdir,
+        },
+        "scenarios": scenarios,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
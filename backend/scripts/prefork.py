@@ -0,0 +1,173 @@
+"""Pre-fork server for rag_check.py: load the models once, fork workers that share them.
+
+`uvicorn --workers N` starts N fresh interpreters, and each one loads its own
+embedder, generator and index. This script instead:
+
+1. loads every component in the parent (`rag_check.preload()`);
+2. runs `gc.freeze()`, so the collector never writes to the inherited objects
+   and un-shares their pages;
+3. binds the listening socket and forks `--workers` children, each running
+   uvicorn on the shared socket. The kernel spreads connections across them.
+
+Model weights, the FAISS index (already mmap'ed with RAG_INDEX_MMAP) and the
+chunk store are then shared copy-on-write. An extra worker costs its private
+pages (USS), not another copy of the models. Each worker gets
+`cores // workers` torch / FAISS threads (`--threads`), so the workers do not
+oversubscribe the CPU. Dead workers are respawned. SIGTERM / SIGINT stop them
+all gracefully.
+
+Memory: `GET /memory` reports the worker that happened to answer. The parent
+logs RSS / PSS / USS for itself and every worker `--report-after` seconds after
+startup, and again on SIGUSR1. The sum of PSS is the box's real total.
+
+Usage:
+    cd backend/scripts
+    python prefork.py --workers 4 --port 8001
+    kill -USR1 <parent pid>     # memory report
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+RAG_WORKERS = int(os.getenv("RAG_WORKERS", str(os.cpu_count() or 1)))
+RAG_WORKER_THREADS = int(os.getenv("RAG_WORKER_THREADS", "0"))  # per worker; 0 = cores // workers
+
+logger = logging.getLogger("rag.prefork")
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def limit_threads(n: int) -> None:
+    """Cap intra-op threads of the libraries already loaded in this process."""
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(n)
+    if "faiss" in sys.modules:
+        sys.modules["faiss"].omp_set_num_threads(n)
+
+
+def serve(sock: socket.socket, args, threads: int) -> None:
+    """Child process: run uvicorn on the inherited socket until SIGTERM."""
+    import uvicorn
+    import rag_check
+
+    # Drop the parent's handlers: its `stop` would SIGTERM this worker's siblings. uvicorn installs its own.
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        signal.signal(signum, signal.SIG_DFL)
+    limit_threads(threads)
+    config = uvicorn.Config(rag_check.app, host=args.host, port=args.port, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def memory_report(children: dict) -> None:
+    from backend.services.worker_coordination import process_memory
+
+    rows = [("parent", process_memory())] + [(f"worker {slot}", process_memory(pid))
+                                             for pid, slot in sorted(children.items(), key=lambda c: c[1])]
+
+    def mb(value):
+        return f"{value / 1e6:9.1f}" if value is not None else "        -"
+
+    lines = [f"{'process':<10} {'pid':>7} {'rss MB':>9} {'pss MB':>9} {'uss MB':>9}"]
+    for name, mem in rows:
+        lines.append(f"{name:<10} {mem['pid']:>7} {mb(mem['rss_bytes'])} {mb(mem['pss_bytes'])} {mb(mem['uss_bytes'])}")
+    workers = [mem for name, mem in rows[1:] if mem["uss_bytes"] is not None]
+    if workers:
+        total_pss = sum(mem["pss_bytes"] or 0 for _, mem in rows)
+        per_worker = sum(mem["uss_bytes"] for mem in workers) / len(workers)
+        lines.append(f"total PSS {total_pss / 1e6:.1f} MB; each extra worker ~{per_worker / 1e6:.1f} MB (USS)")
+    logger.info("memory\n" + "\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=RAG_WORKERS)
+    parser.add_argument("--threads", type=int, default=RAG_WORKER_THREADS,
+                        help="torch / FAISS threads per worker (0 = cores // workers)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--report-after", type=float, default=10.0,
+                        help="seconds after startup to log per-process memory (0 = only on SIGUSR1)")
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+
+    import rag_check
+
+    t0 = time.perf_counter()
+    rag_check.preload()
+    logger.info(f"preloaded {rag_check.components.status()} in {time.perf_counter() - t0:.1f}s")
+    gc.collect()
+    gc.freeze()
+    sock = bind_socket(args.host, args.port)
+
+    children = {}  # pid -> slot
+    state = {"stopping": False, "report": False}
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            children.clear()  # the parent's bookkeeping; a worker supervises nobody
+            code = 0
+            try:
+                serve(sock, args, threads)
+            except BaseException:
+                logger.exception(f"worker {slot} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = slot
+
+    def stop(signum, frame):
+        state["stopping"] = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def request_report(signum, frame):
+        state["report"] = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, request_report)
+    for slot in range(workers):
+        spawn(slot)
+    logger.info(f"{workers} workers x {threads} threads on {args.host}:{args.port} (parent pid {os.getpid()})")
+
+    report_at = time.monotonic() + args.report_after if args.report_after > 0 else None
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            slot = children.pop(pid, None)
+            if slot is not None and not state["stopping"]:
+                logger.warning(f"worker {slot} (pid {pid}) exited with status {status}; respawning")
+                time.sleep(1.0)
+                spawn(slot)
+            continue
+        if state["report"] or (report_at is not None and time.monotonic() >= report_at):
+            state["report"], report_at = False, None
+            memory_report(children)
+        time.sleep(0.2)
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
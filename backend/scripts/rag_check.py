@@ -1,13 +1,14 @@
-import logging, os, json, pickle
-import numpy as np
-import faiss
-import torch
+import logging, os, sys, json, hashlib, threading, time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from googletrans import Translator
+from typing import List, Optional
+
+# Heavy libraries (torch, transformers, sentence-transformers, faiss, googletrans)
+# are imported inside the component loaders below, not at module import.
 
 # ---------------- CONFIG ----------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,52 +16,268 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 VECTOR_DIR = os.path.join(DATA_DIR, "vectorstore")
 CHUNKS_PATH = os.path.join(DATA_DIR, "chunks", "chunks.jsonl")
 
+# Micro-batching of /ask: one batched encode + search + generate per batch
+RAG_BATCHING = os.getenv("RAG_BATCHING", "true").lower() in {"1", "true", "yes", "y"}
+RAG_BATCH_MAX_SIZE = int(os.getenv("RAG_BATCH_MAX_SIZE", "8"))
+RAG_BATCH_MAX_WAIT_MS = float(os.getenv("RAG_BATCH_MAX_WAIT_MS", "10"))
+MAX_NEW_TOKENS = 200
+
+# Index selection (see index_builder.py): flat | ivf_flat | ivf_pq | hnsw
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+RAG_NPROBE = os.getenv("RAG_NPROBE")
+RAG_EF_SEARCH = os.getenv("RAG_EF_SEARCH")
+# Map the FAISS index instead of reading it into each worker's heap
+RAG_INDEX_MMAP = os.getenv("RAG_INDEX_MMAP", "true").lower() in {"1", "true", "yes", "y"}
+
+# Startup: load every component in a background thread (default), or only on first use
+RAG_LAZY_LOAD = os.getenv("RAG_LAZY_LOAD", "false").lower() in {"1", "true", "yes", "y"}
+EMBED_MODEL = os.getenv("RAG_EMBED_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+GEN_MODEL = os.getenv("RAG_GEN_MODEL", "google/flan-t5-small")
+
+# Hybrid retrieval (bm25_index.py): BM25 and dense candidates fused with reciprocal-rank fusion
+RAG_HYBRID = os.getenv("RAG_HYBRID", "false").lower() in {"1", "true", "yes", "y"}
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))  # per retriever, before fusion
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+# Context assembly (context_builder.py): token budget for the packed context; 0 (default) feeds the full chunks
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "0"))
+RAG_CONTEXT_SENTENCES = int(os.getenv("RAG_CONTEXT_SENTENCES", "4"))  # per chunk
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.8"))
+
+# Translation (backend/services/translation_service.py): none | offline | googletrans
+RAG_TRANSLATION_BACKEND = os.getenv("RAG_TRANSLATION_BACKEND", "googletrans")
+# Retrieve with the original Ge'ez question while it is being translated. Needs an
+# embedder that covers Amharic / Tigrinya (e.g. LaBSE); the default MiniLM does not.
+RAG_NATIVE_RETRIEVAL = os.getenv("RAG_NATIVE_RETRIEVAL", "false").lower() in {"1", "true", "yes", "y"}
+
+# Incremental ingestion (ingest.py): how often each worker checks for updated index / chunk files; 0 disables
+RAG_RELOAD_CHECK_SECONDS = float(os.getenv("RAG_RELOAD_CHECK_SECONDS", "10"))
+
+# Query-embedding cache (embedding_cache.py): entries, 0 disables; set a path to keep it across restarts
+RAG_EMBED_CACHE_SIZE = int(os.getenv("RAG_EMBED_CACHE_SIZE", "10000"))
+RAG_EMBED_CACHE_PATH = os.getenv("RAG_EMBED_CACHE_PATH", "")
+
+# sibling helper modules (inference executor, ...) live next to this script
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from inference_executor import InferenceExecutor, Overloaded, RAG_DEADLINE_MS
+from index_builder import index_path, get_search_params, set_search_params
+from chunk_store import STORE_DIR, _stamp, open_chunk_store
+from components import READY, ComponentRegistry, thread_load_seconds
+from bm25_index import open_bm25_index, rrf_fuse
+from ingest import INGEST_LOCK, deleted_ids, ingest, status as ingest_status
+
+# shared metrics primitives from backend/services (pure stdlib)
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from backend.services.metrics_service import REGISTRY, CONTENT_TYPE, METRICS_ENABLED, stage
+from backend.services.tracing_service import span, start_trace
+from backend.services.translation_service import LOCAL_LANGUAGES, TranslationService, detect_language
+from embedding_cache import EmbeddingCache
+from context_builder import build_contexts
+from backend.services.worker_coordination import FileLock, memory_samples, process_memory
+
 # ---------------- LOGGING ----------------
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("rag")
 
-# ---------------- LOAD DATA ----------------
-chunk_texts = []
-with open(CHUNKS_PATH, "r", encoding="utf-8") as f:
-    for line in f:
-        chunk_texts.append(json.loads(line)["text"])
+# ---------------- COMPONENTS ----------------
+def _load_chunks():
+    # mmap-backed store: texts / metadata are decoded only for the top-k hits
+    store = open_chunk_store(STORE_DIR, CHUNKS_PATH, os.path.join(VECTOR_DIR, "metadata.pkl"))
+    logger.info(f"Loaded {len(store)} chunks")
+    return store
 
-with open(os.path.join(VECTOR_DIR, "metadata.pkl"), "rb") as f:
-    metadatas = pickle.load(f)
+def read_index(path):
+    import faiss
 
-index = faiss.read_index(os.path.join(VECTOR_DIR, "faiss_index"))
+    if RAG_INDEX_MMAP:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except Exception as e:
+            logger.warning(f"mmap load of {path} failed ({e}); reading into memory")
+    return faiss.read_index(path)
 
-logger.info(f"Loaded {len(chunk_texts)} chunks")
+def _load_index():
+    global _deleted, _loaded_version
+    _loaded_version = corpus_version()
+    _deleted = deleted_ids()
+    idx = read_index(index_path(RAG_INDEX_TYPE, VECTOR_DIR))
+    set_search_params(idx, nprobe=RAG_NPROBE, ef_search=RAG_EF_SEARCH)
+    logger.info(f"Loaded {RAG_INDEX_TYPE} index: {idx.ntotal} vectors {get_search_params(idx)}")
+    return idx
 
-# ---------------- MODELS ----------------
-embed_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+def _load_bm25():
+    bm25 = open_bm25_index(chunks_path=CHUNKS_PATH)
+    logger.info(f"Loaded BM25 index: {len(bm25)} chunks, {bm25.manifest['terms']} terms")
+    return bm25
 
-tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-small")
-llm = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-small")
-llm.eval()
+def _load_embedder():
+    from sentence_transformers import SentenceTransformer
 
-translator = Translator()
+    return SentenceTransformer(EMBED_MODEL)
+
+def _load_generator():
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    tok = AutoTokenizer.from_pretrained(GEN_MODEL)
+    model = AutoModelForSeq2SeqLM.from_pretrained(GEN_MODEL)
+    model.eval()
+    return tok, model
+
+def _load_translator():
+    # Batched, cached segments; googletrans is imported by its backend
+    return TranslationService(RAG_TRANSLATION_BACKEND)
+
+components = ComponentRegistry()
+_deleted = frozenset()  # tombstoned chunk ids (ingest.py); a positional index (HNSW) still returns them
+_loaded_version = None  # corpus_version() when the live index was read
+embed_cache = EmbeddingCache(RAG_EMBED_CACHE_SIZE, EMBED_MODEL, RAG_EMBED_CACHE_PATH or None) if RAG_EMBED_CACHE_SIZE > 0 else None
+CONTEXT_TOKENS = REGISTRY.histogram(
+    "rag_context_tokens", "Context tokens per question: retrieved chunks (full) vs packed prompt context",
+    ["kind"], buckets=(32, 64, 128, 256, 384, 512, 768, 1024, 2048, 4096)
+)
+if embed_cache is not None:
+    REGISTRY.callback("embed_cache_lookups_total", "Query-embedding cache lookups", "counter",
+                      lambda: [({"result": "hit"}, embed_cache.hits), ({"result": "miss"}, embed_cache.misses)],
+                      ["result"])
+    REGISTRY.callback("embed_cache_encode_seconds_saved_total",
+                      "Estimated encoder time avoided by query-embedding cache hits", "counter",
+                      lambda: [({}, embed_cache.seconds_saved())])
+REGISTRY.callback("process_memory_bytes", "This worker's memory: rss, pss, uss (private) and shared", "gauge",
+                  memory_samples, ["kind"])
+components.register("index", _load_index)
+components.register("chunks", _load_chunks)
+if RAG_HYBRID:
+    components.register("bm25", _load_bm25)
+components.register("embedder", _load_embedder)
+components.register("generator", _load_generator)
+components.register("translator", _load_translator)
+
+def get_index():
+    return components.get("index")
+
+def get_chunks():
+    return components.get("chunks")
+
+def get_bm25():
+    return components.get("bm25") if RAG_HYBRID else None
+
+def get_embedder():
+    return components.get("embedder")
+
+def get_generator():
+    """(tokenizer, model)"""
+    return components.get("generator")
+
+def get_translator():
+    return components.get("translator")
 
 # ---------------- HELPERS ----------------
-def is_geez(text):
-    return any('\u1200' <= c <= '\u137F' for c in text)
+_translation_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-translate")
+
+def to_en(text, lang="am"):
+    translator = get_translator()
+    with stage("translate"):
+        return translator.translate_to_english(text, lang)
 
-def to_en(text):
-    return translator.translate(text, dest="en").text
+def from_en(text, lang="am"):
+    translator = get_translator()
+    with stage("translate"):
+        return translator.translate_from_english(text, lang)
 
-def from_en(text):
-    return translator.translate(text, dest="am").text
+def prepare_question(question, k):
+    """(english_question, language, ids or None) for an incoming question.
+
+    Ge'ez-script questions are translated. With RAG_NATIVE_RETRIEVAL the
+    retrieval runs on the original text while the translation is in flight,
+    and the ids are returned; otherwise retrieval is left to the caller.
+    """
+    lang = detect_language(question)
+    if lang not in LOCAL_LANGUAGES:
+        return question, lang, None
+    if not RAG_NATIVE_RETRIEVAL:
+        return to_en(question, lang), lang, None
+    # copy_context: the translation's span lands in this request's trace
+    pending = _translation_pool.submit(contextvars.copy_context().run, to_en, question, lang)
+    ids = retrieve_ids(question, k)
+    return pending.result(), lang, ids
+
+def embed_queries(queries):
+    """float32 query embeddings; cached queries skip the encoder."""
+    embedder = get_embedder()
+
+    def encode(texts):
+        return embedder.encode(texts, convert_to_numpy=True, batch_size=len(texts)).astype("float32")
+
+    if embed_cache is None:
+        return encode(list(queries))
+    return embed_cache.encode(queries, encode)
+
+def retrieve_ids_batch(queries, ks):
+    """One batched encode (cache misses only) and one FAISS search over the whole query matrix.
+
+    With RAG_HYBRID, each retriever returns RAG_HYBRID_CANDIDATES ids and the
+    top k of their reciprocal-rank fusion are kept.
+    """
+    import faiss
+
+    index, bm25, deleted = get_index(), get_bm25(), _deleted
+    depth = max(ks) if bm25 is None else max(max(ks), RAG_HYBRID_CANDIDATES)
+    with stage("embed"):
+        q_emb = embed_queries(queries)
+        faiss.normalize_L2(q_emb)
+    with stage("search"):
+        # Over-fetch so that dropping tombstoned hits still leaves `depth` results
+        D, I = index.search(q_emb, depth + min(len(deleted), depth))
+    dense = [[int(idx) for idx in row if idx >= 0 and int(idx) not in deleted][:depth] for row in I]
+    if bm25 is None:
+        return [ids[:k] for ids, k in zip(dense, ks)]
+    with stage("bm25"):
+        sparse = bm25.search_batch(queries, depth)
+        return [rrf_fuse([d, s], k, RAG_RRF_K) for d, s, k in zip(dense, sparse, ks)]
+
+def retrieve_ids(query, k=5):
+    return retrieve_ids_batch([query], [k])[0]
 
 def retrieve(query, k=5):
-    q_emb = embed_model.encode([query], convert_to_numpy=True).astype("float32")
-    faiss.normalize_L2(q_emb)
-    D, I = index.search(q_emb, k)
-
-    results = []
-    for idx in I[0]:
-        if idx >= 0:
-            results.append(chunk_texts[idx])
-    return results
+    ids = retrieve_ids(query, k)
+    chunks = get_chunks()  # after the search: a hot swap installs the new store before the new index
+    return [chunks.text(idx) for idx in ids]
+
+def source_for(idx):
+    chunks = get_chunks()
+    return {"text": chunks.text(idx), "metadata": chunks.metadata(idx)}
+
+def count_tokens(texts):
+    """Generator-tokenizer lengths; whitespace words when the generator is not loaded."""
+    if components["generator"].state == READY:
+        tokenizer, _ = get_generator()
+        return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+    return [len(t.split()) for t in texts]
+
+def assemble_contexts(questions, id_lists):
+    """Per question: {"contexts", "tokens", "tokens_full", "chunks_dropped"} (see context_builder.py).
+
+    With packing off the chunks go in whole and are not tokenized here, so both counts are None.
+    """
+    chunks = get_chunks()
+    chunk_lists = [[chunks.text(i) for i in ids] for ids in id_lists]
+    if RAG_CONTEXT_TOKENS <= 0:
+        return [{"contexts": texts, "tokens": None, "tokens_full": None, "chunks_dropped": 0} for texts in chunk_lists]
+    with stage("context"):
+        embedder = get_embedder()
+        packed = build_contexts(
+            embed_queries(questions), chunk_lists,
+            lambda texts: embedder.encode(texts, convert_to_numpy=True, batch_size=64),
+            count_tokens, RAG_CONTEXT_TOKENS, RAG_CONTEXT_SENTENCES, RAG_DEDUP_THRESHOLD,
+        )
+    for p, texts in zip(packed, chunk_lists):
+        if texts:
+            CONTEXT_TOKENS.observe(p["tokens_full"], kind="full")
+            CONTEXT_TOKENS.observe(p["tokens"], kind="packed")
+    return packed
 
 def build_prompt(contexts, question):
     ctx = "\n\n".join(contexts)
@@ -78,17 +295,128 @@ ANSWER:
 """
 
 def answer_question(question, k=5):
-    contexts = retrieve(question, k)
-    if not contexts:
-        return "No relevant documents found."
+    return answer_with_sources(question, k)[0]
+
+def answer_with_sources(question, k=5, ids=None):
+    return answer_batch([(question, k, ids)])[0]
+
+def answer_batch(items):
+    """Answer [(question, k[, ids]), ...] with batched encode, search and padded generate.
+
+    Items that carry retrieved `ids` skip retrieval. Returns [(answer, sources), ...]
+    in the same order.
+    """
+    questions = [item[0] for item in items]
+    id_lists = [item[2] if len(item) > 2 else None for item in items]
+    todo = [row for row, ids in enumerate(id_lists) if ids is None]
+    if todo:
+        found = retrieve_ids_batch([questions[row] for row in todo], [items[row][1] for row in todo])
+        for row, ids in zip(todo, found):
+            id_lists[row] = ids
+    answers = generate_batch(questions, id_lists)
+    return [(ans, [source_for(i) for i in ids]) for ans, ids in zip(answers, id_lists)]
+
+def generate_batch(questions, id_lists, packed=None):
+    """One padded generate over the questions that retrieved something.
+
+    `packed` is `assemble_contexts(questions, id_lists)` when the caller already has it.
+    """
+    results = ["No relevant documents found." for _ in questions]
+    rows = [row for row, ids in enumerate(id_lists) if ids]
+    if not rows:
+        return results
+
+    import torch
+
+    tokenizer, llm = get_generator()
+    if packed is None:
+        packed = assemble_contexts(questions, id_lists)
+    with stage("prompt"):
+        prompts = [build_prompt(packed[row]["contexts"], questions[row]) for row in rows]
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=1024)
+
+    with torch.no_grad(), stage("generate"):
+        out = llm.generate(**inputs, max_new_tokens=MAX_NEW_TOKENS)
 
-    prompt = build_prompt(contexts, question)
+    for row, text in zip(rows, tokenizer.batch_decode(out, skip_special_tokens=True)):
+        results[row] = text
+    return results
+
+def answer_batch_traced(items):
+    """`answer_batch` that also returns the batch's stage spans with every result."""
+    with start_trace(None, "batch", size=len(items)) as trace:
+        results = answer_batch(items)
+    spans = trace.spans if trace is not None else []
+    return [(ans, sources, spans) for ans, sources in results]
+
+# Bounded model workers: micro-batches, admission control, deadlines (inference_executor.py)
+executor = InferenceExecutor(
+    answer_batch_traced,
+    max_batch_size=RAG_BATCH_MAX_SIZE if RAG_BATCHING else 1,
+    max_wait_ms=RAG_BATCH_MAX_WAIT_MS if RAG_BATCHING else 0.0,
+    setup_seconds=thread_load_seconds,
+)
+INFERENCE_SECONDS = REGISTRY.histogram("rag_inference_seconds", "Per request: waiting for a model worker vs computing",
+                                       ["phase"])
+REGISTRY.callback("rag_inference_rejected_total", "Requests refused by admission control or expired in the queue",
+                  "counter", lambda: [({"reason": r}, n) for r, n in executor.rejected.items()]
+                  + [({"reason": "expired"}, executor.expired)], ["reason"])
+REGISTRY.callback("rag_inference_queue_depth", "Jobs waiting for a model worker", "gauge",
+                  lambda: [({}, executor.stats()["queued"])])
+
+def stream_answer(question, k=5, ids=None, deadline=None):
+    """Yield ("sources", [...]) then ("token", text) pieces as flan-t5 decodes.
+
+    The generate runs in an executor worker slot; `Overloaded` is raised if it is refused.
+    """
+    if ids is None:
+        ids = retrieve_ids(question, k)
+    yield "sources", [source_for(i) for i in ids]
+    if not ids:
+        yield "token", "No relevant documents found."
+        return
+
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+    tokenizer, llm = get_generator()
+    prompt = build_prompt(assemble_contexts([question], [ids])[0]["contexts"], question)
     inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1024)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    abandoned = threading.Event()
+
+    class _Abandoned(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), abandoned.is_set(), dtype=torch.bool, device=input_ids.device)
+
+    def _generate():
+        with torch.no_grad(), stage("generate"):
+            llm.generate(**inputs, max_new_tokens=MAX_NEW_TOKENS, streamer=streamer,
+                         stopping_criteria=StoppingCriteriaList([_Abandoned()]))
 
-    with torch.no_grad():
-        out = llm.generate(**inputs, max_new_tokens=200)
+    def _failed(f):
+        return f.cancelled() or f.exception() is not None
 
-    return tokenizer.decode(out[0], skip_special_tokens=True)
+    ctx = contextvars.copy_context()  # the generate span lands in this request's trace
+    job = executor.call(lambda: ctx.run(_generate), deadline)
+    # A generate that fails, expires or is cancelled in the queue never ends the stream itself
+    job.future.add_done_callback(lambda f: _failed(f) and streamer.end())
+    try:
+        for text in streamer:
+            if text:
+                yield "token", text
+    except GeneratorExit:
+        # Client disconnected: drop the job if still queued, else stop decoding at the next token
+        abandoned.set()
+        job.future.cancel()
+        raise
+    if job.future.cancelled():
+        raise Overloaded("deadline", executor.retry_after())
+    if job.future.exception() is not None:
+        raise job.future.exception()
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 # ---------------- FASTAPI ----------------
 app = FastAPI()
@@ -96,23 +424,275 @@ app = FastAPI()
 class AskReq(BaseModel):
     question: str
     k: int = 5
+    deadline_ms: Optional[float] = None  # default RAG_DEADLINE_MS
+
+class IndexParams(BaseModel):
+    nprobe: Optional[int] = None
+    efSearch: Optional[int] = None
+
+class IngestReq(BaseModel):
+    documents: List[dict] = []  # {"doc_id", "text", ...metadata}
+    remove: List[str] = []  # doc_ids
+    dry_run: bool = False
+
+_preloaded = False
+
+def preload():
+    """Load every component in this process now (prefork.py, before forking the workers)."""
+    global _preloaded
+    if embed_cache is not None and embed_cache.path:
+        logger.info(f"Restored {embed_cache.load()} cached query embeddings from {embed_cache.path}")
+    components.load_all()
+    _preloaded = True
+
+@app.on_event("startup")
+def startup():
+    start_reload_watcher()  # per worker: threads do not survive the pre-fork
+    if _preloaded:
+        return  # inherited from the pre-fork parent
+    if embed_cache is not None and embed_cache.path:
+        logger.info(f"Restored {embed_cache.load()} cached query embeddings from {embed_cache.path}")
+    if not RAG_LAZY_LOAD:
+        components.start_background()
+
+@app.on_event("shutdown")
+def shutdown():
+    if embed_cache is not None and embed_cache.path:
+        try:
+            embed_cache.save()
+        except Exception as e:
+            logger.warning(f"Could not save the query-embedding cache: {e}")
+
+def _deadline(req):
+    return time.monotonic() + (req.deadline_ms or RAG_DEADLINE_MS) / 1000.0
+
+def _overloaded(e: Overloaded):
+    return JSONResponse({"detail": str(e), "reason": e.reason}, status_code=503,
+                        headers={"Retry-After": str(int(e.retry_after))})
 
 @app.post("/ask")
 def ask(req: AskReq):
-    q = req.question
-    am = False
+    """Answer one question; stage timings (incl. queue_wait / compute) are returned in `Server-Timing`.
+
+    503 + Retry-After when the inference queue is full or the answer would miss the deadline.
+    """
+    deadline = _deadline(req)
+    with start_trace(None, "ask") as trace:
+        try:
+            # Refuse before translating when the queue is already hopeless
+            executor.check(deadline)
+            q, lang, ids = prepare_question(req.question, req.k)
+            # Includes the wait for a model worker and for the batch to fill; the batch's own stages follow
+            submitted_ms = trace.elapsed_ms() if trace is not None else 0.0
+            with span("batch"):
+                job = executor.submit((q, req.k, ids), deadline)
+                ans, sources, batch_spans = job.result()
+        except Overloaded as e:
+            return _overloaded(e)
+        INFERENCE_SECONDS.observe(job.queue_wait, phase="queue_wait")
+        INFERENCE_SECONDS.observe(job.compute, phase="compute")
+        if trace is not None:
+            trace.add_span("queue_wait", submitted_ms, job.queue_wait * 1000.0, depth=1)
+            trace.add_span("compute", submitted_ms + job.queue_wait * 1000.0, job.compute * 1000.0, depth=1)
+            trace.extend(batch_spans, prefix="batch.")
+
+        if lang in LOCAL_LANGUAGES:
+            ans = from_en(ans, lang)
+
+    headers = {"Server-Timing": trace.server_timing()} if trace is not None and trace.spans else None
+    return JSONResponse({"answer": ans, "sources": sources}, headers=headers)
+
+@app.post("/ask/stream")
+def ask_stream(req: AskReq):
+    """Server-Sent Events: sources first, then answer tokens, then done.
 
-    if is_geez(q):
-        q = to_en(q)
-        am = True
+    503 + Retry-After up front when overloaded; an `error` event if the generate is refused later.
+    """
+    deadline = _deadline(req)
+    try:
+        executor.check(deadline)
+    except Overloaded as e:
+        return _overloaded(e)
 
-    ans = answer_question(q, req.k)
+    def events():
+        q, lang, ids = prepare_question(req.question, req.k)
+        local = lang in LOCAL_LANGUAGES
+        pieces = []
+        stream = stream_answer(q, req.k, ids, deadline)
+        try:
+            for kind, data in stream:
+                if kind == "sources":
+                    yield sse("sources", data)
+                else:
+                    pieces.append(data)
+                    # Ge'ez questions are answered once, after translating back
+                    if not local:
+                        yield sse("token", data)
+        except Overloaded as e:
+            yield sse("error", {"detail": str(e), "reason": e.reason, "retry_after": e.retry_after})
+            return
+        finally:
+            stream.close()  # on disconnect Starlette closes this generator; pass that on to the generate
+        if local:
+            yield sse("token", from_en("".join(pieces), lang))
+        yield sse("done", {"backend": "remote"})
 
-    if am:
-        ans = from_en(ans)
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
-    return {"answer": ans}
+def corpus_version() -> str:
+    """Fingerprint of everything an answer depends on: chunk file, index, models, prompt budget.
+
+    The API's cache warmer regenerates its precomputed answers when this changes.
+    """
+    parts = {
+        "chunks": _stamp(CHUNKS_PATH),
+        "index": _stamp(index_path(RAG_INDEX_TYPE, VECTOR_DIR)),
+        "index_type": RAG_INDEX_TYPE,
+        "embed_model": EMBED_MODEL,
+        "gen_model": GEN_MODEL,
+        "hybrid": RAG_HYBRID,
+        "context_tokens": RAG_CONTEXT_TOKENS,
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+_reload_lock = threading.Lock()
+_watcher = None
+RELOADS = REGISTRY.counter("rag_corpus_reloads_total", "Hot swaps of the index / chunk store after an ingest")
+
+def reload_corpus(force=False):
+    """Hot-swap the chunk store, BM25 and the index when their files changed on disk (ingest.py).
+
+    Returns True when swapped. Requests already running keep the objects they
+    hold; the old maps are released when the last of them finishes. Ids are
+    append-only, so the new store is installed first: a request that searched
+    the old index still finds its ids in it.
+    """
+    global _deleted, _loaded_version
+    with _reload_lock:
+        lock = FileLock(INGEST_LOCK)
+        if not lock.acquire(blocking=False):
+            return False  # an ingest is writing; its own reload (or the next check) picks it up
+        try:
+            version = corpus_version()
+            if version == _loaded_version and not force:
+                return False
+            chunks = _load_chunks()
+            bm25 = _load_bm25() if RAG_HYBRID else None
+            deleted = deleted_ids()
+            idx = read_index(index_path(RAG_INDEX_TYPE, VECTOR_DIR))
+            params = get_search_params(get_index()) if components["index"].state == READY else {}
+            set_search_params(idx, nprobe=params.get("nprobe", RAG_NPROBE), ef_search=params.get("efSearch", RAG_EF_SEARCH))
+        finally:
+            lock.release()
+        components.set("chunks", chunks)
+        if bm25 is not None:
+            components.set("bm25", bm25)
+        _deleted = deleted
+        components.set("index", idx)
+        _loaded_version = version
+    RELOADS.inc()
+    logger.info(f"Reloaded corpus {version}: {len(chunks)} chunks, {idx.ntotal} vectors, {len(deleted)} tombstones")
+    return True
+
+def _watch_corpus():
+    while True:
+        time.sleep(RAG_RELOAD_CHECK_SECONDS)
+        if components["index"].state != READY or components["chunks"].state != READY:
+            continue
+        try:
+            reload_corpus()
+        except Exception:
+            logger.exception("corpus reload failed; still serving the previous index")
+
+def start_reload_watcher():
+    global _watcher
+    if RAG_RELOAD_CHECK_SECONDS > 0 and _watcher is None:
+        _watcher = threading.Thread(target=_watch_corpus, name="rag-reload", daemon=True)
+        _watcher.start()
+
+if hasattr(os, "register_at_fork"):
+    # The parent's watcher thread is not inherited; the child starts its own at startup
+    os.register_at_fork(after_in_child=lambda: globals().update(_watcher=None))
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    """Liveness: answers as soon as the process is up, before any model is loaded."""
+    return {"status": "ok", "corpus_version": corpus_version()}
+
+@app.get("/ready")
+def ready():
+    """Readiness per component (index, chunks, [bm25,] embedder, generator, translator); 503 until all are loaded."""
+    body = {"ready": components.ready(), "lazy": RAG_LAZY_LOAD, "components": components.status()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/index/params")
+def index_params():
+    idx = get_index()
+    return {"index_type": RAG_INDEX_TYPE, "ntotal": int(idx.ntotal), **get_search_params(idx)}
+
+@app.post("/index/params")
+def update_index_params(params: IndexParams):
+    """Tune nprobe (IVF) / efSearch (HNSW) at runtime; unsupported knobs are ignored."""
+    set_search_params(get_index(), nprobe=params.nprobe, ef_search=params.efSearch)
+    return index_params()
+
+@app.post("/ingest")
+def ingest_documents(req: IngestReq):
+    """Add / replace / remove documents without a restart; only new chunk texts are embedded.
+
+    This worker swaps in the new index at once; other workers follow within RAG_RELOAD_CHECK_SECONDS.
+    """
+    embedder = get_embedder()
+
+    def encode(texts):
+        # In a model worker slot, so ingest embeddings queue with (not against) inference;
+        # a bulk encode is not a request, so it stays out of the batch time estimate
+        job = executor.call(lambda: embedder.encode(texts, convert_to_numpy=True, batch_size=64), estimate=False)
+        return job.result()
+
+    try:
+        report = ingest(req.documents, req.remove, encode_fn=encode, dry_run=req.dry_run)
+    except Overloaded as e:
+        return _overloaded(e)
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=422)
+    if not req.dry_run:
+        report["reloaded"] = reload_corpus(force=True)
+    return report
+
+@app.get("/ingest")
+def ingest_state():
+    """Chunk / document / tombstone counts on disk, and what this worker is serving."""
+    idx, chunks = get_index(), get_chunks()
+    return {**ingest_status(), "serving": {"corpus_version": _loaded_version,
+                                          "chunks": len(chunks), "vectors": int(idx.ntotal)}}
+
+@app.post("/reload")
+def reload():
+    """Swap in index / chunk files rebuilt out of band (ingest.py CLI, index_builder.py)."""
+    return {"reloaded": reload_corpus(force=True), "corpus_version": _loaded_version}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text: embed / search / prompt / generate / translate latency per batch."""
+    if not METRICS_ENABLED:
+        return JSONResponse({"detail": "Metrics disabled"}, status_code=404)
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/memory")
+def memory():
+    """This worker's RSS / PSS / USS; USS is what each extra pre-forked worker costs."""
+    return process_memory()
+
+@app.get("/embed_cache")
+def embed_cache_status():
+    return embed_cache.stats() if embed_cache is not None else {"enabled": False}
+
+@app.get("/inference")
+def inference_status():
+    """Model workers, queue depth, admissions / rejections and the batch time estimate."""
+    return executor.stats()
+
+@app.get("/batching")
+def batching_status():
+    return {"enabled": RAG_BATCHING, **executor.stats()}
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""Cache-key hit-rate benchmark over evaluation/questions.jsonl.
+
+Seeds a cache with every evaluation question, then asks surface variants and
+paraphrases of them and reports how often each key strategy hits:
+
+- raw:        the old `f"{question}_{k}_{translate_local}"` key
+- normalized: `make_cache_key` (case / whitespace / punctuation / Ge'ez folding)
+- semantic:   `SemanticCacheService` at several cosine thresholds
+
+False hits are measured leave-one-out: each question is looked up against a
+cache seeded with all the *other* questions, so any semantic hit is wrong.
+
+Usage:
+    python backend/scripts/semantic_cache_bench.py [--embedder hashing|model] [--json out.json]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from backend.services.semantic_cache_service import (  # noqa: E402
+    HashingEmbedder,
+    SemanticCacheService,
+    SentenceTransformerEmbedder,
+)
+from backend.services.text_normalization import normalize_question  # noqa: E402
+
+QUESTIONS_PATH = os.path.join(ROOT_DIR, "evaluation", "questions.jsonl")
+THRESHOLDS = (0.80, 0.85, 0.90, 0.92, 0.95)
+
+# Light paraphrase rules; the first matching rule is applied
+PARAPHRASES = [
+    (r"^How do I ", "How to "),
+    (r"^How can farmers ", "How do farmers "),
+    (r"^How should ", "How must "),
+    (r"^What are the ", "Which are the "),
+    (r"^What are ", "Which are "),
+    (r"^Which ", "What "),
+    (r"^What is the ", "What's the "),
+    (r"^When is the best ", "When's the best "),
+    (r"^When should ", "When do you "),
+    (r"^Does ", "Will "),
+    (r"^Is ", "Would you say "),
+    (r"^Can I ", "Is it possible to "),
+]
+
+
+def load_questions(path: str = QUESTIONS_PATH) -> list:
+    questions = []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                questions.append(json.loads(line)["question"])
+    return questions
+
+
+def surface_variants(q: str) -> list:
+    """Variants that differ only in case, spacing and punctuation."""
+    stripped = q.rstrip("?").strip()
+    return [q.lower(), stripped, f"  {stripped} ?", stripped.upper() + "?"]
+
+
+def paraphrase(q: str) -> str:
+    for pattern, repl in PARAPHRASES:
+        if re.search(pattern, q):
+            return re.sub(pattern, repl, q, count=1)
+    return "Please tell me: " + q
+
+
+def run(embedder, questions: list) -> dict:
+    raw_keys = set(questions)
+    norm_keys = {normalize_question(q) for q in questions}
+    surface = [(q, v) for q in questions for v in surface_variants(q)]
+    para = [(q, paraphrase(q)) for q in questions]
+
+    report = {
+        "questions": len(questions),
+        "surface_variants": len(surface),
+        "paraphrases": len(para),
+        "raw": {
+            "surface_hit_rate": sum(v in raw_keys for _, v in surface) / len(surface),
+            "paraphrase_hit_rate": sum(p in raw_keys for _, p in para) / len(para),
+        },
+        "normalized": {
+            "surface_hit_rate": sum(normalize_question(v) in norm_keys for _, v in surface) / len(surface),
+            "paraphrase_hit_rate": sum(normalize_question(p) in norm_keys for _, p in para) / len(para),
+        },
+        "semantic": {},
+    }
+
+    for threshold in THRESHOLDS:
+        cache = SemanticCacheService(embedder=embedder, threshold=threshold, max_entries=len(questions))
+        for q in questions:
+            cache.add(normalize_question(q), "3_False", q)
+        correct = 0
+        for q, p in para:
+            match = cache.lookup(normalize_question(p), "3_False")
+            correct += bool(match and match[0] == q)
+
+        false_hits = 0
+        for held_out in questions:
+            loo = SemanticCacheService(embedder=embedder, threshold=threshold, max_entries=len(questions))
+            for q in questions:
+                if q != held_out:
+                    loo.add(normalize_question(q), "3_False", q)
+            false_hits += bool(loo.lookup(normalize_question(held_out), "3_False"))
+
+        report["semantic"][str(threshold)] = {
+            "paraphrase_hit_rate": correct / len(para),
+            "false_hit_rate": false_hits / len(questions),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embedder", choices=["hashing", "model"], default="hashing")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--json", help="write the report to this path")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder() if args.embedder == "hashing" else SentenceTransformerEmbedder()
+    report = run(embedder, load_questions(args.questions))
+    report["embedder"] = args.embedder
+
+    print(f"{report['questions']} questions, {report['surface_variants']} surface variants, "
+          f"{report['paraphrases']} paraphrases ({args.embedder} embedder)")
+    for name in ("raw", "normalized"):
+        r = report[name]
+        print(f"  {name:<12} surface hit {r['surface_hit_rate']:.0%}  paraphrase hit {r['paraphrase_hit_rate']:.0%}")
+    for threshold, r in report["semantic"].items():
+        print(f"  semantic@{threshold:<4} paraphrase hit {r['paraphrase_hit_rate']:.0%}  "
+              f"false hit {r['false_hit_rate']:.0%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Precompute answers for the most frequent questions before peak season.
+
+Mines the query logs (live and rotated) and evaluation/questions.jsonl,
+answers the top questions through the API's own `/chat` pipeline (same
+translation, RAG remote, cache keys and SQLite cache as the server), and
+records the corpus version they were generated from. The API does the same at
+startup (WARM_CACHE_ON_STARTUP). This script runs it ahead of a deploy, or
+shows what would be warmed.
+
+Run it with the same environment as the API (RAG_REMOTE_URL(S), CACHE_DB_PATH,
+LOGS_DIR, ...), so the answers land in the cache the API reads.
+
+Usage:
+    python backend/scripts/warm_cache.py --dry-run --top 20
+    python backend/scripts/warm_cache.py --top 300 --min-count 2
+    python backend/scripts/warm_cache.py --force      # regenerate even if the version is unchanged
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+async def run(args) -> dict:
+    from backend.app import main
+    from backend.services.warm_cache import CacheWarmer, mine_questions, query_log_paths
+
+    questions = mine_questions(query_log_paths(main.LOGS_DIR), top_n=args.top, min_count=args.min_count)
+    if args.dry_run:
+        return {"questions": [{"question": q, "count": c} for q, c in questions]}
+
+    await main.rag_service.initialize()
+    if not main.rag_service.remote_mode:
+        await main.rag_service.close()
+        return {"skipped": "no RAG remote configured (mock mode); mock answers are not warmed"}
+    try:
+        warmer = CacheWarmer(main.cache_service, main._answer_question, main.rag_service.corpus_version,
+                             lambda: questions, k=args.k, translate_local=args.translate_local,
+                             concurrency=args.concurrency)
+        if args.force:
+            return await warmer.warm()
+        ran = await warmer.refresh_if_stale()
+        return warmer.last_run if ran else {"skipped": "answers are current (or the corpus version is unknown)",
+                                            "manifest": {k: v for k, v in (await warmer.manifest() or {}).items() if k != "keys"}}
+    finally:
+        await main.rag_service.close()
+        await asyncio.to_thread(main.sqlite_store.close_all)
+        await asyncio.to_thread(main.logging_service.close)
+
+
+def main():
+    from backend.services.warm_cache import WARM_CACHE_CONCURRENCY, WARM_CACHE_K, WARM_CACHE_MIN_COUNT, WARM_CACHE_TOP_N
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=WARM_CACHE_TOP_N, help="questions to warm")
+    parser.add_argument("--min-count", type=int, default=WARM_CACHE_MIN_COUNT,
+                        help="log occurrences a question needs (evaluation questions always qualify)")
+    parser.add_argument("--k", type=int, default=WARM_CACHE_K)
+    parser.add_argument("--translate-local", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=WARM_CACHE_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true", help="list the mined questions and exit")
+    parser.add_argument("--force", action="store_true", help="regenerate even if the corpus version is unchanged")
+    args = parser.parse_args()
+
+    # This process warms explicitly; no startup hooks run here
+    os.environ["WARM_CACHE_ON_STARTUP"] = "false"
+    os.environ.setdefault("RAG_QUEUE_WORKER", "false")
+    result = asyncio.run(run(args))
+    if args.dry_run:
+        for row in result["questions"]:
+            print(f"{row['count']:>6}  {row['question']}")
+        print(f"{len(result['questions'])} questions")
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
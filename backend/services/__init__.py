@@ -5,4 +5,14 @@ __all__ = [
     "translation_service",
     "logging_service",
     "cache_service",
+    "coalescing_service",
+    "semantic_cache_service",
+    "sqlite_store",
+    "text_normalization",
+    "queue_worker",
+    "remote_router",
+    "metrics_service",
+    "tracing_service",
+    "warm_cache",
+    "worker_coordination",
 ]
@@ -1,21 +1,122 @@
-"""Simple SQLite-backed key-value cache for small JSON blobs."""
+"""Two-tier cache for small JSON blobs.
+
+- Memory tier: bounded LRU (entry count and bytes) of already-decoded values.
+- SQLite tier: persistent key-value store with TTL expiry on `updated_at` and
+  max-rows / max-bytes eviction run periodically in a background thread.
+  Access goes through the shared `SQLiteStore` (WAL, pooled connections,
+  group-committed writes); `aget` / `aset` keep SQLite off the event loop.
+"""
 import os
 import json
+import time
 import sqlite3
+import threading
+from collections import OrderedDict
 from typing import Optional
 
+from backend.services.sqlite_store import get_store
+
+
+DB_PATH = os.getenv("CACHE_DB_PATH") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend_cache.db"))
+
+# Memory tier bounds
+CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "2048"))
+CACHE_MEMORY_MAX_BYTES = int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(32 * 1024 * 1024)))
+# SQLite tier policy (0 disables the corresponding limit)
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ROWS = int(os.getenv("CACHE_MAX_ROWS", "50000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_EVICT_INTERVAL = float(os.getenv("CACHE_EVICT_INTERVAL", "300"))
+
+
+class MemoryLRU:
+    """Thread-safe LRU bounded by entry count and total (encoded) size."""
+
+    def __init__(self, max_entries: int = CACHE_MEMORY_MAX_ENTRIES, max_bytes: int = CACHE_MEMORY_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: dict, size: int, expires_at: Optional[float] = None) -> None:
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
 
-DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend_cache.db"))
+    def discard(self, key: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
 
 
 class CacheService:
-    def __init__(self, db_path: str = DB_PATH):
+    def __init__(self, db_path: str = DB_PATH, ttl_seconds: int = CACHE_TTL_SECONDS,
+                 max_rows: int = CACHE_MAX_ROWS, max_bytes: int = CACHE_MAX_BYTES):
         self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.memory = MemoryLRU()
+        self._store = get_store(db_path)
+
+        # SQLite tier stats
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+        self._maintenance_stop = threading.Event()
+        self._maintenance_thread: Optional[threading.Thread] = None
         self._ensure_db()
 
     def _ensure_db(self):
-        conn = sqlite3.connect(self.db_path)
-        try:
+        def _create(conn: sqlite3.Connection):
             conn.execute("""
             CREATE TABLE IF NOT EXISTS cache (
                 key TEXT PRIMARY KEY,
@@ -23,27 +124,146 @@ class CacheService:
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
             """)
-            conn.commit()
-        finally:
-            conn.close()
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_updated_at ON cache (updated_at)")
+
+        self._store.execute(_create)
+
+    def _expires_at(self, written_epoch: float) -> Optional[float]:
+        return written_epoch + self.ttl_seconds if self.ttl_seconds > 0 else None
+
+    _SELECT = "SELECT value, CAST(strftime('%s', updated_at) AS INTEGER) FROM cache WHERE key = ?"
+    _REPLACE = "REPLACE INTO cache (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)"
+
+    def _decode_row(self, key: str, rows: list) -> Optional[dict]:
+        if not rows:
+            self.misses += 1
+            return None
+        raw, written_epoch = rows[0]
+        expires_at = self._expires_at(written_epoch or 0)
+        if expires_at is not None and expires_at <= time.time():
+            self.expired += 1
+            self.misses += 1
+            return None
+        value = json.loads(raw)
+        self.hits += 1
+        self.memory.put(key, value, len(raw.encode("utf-8")), expires_at)
+        return value
 
     def get(self, key: str) -> Optional[dict]:
-        conn = sqlite3.connect(self.db_path)
+        value = self.memory.get(key)
+        if value is not None:
+            return value
         try:
-            cur = conn.execute("SELECT value FROM cache WHERE key = ?", (key,))
-            row = cur.fetchone()
-            if not row:
-                return None
-            return json.loads(row[0])
+            return self._decode_row(key, self._store.query(self._SELECT, (key,)))
         except Exception:
             return None
-        finally:
-            conn.close()
 
-    def set(self, key: str, value: dict):
-        conn = sqlite3.connect(self.db_path)
+    async def aget(self, key: str) -> Optional[dict]:
+        """Like `get`, but the SQLite lookup runs in the store's reader pool."""
+        value = self.memory.get(key)
+        if value is not None:
+            return value
         try:
-            conn.execute("REPLACE INTO cache (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)", (key, json.dumps(value, ensure_ascii=False)))
-            conn.commit()
-        finally:
-            conn.close()
+            return self._decode_row(key, await self._store.aquery(self._SELECT, (key,)))
+        except Exception:
+            return None
+
+    def _encode(self, key: str, value: dict) -> str:
+        raw = json.dumps(value, ensure_ascii=False)
+        self.memory.put(key, value, len(raw.encode("utf-8")), self._expires_at(time.time()))
+        return raw
+
+    def set(self, key: str, value: dict):
+        raw = self._encode(key, value)
+        self._store.execute(self._REPLACE, (key, raw))
+
+    async def aset(self, key: str, value: dict):
+        """Like `set`, but awaits the group commit instead of blocking the loop."""
+        raw = self._encode(key, value)
+        await self._store.aexecute(self._REPLACE, (key, raw))
+
+    def delete(self, key: str):
+        self.memory.discard(key)
+        self._store.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Drop every cached answer from both tiers."""
+        self.memory.clear()
+        self._store.execute("DELETE FROM cache")
+
+    # Eviction
+    def evict(self) -> int:
+        """Apply TTL, max-rows and max-bytes policies to the SQLite tier.
+
+        Oldest rows (by `updated_at`) go first. Returns the number of rows removed.
+        """
+        return self._store.execute(self._evict)
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        removed = 0
+        if self.ttl_seconds > 0:
+            cur = conn.execute(
+                "DELETE FROM cache WHERE updated_at < datetime('now', ?)", (f"-{int(self.ttl_seconds)} seconds",)
+            )
+            self.expired += cur.rowcount
+            removed += cur.rowcount
+
+        if self.max_rows > 0:
+            (count,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if count > self.max_rows:
+                cur = conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY updated_at ASC LIMIT ?)",
+                    (count - self.max_rows,),
+                )
+                self.evictions += cur.rowcount
+                removed += cur.rowcount
+
+        if self.max_bytes > 0:
+            (total,) = conn.execute("SELECT COALESCE(SUM(LENGTH(key) + LENGTH(value)), 0) FROM cache").fetchone()
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                victims = []
+                for key, size in conn.execute(
+                    "SELECT key, LENGTH(key) + LENGTH(value) FROM cache ORDER BY updated_at ASC"
+                ):
+                    victims.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+                self.evictions += len(victims)
+                removed += len(victims)
+        return removed
+
+    def start_maintenance(self, interval: float = CACHE_EVICT_INTERVAL) -> None:
+        """Run `evict()` every `interval` seconds in a daemon thread."""
+        if self._maintenance_thread is not None or interval <= 0:
+            return
+        self._maintenance_stop.clear()
+
+        def _loop():
+            while not self._maintenance_stop.wait(interval):
+                try:
+                    self.evict()
+                except Exception:
+                    pass
+
+        self._maintenance_thread = threading.Thread(target=_loop, name="cache-eviction", daemon=True)
+        self._maintenance_thread.start()
+
+    def stop_maintenance(self) -> None:
+        self._maintenance_stop.set()
+        if self._maintenance_thread is not None:
+            self._maintenance_thread.join(timeout=5)
+            self._maintenance_thread = None
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "sqlite": {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            },
+        }
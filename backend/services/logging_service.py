@@ -1,28 +1,248 @@
-"""Simple logging service that appends JSONL logs for queries and feedback."""
+"""Simple logging service that appends JSONL logs for queries and feedback.
+
+Records are handed to a background writer through a bounded queue, so request
+handlers never touch the filesystem. The writer batch-flushes on size or time,
+rotates files by size or day, and gzip-compresses rotated files. When the
+queue is full, records are dropped according to LOG_DROP_POLICY and counted.
+Appends and rotation hold a per-file lock, so several worker processes can
+share the same log files.
+"""
 import os
+import gzip
 import json
+import queue
+import atexit
+import shutil
+import threading
+import time
 from datetime import datetime
+from typing import Dict, Optional, TextIO
+
+from backend.services.worker_coordination import FileLock
 
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-LOGS_DIR = os.path.join(BASE_DIR, "logs")
+LOGS_DIR = os.getenv("LOGS_DIR") or os.path.join(BASE_DIR, "logs")
 os.makedirs(LOGS_DIR, exist_ok=True)
 
 QUERY_LOG = os.path.join(LOGS_DIR, "query_log.jsonl")
 FEEDBACK_LOG = os.path.join(LOGS_DIR, "feedback_log.jsonl")
 ERROR_LOG = os.path.join(LOGS_DIR, "error_log.jsonl")
 
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_FLUSH_BATCH = int(os.getenv("LOG_FLUSH_BATCH", "256"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+LOG_ROTATE_BYTES = int(os.getenv("LOG_ROTATE_BYTES", str(50 * 1024 * 1024)))  # 0 disables
+LOG_ROTATE_DAILY = os.getenv("LOG_ROTATE_DAILY", "true").lower() in {"1", "true", "yes", "y"}
+LOG_COMPRESS = os.getenv("LOG_COMPRESS", "true").lower() in {"1", "true", "yes", "y"}
+# drop_newest | drop_oldest | block ("block" makes callers wait, including the event loop)
+LOG_DROP_POLICY = os.getenv("LOG_DROP_POLICY", "drop_newest")
+
+_STOP = object()
+
+
+class BufferedJsonlWriter:
+    """Background JSONL writer shared by all log files of a LoggingService."""
+
+    def __init__(self, max_queue: int = LOG_QUEUE_SIZE, flush_batch: int = LOG_FLUSH_BATCH,
+                 flush_interval: float = LOG_FLUSH_INTERVAL, rotate_bytes: int = LOG_ROTATE_BYTES,
+                 rotate_daily: bool = LOG_ROTATE_DAILY, compress: bool = LOG_COMPRESS,
+                 drop_policy: str = LOG_DROP_POLICY):
+        if drop_policy not in ("drop_newest", "drop_oldest", "block"):
+            raise ValueError(f"unknown LOG_DROP_POLICY {drop_policy!r}")
+        self.flush_batch = max(1, flush_batch)
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self.drop_policy = drop_policy
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_queue))
+        self._files: Dict[str, TextIO] = {}
+        self._file_days: Dict[str, str] = {}
+        self._locks: Dict[str, FileLock] = {}
+        self._closed = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._loop, name="jsonl-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path: str, obj: dict) -> bool:
+        """Enqueue a record; returns False when it was dropped."""
+        if self._closed:
+            self.dropped += 1
+            return False
+        item = (path, obj)
+        try:
+            if self.drop_policy == "block":
+                self._queue.put(item)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.drop_policy == "drop_oldest":
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.dropped += 1
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full:
+                    self.dropped += 1
+                    return False
+            else:
+                self.dropped += 1
+                return False
+        self.enqueued += 1
+        return True
+
+    def _loop(self) -> None:
+        while True:
+            batch = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            if batch:
+                self._flush(batch)
+            if stop:
+                # Drain whatever was queued before close()
+                rest = []
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        rest.append(item)
+                if rest:
+                    self._flush(rest)
+                for fh in self._files.values():
+                    fh.close()
+                self._files.clear()
+                return
 
-def _append_jsonl(path: str, obj: dict):
-    with open(path, "a", encoding="utf-8") as fh:
-        fh.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    def _flush(self, batch: list) -> None:
+        by_path: Dict[str, list] = {}
+        for path, obj in batch:
+            try:
+                by_path.setdefault(path, []).append(json.dumps(obj, ensure_ascii=False) + "\n")
+            except Exception:
+                self.errors += 1
+        for path, lines in by_path.items():
+            try:
+                # Other worker processes append to (and rotate) the same files
+                with self._file_lock(path):
+                    fh = self._open(path)
+                    fh.write("".join(lines))
+                    fh.flush()
+                self.written += len(lines)
+            except Exception:
+                self.errors += 1
+        self.flushes += 1
+
+    def _file_lock(self, path: str) -> FileLock:
+        lock = self._locks.get(path)
+        if lock is None:
+            head, tail = os.path.split(path)
+            lock = self._locks[path] = FileLock(os.path.join(head, f".{tail}.lock"))
+        return lock
+
+    def _open(self, path: str) -> TextIO:
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        fh = self._files.get(path)
+        if fh is not None and self._replaced(path, fh):
+            # Rotated by another process: follow the new file
+            fh.close()
+            self._files.pop(path, None)
+            fh = None
+        if fh is None:
+            if os.path.exists(path):
+                self._file_days[path] = datetime.utcfromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d")
+            else:
+                self._file_days[path] = today
+        size = os.fstat(fh.fileno()).st_size if fh is not None else (os.path.getsize(path) if os.path.exists(path) else 0)
+        if size > 0 and ((self.rotate_bytes > 0 and size >= self.rotate_bytes)
+                         or (self.rotate_daily and self._file_days.get(path) != today)):
+            self._rotate(path)
+            fh = None
+        if fh is None:
+            fh = open(path, "a", encoding="utf-8")
+            self._files[path] = fh
+            self._file_days.setdefault(path, today)
+        return fh
+
+    @staticmethod
+    def _replaced(path: str, fh: TextIO) -> bool:
+        try:
+            return os.stat(path).st_ino != os.fstat(fh.fileno()).st_ino
+        except OSError:
+            return True
+
+    def _rotate(self, path: str) -> None:
+        fh = self._files.pop(path, None)
+        if fh is not None:
+            fh.close()
+        stem, ext = os.path.splitext(path)
+        base = f"{stem}.{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+        rotated, n = f"{base}{ext}", 0
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            n += 1
+            rotated = f"{base}-{n}{ext}"
+        os.replace(path, rotated)
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        self._file_days[path] = datetime.utcnow().strftime("%Y-%m-%d")
+        self.rotations += 1
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush everything queued so far and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "errors": self.errors,
+            "drop_policy": self.drop_policy,
+        }
 
 
 class LoggingService:
-    def __init__(self):
-        pass
+    def __init__(self, writer: Optional[BufferedJsonlWriter] = None):
+        self._writer = writer if writer is not None else BufferedJsonlWriter()
+        atexit.register(self.close)
+
+    def close(self):
+        self._writer.close()
+
+    def stats(self) -> dict:
+        return self._writer.stats()
 
-    def log_query(self, question_id: str, question: str, answer: str, sources, backend: str, translated: bool = False, detected_language: str = "en", from_cache: bool = False):
+    def log_query(self, question_id: str, question: str, answer: str, sources, backend: str, translated: bool = False, detected_language: str = "en", from_cache: bool = False, coalesced: bool = False, trace: Optional[dict] = None):
         rec = {
             "timestamp": datetime.utcnow().isoformat(),
             "question_id": question_id,
@@ -33,9 +253,12 @@ class LoggingService:
             "translated": translated,
             "detected_language": detected_language,
             "from_cache": from_cache,
+            "coalesced": coalesced,
         }
+        if trace is not None:
+            rec["trace"] = trace
         try:
-            _append_jsonl(QUERY_LOG, rec)
+            self._writer.write(QUERY_LOG, rec)
         except Exception:
             pass
 
@@ -47,7 +270,7 @@ class LoggingService:
             "comment": comment,
         }
         try:
-            _append_jsonl(FEEDBACK_LOG, rec)
+            self._writer.write(FEEDBACK_LOG, rec)
         except Exception:
             pass
 
@@ -58,6 +281,6 @@ class LoggingService:
             "error": str(error),
         }
         try:
-            _append_jsonl(ERROR_LOG, rec)
+            self._writer.write(ERROR_LOG, rec)
         except Exception:
             pass
@@ -0,0 +1,219 @@
+"""Background worker that drains the offline RAG queue (`rag_queue.db`).
+
+Questions asked while the remote ML service was unreachable are stored in the
+`pending` table. The worker probes the remote with exponential backoff, and
+once it answers, claims rows in batches of up to `concurrency` (atomically,
+in the store's writer thread) and asks them in parallel. Completed answers are
+handed to `on_result` (the app caches them under the original cache key so
+the user's retry is a cache hit) and the row is deleted. Failed rows go back
+to `pending`; after `max_attempts` they are moved to `dead_letter`. Rows
+claimed by a worker that died are reclaimed after `claim_timeout` seconds.
+"""
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+
+RAG_QUEUE_WORKER = os.getenv("RAG_QUEUE_WORKER", "true").lower() in {"1", "true", "yes", "y"}
+RAG_QUEUE_CONCURRENCY = int(os.getenv("RAG_QUEUE_CONCURRENCY", "4"))
+RAG_QUEUE_POLL_INTERVAL = float(os.getenv("RAG_QUEUE_POLL_INTERVAL", "5"))
+RAG_QUEUE_MAX_BACKOFF = float(os.getenv("RAG_QUEUE_MAX_BACKOFF", "60"))
+RAG_QUEUE_MAX_ATTEMPTS = int(os.getenv("RAG_QUEUE_MAX_ATTEMPTS", "5"))
+RAG_QUEUE_CLAIM_TIMEOUT = float(os.getenv("RAG_QUEUE_CLAIM_TIMEOUT", "300"))
+
+# Window for the reported drain rate
+_RATE_WINDOW = 60.0
+
+ResultCallback = Callable[[dict, dict], Awaitable[None]]
+
+
+class OfflineQueueWorker:
+    def __init__(self, rag_service, on_result: Optional[ResultCallback] = None,
+                 concurrency: int = RAG_QUEUE_CONCURRENCY, poll_interval: float = RAG_QUEUE_POLL_INTERVAL,
+                 max_backoff: float = RAG_QUEUE_MAX_BACKOFF, max_attempts: int = RAG_QUEUE_MAX_ATTEMPTS,
+                 claim_timeout: float = RAG_QUEUE_CLAIM_TIMEOUT):
+        self.rag_service = rag_service
+        self.on_result = on_result
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.max_backoff = max(poll_interval, max_backoff)
+        self.max_attempts = max(1, max_attempts)
+        self.claim_timeout = claim_timeout
+        self._store = rag_service._queue_store
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._completions: deque = deque()
+
+        self.remote_online: Optional[bool] = None
+        self.inflight = 0
+        self.completed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.delivery_errors = 0
+
+    # Lifecycle
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def wake(self) -> None:
+        """Skip the current wait (e.g. after an operator fixed the remote)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    # Main loop
+    async def _run(self) -> None:
+        backoff = self.poll_interval
+        while True:
+            try:
+                rows = await self._store.aquery("SELECT 1 FROM pending LIMIT 1")
+                if not rows:
+                    await self._sleep(self.poll_interval)
+                    continue
+                self.remote_online = await self.rag_service.probe_remote()
+                if not self.remote_online:
+                    await self._sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+                backoff = self.poll_interval
+
+                claimed = await self._store.aexecute(self._claim)
+                if not claimed:
+                    # Only rows claimed by someone else remain
+                    await self._sleep(self.poll_interval)
+                    continue
+                outcomes = await asyncio.gather(*(self._process(row) for row in claimed))
+                if not any(outcomes):
+                    # Everything failed although /health answered; back off before retrying
+                    await self._sleep(backoff)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await self._sleep(self.poll_interval)
+
+    def _claim(self, conn) -> list:
+        """Runs in the store's writer thread, so select + update is atomic."""
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, question, k, context, attempts FROM pending "
+            "WHERE status = 'pending' OR (status = 'inflight' AND claimed_at < ?) "
+            "ORDER BY created_at ASC, id ASC LIMIT ?",
+            (now - self.claim_timeout, self.concurrency),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE pending SET status = 'inflight', claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+            [(now, row[0]) for row in rows],
+        )
+        return [(rid, question, k, context, (attempts or 0) + 1) for rid, question, k, context, attempts in rows]
+
+    async def _process(self, row: tuple) -> bool:
+        rid, question, k, context, attempts = row
+        self.inflight += 1
+        try:
+            result = await self.rag_service._call_remote_with_retries_async(question, k, retries=1)
+            if result is None:
+                await self._fail(rid, attempts, "remote unavailable")
+                return False
+            if self.on_result is not None:
+                try:
+                    ctx = json.loads(context) if context else {}
+                    await self.on_result(ctx, self.rag_service._normalize_result(result))
+                except Exception:
+                    # The answer exists but could not be delivered; do not ask again
+                    self.delivery_errors += 1
+            await self._store.aexecute("DELETE FROM pending WHERE id = ?", (rid,))
+            self.completed += 1
+            self._completions.append(time.monotonic())
+            return True
+        except Exception as e:
+            await self._fail(rid, attempts, str(e))
+            return False
+        finally:
+            self.inflight -= 1
+
+    async def _fail(self, rid: int, attempts: int, error: str) -> None:
+        self.failed += 1
+        if attempts >= self.max_attempts:
+            def _dead_letter(conn):
+                conn.execute(
+                    "INSERT OR REPLACE INTO dead_letter (id, question, k, context, attempts, last_error, created_at) "
+                    "SELECT id, question, k, context, attempts, ?, created_at FROM pending WHERE id = ?",
+                    (error, rid),
+                )
+                conn.execute("DELETE FROM pending WHERE id = ?", (rid,))
+
+            await self._store.aexecute(_dead_letter)
+            self.dead_lettered += 1
+        else:
+            await self._store.aexecute(
+                "UPDATE pending SET status = 'pending', claimed_at = NULL, last_error = ? WHERE id = ?",
+                (error, rid),
+            )
+
+    async def drain(self) -> int:
+        """Drain the queue once, without the background loop (manual flush); returns answers delivered.
+
+        Stops at the first batch with a failure; failed rows stay queued for the next attempt.
+        """
+        delivered = 0
+        while True:
+            claimed = await self._store.aexecute(self._claim)
+            if not claimed:
+                return delivered
+            outcomes = await asyncio.gather(*(self._process(row) for row in claimed))
+            delivered += sum(outcomes)
+            if not all(outcomes):
+                return delivered
+
+    # Diagnostics
+    def stats(self) -> dict:
+        """Queue depth, oldest item age and drain rate (blocking; call off the loop)."""
+        cutoff = time.monotonic() - _RATE_WINDOW
+        while self._completions and self._completions[0] < cutoff:
+            self._completions.popleft()
+        depth, claimed, oldest = self._store.query(
+            "SELECT COUNT(*), COALESCE(SUM(status = 'inflight'), 0), "
+            "CAST(strftime('%s', 'now') AS INTEGER) - CAST(strftime('%s', MIN(created_at)) AS INTEGER) "
+            "FROM pending"
+        )[0]
+        dead = self._store.query("SELECT COUNT(*) FROM dead_letter")[0][0]
+        return {
+            "running": self.running,
+            "remote_online": self.remote_online,
+            "depth": depth,
+            "claimed": claimed,
+            "inflight": self.inflight,
+            "oldest_age_seconds": oldest,
+            "dead_letter": dead,
+            "drain_rate_per_min": len(self._completions) * 60.0 / _RATE_WINDOW,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+            "delivery_errors": self.delivery_errors,
+            "concurrency": self.concurrency,
+            "max_attempts": self.max_attempts,
+        }
@@ -2,9 +2,15 @@
 Robust RAG service wrapper for the backend.
 
 This minimal implementation supports:
-- Remote mode: forwards requests to a remote ML API (RAG_REMOTE_URL)
+- Remote mode: forwards requests to one or more remote ML APIs (RAG_REMOTE_URLS
+  or RAG_REMOTE_URL), routed with circuit breakers, health probes and
+  latency-aware load balancing (see remote_router.py)
 - Mock mode: returns canned answers if remote is disabled/unavailable
 - Offline queue: persists unsent questions and can flush when remote returns
+- Async transport: a shared, pooled keep-alive httpx client so a slow remote
+  never blocks the event loop (the sync requests path remains for debugging)
+- Streaming: `query_stream` yields sources then answer tokens, using the
+  remote's `/ask/stream` Server-Sent Events endpoint when it has one
 
 Designed to match usage in backend/app/main.py.
 """
@@ -12,18 +18,36 @@ Designed to match usage in backend/app/main.py.
 from __future__ import annotations
 
 import os
+import json
 import time
-import sqlite3
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, List, Optional
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+
+from backend.services.sqlite_store import get_store
+from backend.services.remote_router import NoEndpointAvailable, RemoteRouter, parse_urls
+from backend.services.metrics_service import stage
+from backend.services.tracing_service import record_server_timing
 
 # Environment configuration
 RAG_REMOTE_URL = os.getenv("RAG_REMOTE_URL")  # e.g., http://localhost:8001
+# Comma-separated list of remotes; takes precedence over RAG_REMOTE_URL
+RAG_REMOTE_URLS = parse_urls(os.getenv("RAG_REMOTE_URLS")) or parse_urls(RAG_REMOTE_URL)
 RAG_MOCK = os.getenv("RAG_MOCK", "false").lower() in {"1", "true", "yes", "y"}
 
+# Remote transport tuning
+RAG_POOL_SIZE = int(os.getenv("RAG_POOL_SIZE", "100"))  # max open connections to the remote
+RAG_KEEPALIVE_SIZE = int(os.getenv("RAG_KEEPALIVE_SIZE", str(RAG_POOL_SIZE)))
+RAG_CONNECT_TIMEOUT = float(os.getenv("RAG_CONNECT_TIMEOUT", "5"))
+RAG_REMOTE_TIMEOUT = float(os.getenv("RAG_REMOTE_TIMEOUT", "15"))  # per-attempt read timeout
+RAG_MAX_RETRIES = int(os.getenv("RAG_MAX_RETRIES", "3"))
+RAG_BACKOFF_BASE = float(os.getenv("RAG_BACKOFF_BASE", "1.0"))
+
 # Persistent queue database (in backend/ directory)
-QUEUE_DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rag_queue.db"))
+QUEUE_DB_PATH = os.getenv("RAG_QUEUE_DB_PATH") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rag_queue.db"))
 
 
 class RAGService:
@@ -40,7 +64,8 @@ class RAGService:
     """
 
     def __init__(self) -> None:
-        self.remote_url: Optional[str] = RAG_REMOTE_URL
+        self.remote_urls: List[str] = list(RAG_REMOTE_URLS)
+        self.remote_url: Optional[str] = self.remote_urls[0] if self.remote_urls else None
         self.remote_mode: bool = bool(self.remote_url) and not RAG_MOCK
         self.mock_mode: bool = RAG_MOCK or not self.remote_mode
         self.backend_name: str = "remote" if self.remote_mode else "mock-rag"
@@ -50,62 +75,262 @@ class RAGService:
         self.chunk_texts: List[str] = []
         self.index = None
 
-        # queue db path
+        # queue db path (accessed through the shared SQLite store)
         self._queue_db = QUEUE_DB_PATH
+        self._queue_store = get_store(self._queue_db)
+
+        # Pooled HTTP clients, created lazily (the async one must be bound to the running loop)
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._sync_session: Optional[requests.Session] = None
+        # None = unknown; set to False once the remote answers /ask/stream with 404/405
+        self._remote_streaming: Optional[bool] = None
+        # Circuit breakers / load balancing across the remote endpoints
+        self.router = RemoteRouter(self.remote_urls)
 
     async def initialize(self) -> None:
-        """Initialize service (create queue DB)."""
+        """Initialize service (create queue DB and the pooled remote client)."""
         self._init_queue_db()
+        if self.remote_mode and self.remote_url:
+            self.router.start_probes(self._get_async_client())
         self.initialized = True
 
-    async def query(self, question: str, k: int = 3) -> dict:
+    async def close(self) -> None:
+        """Release pooled connections (called on app shutdown)."""
+        await self.router.stop_probes()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._sync_session is not None:
+            self._sync_session.close()
+            self._sync_session = None
+
+    async def query(self, question: str, k: int = 3, queue_context: Optional[dict] = None) -> dict:
         """Main query entrypoint.
 
         - If remote mode: call remote with retries; if unavailable, queue and return offline stub
         - If mock mode: return a canned response
+
+        `queue_context` is stored with a queued question (e.g. its cache key) so
+        the offline queue worker can deliver the answer once the remote is back.
         """
         k = max(1, min(int(k or 3), 10))
         if self.remote_mode and self.remote_url:
-            data = self._call_remote_with_retries(question, k)
+            data = await self._call_remote_with_retries_async(question, k)
             if data is not None:
-                # normalize
-                data["backend"] = data.get("backend", "remote")
-                data["sources"] = self._normalize_sources(data.get("sources", []))
-                data.setdefault("answer_local", None)
-                data.setdefault("answer", "")
-                return data
+                return self._normalize_result(data)
             # Remote offline: queue and return stub
-            self._queue_request(question, k)
+            await self._queue_request(question, k, queue_context)
             return self._remote_offline_stub(question, k)
         # Mock mode
         return self._mock_query(question, k)
 
+    async def query_stream(self, question: str, k: int = 3, queue_context: Optional[dict] = None) -> AsyncIterator[dict]:
+        """Streaming variant of `query`.
+
+        Yields `{"event": "sources", "data": [...]}` first, then any number of
+        `{"event": "token", "data": "..."}`, and finally
+        `{"event": "done", "data": {"backend": ..., "answer_local": ...}}`.
+        Falls back to a single-token answer from `query` when the remote does
+        not support streaming or the stream cannot be opened; `queue_context`
+        is passed on to it, as for `query`.
+        """
+        k = max(1, min(int(k or 3), 10))
+        if self.remote_mode and self.remote_url and self._remote_streaming is not False:
+            started = False
+            try:
+                async for event in self._stream_remote(question, k):
+                    started = True
+                    yield event
+                return
+            except Exception:
+                if started:
+                    raise
+        data = await self.query(question, k, queue_context=queue_context)
+        yield {"event": "sources", "data": data.get("sources", [])}
+        if data.get("answer"):
+            yield {"event": "token", "data": data["answer"]}
+        yield {"event": "done", "data": {"backend": data.get("backend", "mock-rag"), "answer_local": data.get("answer_local")}}
+
+    async def _stream_remote(self, question: str, k: int) -> AsyncIterator[dict]:
+        client = self._get_async_client()
+        payload = {"question": question, "k": k, "translate_local": False}
+        ep = self.router.pick()
+        if ep is None:
+            raise NoEndpointAvailable()
+        opened = False
+        t0 = time.perf_counter()
+        try:
+            async with client.stream("POST", ep.url + "/ask/stream", json=payload,
+                                     headers={"Accept": "text/event-stream"}) as r:
+                if r.status_code in (404, 405):
+                    # The endpoint is healthy, it just cannot stream
+                    opened = True
+                    ep.breaker.record_success()
+                    self._remote_streaming = False
+                    raise RuntimeError("remote does not support streaming")
+                r.raise_for_status()
+                opened = True
+                # Time to first byte is what the balancer compares for streams
+                ep.observe(time.perf_counter() - t0, ok=True)
+                ep.breaker.record_success()
+                self._remote_streaming = True
+                async for event in self._parse_sse(r):
+                    yield event
+        except asyncio.CancelledError:
+            if not opened:
+                ep.breaker.release()
+            raise
+        except Exception:
+            if not opened:
+                ep.observe(time.perf_counter() - t0, ok=False)
+                ep.breaker.record_failure()
+            raise
+
+    async def _parse_sse(self, r) -> AsyncIterator[dict]:
+        event, data_lines = "message", []
+        async for line in r.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+            elif not line and data_lines:
+                data = json.loads("\n".join(data_lines))
+                if event == "sources":
+                    data = self._normalize_sources(data)
+                elif event == "done":
+                    data = dict(data or {})
+                    data.setdefault("backend", "remote")
+                    data.setdefault("answer_local", None)
+                yield {"event": event, "data": data}
+                event, data_lines = "message", []
+
+    async def probe_remote(self) -> bool:
+        """Probe every remote's /health now (updating breakers); True if any is up."""
+        if not self.remote_url:
+            return False
+        try:
+            return await self.router.probe(self._get_async_client())
+        except Exception:
+            return False
+
+    async def corpus_version(self) -> Optional[str]:
+        """The remote's `corpus_version` (from /health); None if unknown or in mock mode (nothing worth warming)."""
+        if not self.remote_mode:
+            return None
+        client = self._get_async_client()
+        for ep in self.router.endpoints:
+            if not ep.breaker.available():
+                continue
+            try:
+                r = await client.get(ep.url + "/health", timeout=RAG_CONNECT_TIMEOUT)
+                r.raise_for_status()
+                version = r.json().get("corpus_version")
+            except Exception:
+                continue
+            if version:
+                return version
+        return None
+
+    def remote_online(self) -> bool:
+        """Whether any remote endpoint's breaker currently admits requests."""
+        return self.remote_mode and self.router.any_available()
+
+    # Remote transport
+    def _remote_ask_url(self) -> str:
+        # Use /ask endpoint convention
+        return self.remote_url.rstrip("/") + "/ask"
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=RAG_POOL_SIZE,
+                    max_keepalive_connections=RAG_KEEPALIVE_SIZE,
+                ),
+                timeout=httpx.Timeout(RAG_REMOTE_TIMEOUT, connect=RAG_CONNECT_TIMEOUT),
+            )
+        return self._async_client
+
+    def _get_sync_session(self) -> requests.Session:
+        if self._sync_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=RAG_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._sync_session = session
+        return self._sync_session
+
+    def _parse_remote_response(self, r) -> dict:
+        try:
+            data = r.json()
+        except Exception:
+            text = r.text or ""
+            data = {"answer": text, "sources": [], "backend": "remote-raw", "answer_local": None}
+        data["sources"] = self._normalize_sources(data.get("sources", []))
+        return data
+
+    async def _call_remote_with_retries_async(self, question: str, k: int, retries: Optional[int] = None) -> Optional[dict]:
+        """Non-blocking remote call over the shared connection pool.
+
+        Each attempt goes to an endpoint picked by the router and is bounded by
+        RAG_REMOTE_TIMEOUT; backoff uses asyncio.sleep so other requests keep
+        being served while this one waits. Returns None at once when every
+        endpoint's breaker is open, instead of sleeping through the retries.
+        """
+        if not self.remote_url:
+            return None
+        client = self._get_async_client()
+        payload = {"question": question, "k": k, "translate_local": False}
+
+        async def _post(ep) -> dict:
+            with stage("remote_http"):
+                r = await client.post(ep.url + "/ask", json=payload)
+                # The remote reports its embed / search / generate stages
+                record_server_timing(r.headers.get("server-timing"))
+            r.raise_for_status()
+            return self._parse_remote_response(r)
+
+        retries = RAG_MAX_RETRIES if retries is None else max(1, retries)
+        for attempt in range(retries):
+            try:
+                return await self.router.call(_post)
+            except NoEndpointAvailable:
+                return None
+            except Exception:
+                if attempt + 1 < retries:
+                    if not self.router.any_available():
+                        return None
+                    await asyncio.sleep(RAG_BACKOFF_BASE * (2 ** attempt))
+        return None
+
     # The following helpers are synchronous; main.py calls via asyncio.to_thread when needed
     def _call_remote_with_retries(self, question: str, k: int) -> Optional[dict]:
         if not self.remote_url:
             return None
-        # Use /ask endpoint convention
-        url = self.remote_url.rstrip("/") + "/ask"
+        session = self._get_sync_session()
+        url = self._remote_ask_url()
         payload = {"question": question, "k": k, "translate_local": False}
         attempt = 0
-        max_retries = 3
-        backoff = 1.0
+        max_retries = RAG_MAX_RETRIES
+        backoff = RAG_BACKOFF_BASE
         while attempt < max_retries:
             try:
-                r = requests.post(url, json=payload, timeout=15)
+                r = session.post(url, json=payload, timeout=(RAG_CONNECT_TIMEOUT, RAG_REMOTE_TIMEOUT))
                 r.raise_for_status()
-                try:
-                    data = r.json()
-                except Exception:
-                    text = r.text or ""
-                    data = {"answer": text, "sources": [], "backend": "remote-raw", "answer_local": None}
-                data["sources"] = self._normalize_sources(data.get("sources", []))
-                return data
+                return self._parse_remote_response(r)
             except Exception:
                 attempt += 1
-                time.sleep(backoff * (2 ** (attempt - 1)))
+                if attempt < max_retries:
+                    time.sleep(backoff * (2 ** (attempt - 1)))
         return None
 
+    def _normalize_result(self, data: dict) -> dict:
+        data["backend"] = data.get("backend", "remote")
+        data["sources"] = self._normalize_sources(data.get("sources", []))
+        data.setdefault("answer_local", None)
+        data.setdefault("answer", "")
+        return data
+
     def _normalize_sources(self, raw_sources) -> List[dict]:
         normalized: List[dict] = []
         if not raw_sources:
@@ -119,48 +344,65 @@ class RAGService:
                 normalized.append({"text": str(s), "metadata": {"source": "remote-unknown"}})
         return normalized
 
-    def flush_pending_requests(self) -> bool:
-        try:
-            self._flush_pending_requests()
-            return True
-        except Exception:
-            return False
-
     # Queue management
+    _QUEUE_COLUMNS = {
+        "status": "TEXT DEFAULT 'pending'",
+        "attempts": "INTEGER DEFAULT 0",
+        "claimed_at": "REAL",  # unix time of the current claim
+        "last_error": "TEXT",
+        "context": "TEXT",
+        "cache_key": "TEXT",  # one queued row per cache key
+    }
+
     def _init_queue_db(self) -> None:
-        conn = sqlite3.connect(self._queue_db)
-        conn.execute(
-            """CREATE TABLE IF NOT EXISTS pending (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question TEXT,
-                k INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )"""
-        )
-        conn.commit()
-        conn.close()
+        def _create(conn):
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS pending (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    question TEXT,
+                    k INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )"""
+            )
+            # Columns added for the queue worker; migrate older databases in place
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(pending)")}
+            for name, decl in self._QUEUE_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE pending ADD COLUMN {name} {decl}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_status ON pending (status, created_at)")
+            # Rows only live in `pending` while waiting or claimed; rows from older databases have no key
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_pending_cache_key ON pending (cache_key) "
+                         "WHERE cache_key IS NOT NULL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS dead_letter (
+                    id INTEGER PRIMARY KEY,
+                    question TEXT,
+                    k INTEGER,
+                    context TEXT,
+                    attempts INTEGER,
+                    last_error TEXT,
+                    created_at TIMESTAMP,
+                    failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )"""
+            )
 
-    def _flush_pending_requests(self) -> None:
-        conn = sqlite3.connect(self._queue_db)
-        try:
-            cur = conn.cursor()
-            cur.execute("SELECT id, question, k FROM pending ORDER BY created_at ASC")
-            rows = cur.fetchall()
-            for rid, question, k in rows:
-                resp = self._call_remote_with_retries(question, k)
-                if resp is not None:
-                    cur.execute("DELETE FROM pending WHERE id=?", (rid,))
-                    conn.commit()
-                else:
-                    break
-        finally:
-            conn.close()
-
-    def _queue_request(self, question: str, k: int) -> None:
-        conn = sqlite3.connect(self._queue_db)
-        conn.execute("INSERT INTO pending (question, k) VALUES (?, ?)", (question, k))
-        conn.commit()
-        conn.close()
+        self._queue_store.execute(_create)
+
+    def queue_depth(self) -> int:
+        """Rows waiting in (or claimed from) the offline queue (blocking)."""
+        return self._queue_store.query("SELECT COUNT(*) FROM pending")[0][0]
+
+    def clear_queue(self) -> int:
+        """Drop every question waiting in the offline queue (blocking). Returns the number removed."""
+        return self._queue_store.execute(lambda conn: conn.execute("DELETE FROM pending").rowcount)
+
+    async def _queue_request(self, question: str, k: int, context: Optional[dict] = None) -> None:
+        # A question asked again while it is still queued is not queued twice; one answer serves both
+        await self._queue_store.aexecute(
+            "INSERT OR IGNORE INTO pending (question, k, context, cache_key) VALUES (?, ?, ?, ?)",
+            (question, k, json.dumps(context, ensure_ascii=False) if context else None,
+             (context or {}).get("cache_key")),
+        )
 
     # Fallback answers
     def _remote_offline_stub(self, question: str, k: int) -> dict:
@@ -0,0 +1,303 @@
+"""Health-aware routing across one or more remote RAG endpoints.
+
+- Per-endpoint circuit breaker: closed -> open after `failure_threshold`
+  consecutive failures; after `reset_timeout` one trial request is let
+  through (half-open) and its outcome closes or re-opens the breaker.
+- Background health probes (`GET /health`) close breakers of endpoints that
+  came back and open those that went away, without waiting for user traffic.
+- Load balancing: power-of-two-choices on EWMA latency weighted by in-flight
+  requests.
+- Optional hedging: when the first endpoint has not answered after its p95
+  latency, the same request is sent to a second endpoint and the first
+  answer wins.
+
+When every breaker is open `pick()` returns None immediately, so callers can
+fail over (e.g. to the offline queue) without paying timeouts and backoff.
+"""
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+import httpx
+
+
+RAG_BREAKER_FAILURES = int(os.getenv("RAG_BREAKER_FAILURES", "3"))
+RAG_BREAKER_RESET = float(os.getenv("RAG_BREAKER_RESET", "10"))
+RAG_HEALTH_INTERVAL = float(os.getenv("RAG_HEALTH_INTERVAL", "5"))  # 0 disables probes
+RAG_HEALTH_TIMEOUT = float(os.getenv("RAG_HEALTH_TIMEOUT", "2"))
+RAG_EWMA_ALPHA = float(os.getenv("RAG_EWMA_ALPHA", "0.3"))
+RAG_HEDGE = os.getenv("RAG_HEDGE", "false").lower() in {"1", "true", "yes", "y"}
+RAG_HEDGE_DEFAULT_MS = float(os.getenv("RAG_HEDGE_DEFAULT_MS", "2000"))  # until enough samples for a p95
+RAG_HEDGE_MIN_MS = float(os.getenv("RAG_HEDGE_MIN_MS", "100"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Latency samples kept per endpoint for the hedging p95
+_LATENCY_WINDOW = 200
+_MIN_P95_SAMPLES = 20
+
+T = TypeVar("T")
+
+
+class NoEndpointAvailable(Exception):
+    """Every endpoint's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = RAG_BREAKER_FAILURES, reset_timeout: float = RAG_BREAKER_RESET):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._trial_inflight = False
+
+    def available(self) -> bool:
+        """Whether a request could be let through now (does not take the half-open trial)."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not self._trial_inflight
+
+    def acquire(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+            self._trial_inflight = False
+        if self._trial_inflight:
+            return False
+        self._trial_inflight = True
+        return True
+
+    def release(self) -> None:
+        """Give back a half-open trial whose request was cancelled."""
+        self._trial_inflight = False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_inflight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_inflight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opens += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class Endpoint:
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        self.ewma_ms: Optional[float] = None
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self._latencies: deque = deque(maxlen=_LATENCY_WINDOW)
+
+    def score(self) -> float:
+        # Unmeasured endpoints score 0 so they get tried
+        return (self.ewma_ms or 0.0) * (self.inflight + 1)
+
+    def observe(self, seconds: float, ok: bool, alpha: float = RAG_EWMA_ALPHA) -> None:
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+            return
+        ms = seconds * 1000.0
+        self._latencies.append(ms)
+        self.ewma_ms = ms if self.ewma_ms is None else alpha * ms + (1 - alpha) * self.ewma_ms
+
+    def p95_ms(self) -> Optional[float]:
+        if len(self._latencies) < _MIN_P95_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "state": self.breaker.state,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "p95_ms": self.p95_ms(),
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "breaker_opens": self.breaker.opens,
+        }
+
+
+def parse_urls(value: Optional[str]) -> List[str]:
+    return [u.strip() for u in (value or "").split(",") if u.strip()]
+
+
+class RemoteRouter:
+    def __init__(self, urls: Iterable[str], failure_threshold: int = RAG_BREAKER_FAILURES,
+                 reset_timeout: float = RAG_BREAKER_RESET, hedge: bool = RAG_HEDGE,
+                 hedge_default_ms: float = RAG_HEDGE_DEFAULT_MS, hedge_min_ms: float = RAG_HEDGE_MIN_MS,
+                 health_interval: float = RAG_HEALTH_INTERVAL, health_timeout: float = RAG_HEALTH_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.endpoints = [Endpoint(u, CircuitBreaker(failure_threshold, reset_timeout)) for u in urls]
+        self.hedge = hedge and len(self.endpoints) > 1
+        self.hedge_default_ms = hedge_default_ms
+        self.hedge_min_ms = hedge_min_ms
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._probe_task: Optional[asyncio.Task] = None
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def reset(self) -> None:
+        """Forget breaker state, latency history and counters; probes keep running."""
+        self.endpoints = [Endpoint(ep.url, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+                          for ep in self.endpoints]
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    # Selection
+    def any_available(self) -> bool:
+        return any(ep.breaker.available() for ep in self.endpoints)
+
+    def pick(self, exclude: Iterable[Endpoint] = ()) -> Optional[Endpoint]:
+        """Power-of-two-choices among endpoints whose breaker lets a request through."""
+        excluded = set(id(ep) for ep in exclude)
+        candidates = [ep for ep in self.endpoints if id(ep) not in excluded and ep.breaker.available()]
+        while candidates:
+            if len(candidates) >= 2:
+                a, b = random.sample(candidates, 2)
+                ep = a if a.score() <= b.score() else b
+            else:
+                ep = candidates[0]
+            if ep.breaker.acquire():
+                return ep
+            candidates.remove(ep)
+        return None
+
+    def _hedge_delay(self, ep: Endpoint) -> float:
+        p95 = ep.p95_ms()
+        return max(self.hedge_min_ms, p95 if p95 is not None else self.hedge_default_ms) / 1000.0
+
+    # Calls
+    async def _attempt(self, ep: Endpoint, fn: Callable[[Endpoint], Awaitable[T]]) -> T:
+        ep.inflight += 1
+        t0 = time.perf_counter()
+        try:
+            result = await fn(ep)
+        except asyncio.CancelledError:
+            # Lost a hedge race or the caller went away: the attempt never finished, so it
+            # is neither a success nor a failure; only give back a half-open trial
+            ep.breaker.release()
+            raise
+        except Exception:
+            ep.observe(time.perf_counter() - t0, ok=False)
+            ep.breaker.record_failure()
+            raise
+        finally:
+            ep.inflight -= 1
+        ep.observe(time.perf_counter() - t0, ok=True)
+        ep.breaker.record_success()
+        return result
+
+    async def call(self, fn: Callable[[Endpoint], Awaitable[T]]) -> T:
+        """Run `fn(endpoint)` on a picked endpoint, hedging to a second one if enabled.
+
+        Raises NoEndpointAvailable when every breaker is open, otherwise the
+        last error when all attempts failed.
+        """
+        primary = self.pick()
+        if primary is None:
+            self.rejected += 1
+            raise NoEndpointAvailable()
+        first = asyncio.ensure_future(self._attempt(primary, fn))
+        if not self.hedge:
+            return await first
+
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(primary))
+            if not done:
+                secondary = self.pick(exclude=[primary])
+                if secondary is not None:
+                    self.hedged += 1
+                    hedge_task = asyncio.ensure_future(self._attempt(secondary, fn))
+                    tasks.add(hedge_task)
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # Health probes
+    async def probe(self, client: httpx.AsyncClient) -> bool:
+        """Probe every endpoint once; returns True when any is healthy."""
+        async def _one(ep: Endpoint) -> bool:
+            try:
+                r = await client.get(ep.url + "/health", timeout=self.health_timeout)
+                # 2xx only, the rule real calls follow (raise_for_status): a 404 / 401 from a
+                # misconfigured endpoint must not close a breaker that its requests keep opening
+                ok = r.is_success
+            except Exception:
+                ok = False
+            if ok:
+                ep.breaker.record_success()
+            else:
+                ep.breaker.record_failure()
+            return ok
+
+        results = await asyncio.gather(*(_one(ep) for ep in self.endpoints))
+        return any(results)
+
+    def start_probes(self, client: httpx.AsyncClient) -> None:
+        if self._probe_task is None and self.health_interval > 0 and self.endpoints:
+            self._probe_task = asyncio.ensure_future(self._probe_loop(client))
+
+    async def _probe_loop(self, client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                await self.probe(client)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            await asyncio.sleep(self.health_interval)
+
+    async def stop_probes(self) -> None:
+        task, self._probe_task = self._probe_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "available": self.any_available(),
+            "hedging": self.hedge,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+            "endpoints": [ep.stats() for ep in self.endpoints],
+        }
@@ -0,0 +1,148 @@
+"""Optional semantic cache tier.
+
+Maps a new question to the cache key of an already-answered question whose
+embedding is within a cosine-similarity threshold. Cached questions live in a
+contiguous, L2-normalized float32 matrix, so a lookup is one matrix-vector
+product; entries are partitioned by scope (k / translate_local / language) so a
+hit never crosses request parameters or languages.
+
+Embedders:
+- `SentenceTransformerEmbedder`: the multilingual model used by the RAG server.
+- `HashingEmbedder`: dependency-free character n-gram stand-in (tests, benchmarks,
+  or hosts without sentence-transformers).
+"""
+import os
+import zlib
+import asyncio
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in {"1", "true", "yes", "y"}
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words and character n-grams (no model needed)."""
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        words = text.split()
+        feats = [f"w:{w}" for w in words]
+        padded = f" {text} "
+        lo, hi = self.ngram_range
+        for n in range(lo, hi + 1):
+            feats.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return feats
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = zlib.crc32(feat.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name: str = SEMANTIC_CACHE_MODEL):
+        from sentence_transformers import SentenceTransformer  # heavy; imported only when used
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+
+
+def default_embedder():
+    """Sentence-transformers when installed, otherwise the hashing stand-in."""
+    if SEMANTIC_CACHE_MODEL != "hashing":
+        try:
+            return SentenceTransformerEmbedder(SEMANTIC_CACHE_MODEL)
+        except Exception:
+            pass
+    return HashingEmbedder()
+
+
+class SemanticCacheService:
+    def __init__(self, embedder=None, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.embedder = embedder if embedder is not None else default_embedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vectors = np.zeros((max_entries, self.embedder.dim), dtype="float32")
+        self._keys: List[Optional[str]] = [None] * max_entries
+        self._scopes: List[Optional[str]] = [None] * max_entries
+        self._index = {}  # cache_key -> slot
+        self._next = 0  # ring buffer: the oldest entry is replaced when full
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, question: str, scope: str) -> Optional[Tuple[str, float]]:
+        """Return (cache_key, similarity) of the closest cached question, if close enough."""
+        if self._size == 0:
+            self.misses += 1
+            return None
+        q = self.embedder.encode([question])[0]
+        with self._lock:
+            scores = self._vectors[: self._size] @ q
+            mask = np.fromiter((s == scope for s in self._scopes[: self._size]), dtype=bool, count=self._size)
+            scores = np.where(mask, scores, -1.0)
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            key = self._keys[best]
+        if key is None or score < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return key, score
+
+    def add(self, question: str, scope: str, cache_key: str) -> None:
+        vec = self.embedder.encode([question])[0]
+        with self._lock:
+            slot = self._index.get(cache_key)
+            if slot is None:
+                slot = self._next
+                old = self._keys[slot]
+                if old is not None:
+                    self._index.pop(old, None)
+                self._next = (self._next + 1) % self.max_entries
+                self._size = min(self._size + 1, self.max_entries)
+            self._vectors[slot] = vec
+            self._keys[slot] = cache_key
+            self._scopes[slot] = scope
+            self._index[cache_key] = slot
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = [None] * self.max_entries
+            self._scopes = [None] * self.max_entries
+            self._index = {}
+            self._next = 0
+            self._size = 0
+
+    async def alookup(self, question: str, scope: str) -> Optional[Tuple[str, float]]:
+        # Embedding is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self.lookup, question, scope)
+
+    async def aadd(self, question: str, scope: str, cache_key: str) -> None:
+        await asyncio.to_thread(self.add, question, scope, cache_key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,203 @@
+"""Shared SQLite access layer used by the cache and the offline RAG queue.
+
+- Long-lived connections: one per thread, opened lazily and reused.
+- WAL journal and tuned pragmas, so readers never wait on the writer.
+- Reads run in a dedicated thread pool (`aquery`) to keep the event loop free.
+- Writes go through a single writer thread that batches everything queued
+  within a few milliseconds into one transaction (group commit). Each write
+  runs inside its own SAVEPOINT so one failing statement does not roll back
+  the rest of the batch.
+"""
+import os
+import queue
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+SQLITE_READ_THREADS = int(os.getenv("SQLITE_READ_THREADS", "4"))
+SQLITE_GROUP_COMMIT_MAX = int(os.getenv("SQLITE_GROUP_COMMIT_MAX", "256"))
+SQLITE_GROUP_COMMIT_WAIT_MS = float(os.getenv("SQLITE_GROUP_COMMIT_WAIT_MS", "2"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+WriteOp = Union[str, Callable[[sqlite3.Connection], Any]]
+
+_STOP = object()
+
+
+class SQLiteStore:
+    def __init__(self, path: str, read_threads: int = SQLITE_READ_THREADS):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._conn_lock = threading.Lock()
+        self._reader = ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix="sqlite-read")
+        self._writes: "queue.Queue" = queue.Queue()
+        self._closed = False
+
+        # Group commit stats
+        self.commits = 0
+        self.writes = 0
+
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-write", daemon=True)
+        self._writer.start()
+
+    # Connections
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: we manage transactions explicitly in the writer
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._conn_lock:
+                self._connections.append(conn)
+        return conn
+
+    # Reads
+    def query(self, sql: str, params: Sequence = ()) -> list:
+        """Run a read statement on this thread's connection and return all rows."""
+        return self._conn().execute(sql, params).fetchall()
+
+    async def aquery(self, sql: str, params: Sequence = ()) -> list:
+        """Run a read statement in the reader pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader, self.query, sql, params)
+
+    # Writes
+    def submit(self, op: WriteOp, params: Sequence = ()) -> Future:
+        """Queue a write for the next group commit.
+
+        `op` is either a SQL statement (run with `params`) or a callable that
+        receives the writer connection and runs inside the transaction; the
+        returned future resolves to the statement's rowcount or the callable's
+        return value once the batch is committed.
+        """
+        fut: Future = Future()
+        if self._closed:
+            fut.set_exception(RuntimeError(f"SQLiteStore for {self.path} is closed"))
+            return fut
+        self._writes.put((op, params, fut))
+        return fut
+
+    def execute(self, op: WriteOp, params: Sequence = ()) -> Any:
+        """Queue a write and block until it is committed."""
+        return self.submit(op, params).result()
+
+    async def aexecute(self, op: WriteOp, params: Sequence = ()) -> Any:
+        """Queue a write and await its commit without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(op, params))
+
+    def _write_loop(self) -> None:
+        conn = self._conn()
+        wait = SQLITE_GROUP_COMMIT_WAIT_MS / 1000.0
+        while True:
+            item = self._writes.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < SQLITE_GROUP_COMMIT_MAX:
+                try:
+                    item = self._writes.get(timeout=wait) if wait > 0 else self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit_batch(conn, batch)
+            if stop:
+                return
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op, params, fut in batch:
+                conn.execute("SAVEPOINT op")
+                try:
+                    if callable(op):
+                        res = op(conn)
+                    else:
+                        res = conn.execute(op, params).rowcount
+                    conn.execute("RELEASE op")
+                    results.append((fut, res, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    results.append((fut, None, e))
+            conn.execute("COMMIT")
+            self.commits += 1
+            self.writes += len(batch)
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            results = [(fut, None, e) for _, _, fut in batch]
+        for fut, res, err in results:
+            if fut.cancelled():
+                # The awaiting task was cancelled (e.g. at shutdown); the write itself is committed
+                continue
+            if err is not None:
+                fut.set_exception(err)
+            else:
+                fut.set_result(res)
+
+    def close(self) -> None:
+        """Flush queued writes, stop the writer and close all connections."""
+        if self._closed:
+            return
+        self._closed = True
+        self._writes.put(_STOP)
+        self._writer.join(timeout=10)
+        self._reader.shutdown(wait=True)
+        with self._conn_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+
+    def stats(self) -> dict:
+        return {
+            "pending_writes": self._writes.qsize(),
+            "writes": self.writes,
+            "commits": self.commits,
+        }
+
+
+_stores: Dict[str, SQLiteStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str) -> SQLiteStore:
+    """Return the process-wide store for `path`, creating it on first use."""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None or store._closed:
+            store = SQLiteStore(path)
+            _stores[path] = store
+        return store
+
+
+def close_all() -> None:
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
@@ -0,0 +1,56 @@
+"""Question normalization used to build cache keys.
+
+Normalizes case, whitespace, punctuation (Latin and Ethiopic, e.g. `።`, `፧`)
+and Unicode forms, and folds Ge'ez homophone letters (ሐ/ኀ→ሀ, ሠ→ሰ, ዐ→አ, ፀ→ጸ)
+that are written interchangeably in everyday Amharic, so spelling variants of
+the same question share one key.
+"""
+import re
+import unicodedata
+from typing import Dict
+
+
+def _homophone_table() -> Dict[int, int]:
+    table: Dict[int, int] = {}
+    # (variant family start, canonical family start); 7 vowel orders each
+    families = [
+        (0x1210, 0x1200),  # ሐ -> ሀ
+        (0x1280, 0x1200),  # ኀ -> ሀ
+        (0x1220, 0x1230),  # ሠ -> ሰ
+        (0x12D0, 0x12A0),  # ዐ -> አ
+        (0x1340, 0x1338),  # ፀ -> ጸ
+    ]
+    for variant, canonical in families:
+        for order in range(7):
+            table[variant + order] = canonical + order
+    return table
+
+
+_HOMOPHONES = _homophone_table()
+_WHITESPACE_RE = re.compile(r"\s+")
+_APOSTROPHE_RE = re.compile(r"['\u2019\u02bc]")
+
+
+def _strip_punctuation(text: str) -> str:
+    # Unicode categories P* (punctuation) and S* (symbols) cover both ASCII
+    # punctuation and the Ethiopic wordspace / full stop / question mark.
+    return "".join(" " if unicodedata.category(c)[0] in "PS" else c for c in text)
+
+
+def normalize_question(text: str) -> str:
+    """Canonical form of a question for exact-match cache keys."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = text.casefold().translate(_HOMOPHONES)
+    text = _APOSTROPHE_RE.sub("", text)  # "don't" -> "dont", not "don t"
+    text = _strip_punctuation(text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def make_cache_key(question: str, k: int, translate_local: bool) -> str:
+    """Cache / coalescing key for a chat request."""
+    return f"{normalize_question(question)}_{k}_{translate_local}"
+
+
+def cache_scope(k: int, translate_local: bool, language: str) -> str:
+    """Parameters a semantic cache hit must match exactly, including the question's language."""
+    return f"{k}_{translate_local}_{language}"
@@ -0,0 +1,273 @@
+"""Per-request tracing and sampled profiling.
+
+A `Trace` is a flat list of timed spans (name, start offset, duration, depth)
+attached to a request's `question_id`. The current trace lives in a
+contextvar, so `span(name)` anywhere down the call stack (including tasks
+spawned by the request, such as the coalesced RAG call) records into it and
+is a no-op outside a traced request. Finished traces go to a `TraceBuffer`
+that keeps the most recent traces and the slowest ones.
+
+`SamplingProfiler` runs cProfile for one in every N requests and aggregates
+the results. For async handlers the profile covers everything the event loop
+thread ran while the sampled request was in flight, so rates should stay low.
+"""
+import os
+import io
+import time
+import heapq
+import pstats
+import cProfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
+
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() in {"1", "true", "yes", "y"}
+TRACE_SLOWEST_N = int(os.getenv("TRACE_SLOWEST_N", "50"))
+TRACE_RECENT_N = int(os.getenv("TRACE_RECENT_N", "200"))
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 1-in-N requests; 0 disables
+# `sort` values pstats accepts (cumulative, tottime, ncalls, ...)
+PROFILE_SORT_KEYS = frozenset(pstats.Stats.sort_arg_dict_default)
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_depth: ContextVar[int] = ContextVar("trace_depth", default=0)
+
+
+class Trace:
+    def __init__(self, question_id: Optional[str] = None, name: str = "request", **attrs):
+        self.question_id = question_id
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.total_ms: Optional[float] = None
+        self.spans: List[dict] = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def add_span(self, name: str, start_ms: float, duration_ms: float, depth: int = 0) -> None:
+        self.spans.append({
+            "name": name,
+            "start_ms": round(start_ms, 3),
+            "duration_ms": round(duration_ms, 3),
+            "depth": depth,
+        })
+
+    def extend(self, spans: Iterable[dict], prefix: str = "", start_ms: float = 0.0, depth: int = 0) -> None:
+        """Graft spans recorded elsewhere (another thread, a remote) under this trace."""
+        for s in spans:
+            self.add_span(prefix + s["name"], start_ms + s.get("start_ms", 0.0), s["duration_ms"],
+                          depth + s.get("depth", 0))
+
+    @contextmanager
+    def span(self, name: str, depth: Optional[int] = None):
+        start = self.elapsed_ms()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, self.elapsed_ms() - start, _depth.get() if depth is None else depth)
+
+    def finish(self) -> float:
+        if self.total_ms is None:
+            self.total_ms = self.elapsed_ms()
+        return self.total_ms
+
+    def server_timing(self) -> str:
+        """Spans as an HTTP `Server-Timing` header value."""
+        return ", ".join(f"{s['name']};dur={s['duration_ms']:.3f}" for s in self.spans)
+
+    def to_dict(self) -> dict:
+        return {
+            "question_id": self.question_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": round(self.total_ms if self.total_ms is not None else self.elapsed_ms(), 3),
+            "attrs": self.attrs,
+            "spans": sorted(self.spans, key=lambda s: (s["start_ms"], s["depth"])),
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def start_trace(question_id: Optional[str] = None, name: str = "request", buffer: Optional["TraceBuffer"] = None,
+                **attrs):
+    """Make a new trace current for the block; finished traces go to `buffer`."""
+    if not TRACE_ENABLED:
+        yield None
+        return
+    trace = Trace(question_id, name, **attrs)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Async generators may be finalized in another context
+            pass
+        if buffer is not None:
+            buffer.add(trace)
+
+
+@contextmanager
+def span(name: str):
+    """Record a span in the current trace (no-op when there is none)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    try:
+        with trace.span(name, depth):
+            yield
+    finally:
+        try:
+            _depth.reset(token)
+        except ValueError:
+            pass
+
+
+def parse_server_timing(header: Optional[str]) -> List[dict]:
+    """Parse `name;dur=12.3, other;dur=4` into span dicts (start offsets unknown: 0)."""
+    spans = []
+    for part in (header or "").split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if not fields[0]:
+            continue
+        duration = 0.0
+        for f in fields[1:]:
+            if f.startswith("dur="):
+                try:
+                    duration = float(f[4:])
+                except ValueError:
+                    pass
+        spans.append({"name": fields[0], "start_ms": 0.0, "duration_ms": duration, "depth": 0})
+    return spans
+
+
+def record_server_timing(header: Optional[str], prefix: str = "remote.") -> None:
+    """Attach a remote's `Server-Timing` stages as children of the current span."""
+    trace = _current.get()
+    if trace is None or not header:
+        return
+    trace.extend(parse_server_timing(header), prefix=prefix, start_ms=trace.elapsed_ms(), depth=_depth.get())
+
+
+class TraceBuffer:
+    """Most recent traces (ring buffer) plus the slowest N seen (min-heap)."""
+
+    def __init__(self, slowest_n: int = TRACE_SLOWEST_N, recent_n: int = TRACE_RECENT_N):
+        self.slowest_n = max(1, slowest_n)
+        self._recent: deque = deque(maxlen=max(1, recent_n))
+        self._slowest: list = []  # (total_ms, seq, trace)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        total = trace.finish()
+        with self._lock:
+            self._seq += 1
+            self._recent.append(trace)
+            entry = (total, self._seq, trace)
+            if len(self._slowest) < self.slowest_n:
+                heapq.heappush(self._slowest, entry)
+            elif total > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self, limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [t.to_dict() for _, _, t in entries[:limit]]
+
+    def recent(self, limit: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            traces = list(self._recent)[::-1]
+        return [t.to_dict() for t in traces[:limit]]
+
+    def find(self, question_id: str) -> Optional[dict]:
+        with self._lock:
+            candidates = list(self._recent) + [t for _, _, t in self._slowest]
+        for t in candidates:
+            if t.question_id == question_id:
+                return t.to_dict()
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._slowest = []
+
+
+class SamplingProfiler:
+    """cProfile 1 in `sample_rate` requests and aggregate the stats."""
+
+    def __init__(self, sample_rate: int = PROFILE_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.requests = 0
+        self.sampled = 0
+        self._stats: Optional[pstats.Stats] = None
+        self._active = False
+        self._lock = threading.Lock()
+
+    def _should_sample(self) -> bool:
+        if self.sample_rate <= 0:
+            return False
+        with self._lock:
+            self.requests += 1
+            # Only one profiler can be active per interpreter
+            if self._active or self.requests % self.sample_rate:
+                return False
+            self._active = True
+            return True
+
+    @contextmanager
+    def maybe_profile(self):
+        if not self._should_sample():
+            yield False
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already running
+            self._active = False
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            profile.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+                self.sampled += 1
+                self._active = False
+
+    def report(self, limit: int = 40, sort: str = "cumulative") -> str:
+        if sort not in PROFILE_SORT_KEYS:
+            raise ValueError(f"unknown sort key {sort!r}; expected one of {sorted(PROFILE_SORT_KEYS)}")
+        with self._lock:
+            if self._stats is None:
+                return "no sampled requests yet\n"
+            out = io.StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = None
+            self.sampled = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"sample_rate": self.sample_rate, "requests": self.requests, "sampled": self.sampled}
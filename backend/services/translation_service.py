@@ -1,44 +1,281 @@
-"""Translation service stub that exposes a TranslationService class.
+"""Language detection and batched, cached translation.
 
-This file provides a minimal `TranslationService` class so other modules can
-import `TranslationService` reliably during local development. The
-implementation is intentionally a no-op (returns text unchanged) to avoid
-adding heavy translation dependencies. Replace with a real translator if
-needed in production.
+`TranslationService` sits in front of a pluggable `TranslationBackend`:
+
+- `none` (default): returns text unchanged (no translation dependency).
+- `offline`: deterministic glossary stand-in for tests and benchmarks, with an
+  optional simulated per-call latency (`TRANSLATION_OFFLINE_LATENCY_MS`).
+- `googletrans`: the public Google Translate client (needs network).
+
+Text is split into sentence segments. Segments are looked up in a bounded LRU
+cache keyed by (text, source, target). The misses are de-duplicated and sent
+to the backend `TRANSLATION_BATCH_SIZE` at a time, so an answer of many
+sentences costs one backend call and repeated sentences cost none.
+
+Script and language detection are regex-based. A Ge'ez-script text is
+Tigrinya (`ti`) when Tigrinya-only letters (ቐ, ኸ, ...) and function words
+(ኣብ, እዩ, እንታይ, ...) outnumber Amharic ones (ነው, እንዴት, ምንድን, ...),
+otherwise Amharic (`am`). Anything else is `en`.
 """
+import os
+import re
+import time
+import asyncio
+import inspect
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
-from typing import Optional
 
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "none")
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "10000"))  # segments; 0 disables
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "32"))  # segments per backend call
+TRANSLATION_OFFLINE_LATENCY_MS = float(os.getenv("TRANSLATION_OFFLINE_LATENCY_MS", "0"))
 
-class TranslationService:
-    """Minimal translation service used by the FastAPI backend.
+LOCAL_LANGUAGES = ("am", "ti")
 
-    Methods are intentionally lightweight and return the input text. They can
-    be replaced with calls to an external translation API or library.
-    """
+_GEEZ_RE = re.compile(r"[\u1200-\u137F\u1380-\u139F\u2D80-\u2DDF\uAB00-\uAB2F]")
+# Letters used in Tigrinya but not Amharic: ቐ-series, ቘ-series, ኸ-series, ዀ-series
+_TI_LETTERS_RE = re.compile(r"[\u1250-\u1256\u1258-\u125D\u12B8-\u12BE\u12C0-\u12C5]")
+# Tigrinya spells initial a- with ኣ where Amharic writes አ
+_TI_A_RE = re.compile(r"(?<![\u1200-\u137F])\u12A3")
 
-    def __init__(self):
-        pass
 
-    def detect_geez_script(self, text: str) -> str:
-        """Detect Ge'ez characters and return a language hint.
+def _word_re(words: Sequence[str]) -> "re.Pattern":
+    return re.compile(r"(?<![\u1200-\u137F])(?:" + "|".join(sorted(words, key=len, reverse=True)) + r")(?![\u1200-\u137F])")
+
 
-        Returns 'am' when Ge'ez characters are present, otherwise 'en'.
-        """
-        if any("\u1200" <= c <= "\u137F" for c in text):
-            return "am"
+_TI_WORDS_RE = _word_re(["ኣብ", "እዩ", "እያ", "እዮም", "እየን", "ከመይ", "ብኸመይ", "እንታይ", "ንምንታይ", "ናይ", "ምስ",
+                         "ኣሎ", "ኣለዉ", "የለን", "ክንደይ", "ኣየናይ", "ኣበይ", "መዓስ", "እዚ", "እቲ"])
+_AM_WORDS_RE = _word_re(["ነው", "ናቸው", "እንዴት", "ምንድን", "ምንድነው", "የት", "መቼ", "ስንት", "ይህ", "ይህን", "እና",
+                         "ላይ", "ውስጥ", "ጋር", "አለ", "የለም", "ለምን", "የትኛው", "ምን"])
+
+# Sentence segments, keeping the separators so text can be rebuilt exactly
+_SEGMENT_RE = re.compile(r"([.!?።፧\n]+\s*)")
+
+
+def has_geez(text: str) -> bool:
+    return _GEEZ_RE.search(text or "") is not None
+
+
+def detect_language(text: str) -> str:
+    """'ti' / 'am' for Ge'ez-script text, 'en' otherwise."""
+    if not has_geez(text):
         return "en"
+    ti = 2 * len(_TI_LETTERS_RE.findall(text)) + len(_TI_A_RE.findall(text)) + 2 * len(_TI_WORDS_RE.findall(text))
+    am = 2 * len(_AM_WORDS_RE.findall(text))
+    return "ti" if ti > am else "am"
 
-    def translate(self, text: str, source_lang: str = "am", target_lang: str = "en") -> str:
-        """Stub translator: returns text unchanged.
 
-        Signature matches the expected simple API used elsewhere in the app.
-        """
+# ---------------- BACKENDS ----------------
+class TranslationBackend:
+    """Translates a batch of segments in one call; results in input order."""
+
+    name = "base"
+    # Network / model backends are called off the event loop
+    blocking = True
+
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[str]:
+        raise NotImplementedError
+
+
+class IdentityBackend(TranslationBackend):
+    name = "none"
+    blocking = False
+
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[str]:
+        return list(texts)
+
+
+class OfflineBackend(TranslationBackend):
+    """Word-glossary stand-in: deterministic, no network, optional simulated latency."""
+
+    name = "offline"
+    GLOSSARY = {
+        "teff": "ጤፍ", "maize": "በቆሎ", "wheat": "ስንዴ", "barley": "ገብስ", "sorghum": "ማሽላ",
+        "fertilizer": "ማዳበሪያ", "seed": "ዘር", "soil": "አፈር", "water": "ውሃ", "rain": "ዝናብ",
+        "plant": "ተክል", "harvest": "ምርት", "farmer": "አርሶ አደር", "pest": "ተባይ", "disease": "በሽታ",
+    }
+
+    def __init__(self, latency_ms: float = TRANSLATION_OFFLINE_LATENCY_MS):
+        self.latency = max(0.0, latency_ms) / 1000.0
+        self._to_local = {en: local for en, local in self.GLOSSARY.items()}
+        self._to_en = {local: en for en, local in self.GLOSSARY.items()}
+        self.calls = 0
+
+    def _translate(self, text: str, table: Dict[str, str]) -> str:
+        for src in sorted(table, key=len, reverse=True):
+            text = re.sub(rf"(?i)(?<!\w){re.escape(src)}(?!\w)", table[src], text)
         return text
 
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[str]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)  # one round-trip per call, whatever the batch size
+        table = self._to_en if target == "en" else self._to_local
+        return [self._translate(t, table) for t in texts]
+
+
+class GoogletransBackend(TranslationBackend):
+    name = "googletrans"
+
+    def __init__(self):
+        from googletrans import LANGUAGES, Translator
+
+        self._languages = LANGUAGES
+        self._translator = Translator()
+
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[str]:
+        # Older releases lack some codes (e.g. 'ti'); let Google detect the source then
+        src = source if source in self._languages else "auto"
+        result = self._translator.translate(list(texts), src=src, dest=target)
+        if inspect.isawaitable(result):
+            # googletrans >= 4.0.2 is async-only; we are already off the event loop
+            result = asyncio.run(result)
+        return [r.text for r in result]
+
+
+_BACKENDS: Dict[str, Callable[[], TranslationBackend]] = {
+    "none": IdentityBackend,
+    "offline": OfflineBackend,
+    "googletrans": GoogletransBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[[], TranslationBackend]) -> None:
+    _BACKENDS[name] = factory
+
+
+def create_backend(name: str) -> TranslationBackend:
+    try:
+        return _BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"unknown translation backend {name!r} (known: {', '.join(sorted(_BACKENDS))})")
+
+
+# ---------------- SERVICE ----------------
+class TranslationService:
+    def __init__(self, backend=None, cache_size: int = TRANSLATION_CACHE_SIZE,
+                 batch_size: int = TRANSLATION_BATCH_SIZE):
+        self.backend_error: Optional[str] = None
+        if isinstance(backend, TranslationBackend):
+            self.backend = backend
+        else:
+            name = backend or TRANSLATION_BACKEND
+            try:
+                self.backend = create_backend(name)
+            except Exception as e:
+                # Missing optional dependency: keep serving untranslated text (reported in stats)
+                self.backend_error = f"{name}: {e}"
+                self.backend = IdentityBackend()
+        self.cache_size = max(0, cache_size)
+        self.batch_size = max(1, batch_size)
+        self._cache: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+        self.errors = 0
+        self.backend_seconds = 0.0
+
+    # Detection
+    def detect_language(self, text: str) -> str:
+        return detect_language(text)
+
+    def detect_geez_script(self, text: str) -> str:
+        """'am' / 'ti' when Ge'ez characters are present, otherwise 'en'."""
+        return detect_language(text)
+
+    # Translation
+    def translate_many(self, texts: Sequence[str], source_lang: str, target_lang: str) -> List[str]:
+        """Translate segments: cache hits first, then de-duplicated misses in batches."""
+        if source_lang == target_lang or not texts:
+            return list(texts)
+        results: List[Optional[str]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                if not text.strip():
+                    results[i] = text
+                    continue
+                key = (text, source_lang, target_lang)
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    results[i] = cached
+                else:
+                    self.misses += 1
+                    missing.setdefault(text, []).append(i)
+
+        pending = list(missing)
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            t0 = time.perf_counter()
+            try:
+                translated = self.backend.translate_batch(batch, source_lang, target_lang)
+                ok = len(translated) == len(batch)
+            except Exception:
+                ok = False
+            with self._lock:
+                self.calls += 1
+                self.backend_seconds += time.perf_counter() - t0
+                if not ok:
+                    # Serve the source text; nothing is cached so a later call retries
+                    self.errors += 1
+                    translated = batch
+                for text, out in zip(batch, translated):
+                    for i in missing[text]:
+                        results[i] = out
+                    if ok and self.cache_size:
+                        self._cache[(text, source_lang, target_lang)] = out
+                        if len(self._cache) > self.cache_size:
+                            self._cache.popitem(last=False)
+        return results  # type: ignore[return-value]
+
+    def translate(self, text: str, source_lang: str = "am", target_lang: str = "en") -> str:
+        """Translate `text` sentence by sentence (one batched backend call for all misses)."""
+        if not text or source_lang == target_lang:
+            return text
+        parts = _SEGMENT_RE.split(text)
+        segments = parts[0::2]  # separators sit at odd positions
+        translated = self.translate_many(segments, source_lang, target_lang)
+        parts[0::2] = translated
+        return "".join(parts)
+
     def translate_to_english(self, text: str, src_lang: Optional[str] = None) -> str:
-        return self.translate(text, source_lang=src_lang or "am", target_lang="en")
+        return self.translate(text, source_lang=src_lang or detect_language(text), target_lang="en")
 
     def translate_from_english(self, text: str, target_lang: str) -> str:
         return self.translate(text, source_lang="en", target_lang=target_lang)
 
+    async def atranslate(self, text: str, source_lang: str = "am", target_lang: str = "en") -> str:
+        # Network backends block; keep them off the event loop
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.translate, text, source_lang, target_lang)
+        return self.translate(text, source_lang, target_lang)
+
+    async def atranslate_to_english(self, text: str, src_lang: Optional[str] = None) -> str:
+        return await self.atranslate(text, src_lang or detect_language(text), "en")
+
+    async def atranslate_from_english(self, text: str, target_lang: str) -> str:
+        return await self.atranslate(text, "en", target_lang)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "backend_error": self.backend_error,
+            "entries": len(self._cache),
+            "max_entries": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "backend_calls": self.calls,
+            "backend_errors": self.errors,
+            "backend_seconds": round(self.backend_seconds, 3),
+        }
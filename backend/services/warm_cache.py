@@ -0,0 +1,249 @@
+"""Precomputed answers for the most frequent questions.
+
+`mine_questions` counts normalized questions in the query logs (including
+rotated `.jsonl.gz` files) and in `evaluation/questions.jsonl`. Evaluation
+questions are always included. `CacheWarmer.warm` answers the top questions
+through the normal `/chat` pipeline (`answer_fn`), which caches each result
+under its request cache key. It then records a manifest with the corpus version
+the answers were generated from.
+
+Freshness: the corpus version comes from the RAG server (`corpus_version` in
+its `/health`; it changes with the chunk file, index, models or prompt
+budget). At app startup:
+- `preload` loads the warmed entries from SQLite into the memory tier before
+  the first request is served, so the first request after a deploy is a memory hit;
+- `start` checks the version in the background, then every
+  `WARM_CACHE_CHECK_SECONDS`. When it differs from the manifest (or the
+  manifest expired), the entries are regenerated while the old ones keep serving.
+"""
+import os
+import glob
+import gzip
+import json
+import time
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from backend.services.text_normalization import cache_scope, make_cache_key, normalize_question
+from backend.services.translation_service import detect_language
+
+
+WARM_CACHE_ON_STARTUP = os.getenv("WARM_CACHE_ON_STARTUP", "false").lower() in {"1", "true", "yes", "y"}
+WARM_CACHE_TOP_N = int(os.getenv("WARM_CACHE_TOP_N", "300"))
+WARM_CACHE_MIN_COUNT = int(os.getenv("WARM_CACHE_MIN_COUNT", "2"))  # log occurrences to qualify
+WARM_CACHE_CONCURRENCY = int(os.getenv("WARM_CACHE_CONCURRENCY", "4"))
+WARM_CACHE_K = int(os.getenv("WARM_CACHE_K", "3"))  # /chat's default k
+WARM_CACHE_CHECK_SECONDS = float(os.getenv("WARM_CACHE_CHECK_SECONDS", "600"))  # 0 checks once, at startup
+
+MANIFEST_KEY = "__warm_cache_manifest__"
+
+EVAL_QUESTIONS_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "evaluation", "questions.jsonl")
+)
+
+
+def _iter_jsonl(path: str) -> Iterable[dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with opener(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except OSError:
+        return
+
+
+def query_log_paths(logs_dir: str) -> List[str]:
+    """The live query log plus its rotated (optionally gzipped) files."""
+    return sorted(glob.glob(os.path.join(logs_dir, "query_log*.jsonl*")))
+
+
+def mine_questions(log_paths: Iterable[str], eval_path: Optional[str] = EVAL_QUESTIONS_PATH,
+                   top_n: int = WARM_CACHE_TOP_N, min_count: int = WARM_CACHE_MIN_COUNT) -> List[Tuple[str, int]]:
+    """[(question, count), ...] most frequent first.
+
+    Questions are grouped by `normalize_question`. Each group is represented
+    by its most common raw spelling.
+    """
+    counts: Counter = Counter()
+    spellings: dict = {}
+    for path in log_paths:
+        for rec in _iter_jsonl(path):
+            q = rec.get("question")
+            if not q:
+                continue
+            key = normalize_question(q)
+            counts[key] += 1
+            spellings.setdefault(key, Counter())[q] += 1
+
+    pinned = set()
+    if eval_path:
+        for rec in _iter_jsonl(eval_path):
+            q = rec.get("question")
+            if q:
+                key = normalize_question(q)
+                pinned.add(key)
+                spellings.setdefault(key, Counter())[q] += 0
+
+    ranked = sorted(
+        (key for key in spellings if key and (key in pinned or counts[key] >= min_count)),
+        key=lambda key: (-counts[key], key not in pinned, key),
+    )
+    return [(spellings[key].most_common(1)[0][0], counts[key]) for key in ranked[:max(0, top_n)]]
+
+
+class CacheWarmer:
+    """Answer popular questions ahead of traffic and keep them fresh.
+
+    `answer_fn(question, k, cache_key, scope)` runs the full `/chat` pipeline,
+    caches the result and reports it in the returned `cached` flag;
+    `version_fn()` returns the current corpus version (or
+    None when it cannot be determined, e.g. the RAG server is down).
+    """
+
+    def __init__(self, cache_service, answer_fn: Callable[[str, int, str, str], Awaitable[dict]],
+                 version_fn: Callable[[], Awaitable[Optional[str]]],
+                 questions_fn: Callable[[], List[Tuple[str, int]]],
+                 k: int = WARM_CACHE_K, translate_local: bool = False, concurrency: int = WARM_CACHE_CONCURRENCY):
+        self.cache = cache_service
+        self.answer_fn = answer_fn
+        self.version_fn = version_fn
+        self.questions_fn = questions_fn
+        self.k = k
+        self.translate_local = translate_local
+        self.concurrency = max(1, concurrency)
+        self.state = "idle"
+        self.last_run: dict = {}
+        self.preloaded = 0
+        # Only the leader worker regenerates; the others reload what it wrote
+        self.regenerate = True
+        self._generated_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def scope(self, question: str) -> str:
+        """Semantic-cache scope `/chat` would use for `question` (language included)."""
+        return cache_scope(self.k, self.translate_local, detect_language(question))
+
+    async def manifest(self) -> Optional[dict]:
+        # Always from SQLite: another worker process may have rewritten it
+        self.cache.memory.discard(MANIFEST_KEY)
+        return await self.cache.aget(MANIFEST_KEY)
+
+    async def preload(self, manifest: Optional[dict] = None) -> int:
+        """Pull the warmed entries into the memory tier; returns how many were found."""
+        manifest = manifest if manifest is not None else await self.manifest()
+        found = 0
+        for key in (manifest or {}).get("keys", []):
+            if await self.cache.aget(key) is not None:
+                found += 1
+        self.preloaded = found
+        self._generated_at = (manifest or {}).get("generated_at")
+        return found
+
+    async def reload_if_changed(self) -> bool:
+        """Re-read warmed answers regenerated by another worker; True if they changed."""
+        manifest = await self.manifest()
+        if manifest is None or manifest.get("generated_at") == self._generated_at:
+            return False
+        for key in manifest.get("keys", []):
+            self.cache.memory.discard(key)
+        await self.preload(manifest)
+        return True
+
+    async def warm(self, questions: Optional[List[Tuple[str, int]]] = None, version: Optional[str] = None) -> dict:
+        """Answer `questions` (default: `questions_fn()`) and write the manifest."""
+        self.state = "warming"
+        t0 = time.perf_counter()
+        questions = questions if questions is not None else await asyncio.to_thread(self.questions_fn)
+        if version is None:
+            version = await self.version_fn()
+        sem = asyncio.Semaphore(self.concurrency)
+        result = {"questions": len(questions), "cached": 0, "uncached": 0, "errors": 0}
+        keys: List[str] = []
+
+        async def _one(question: str) -> None:
+            key = make_cache_key(question, self.k, self.translate_local)
+            async with sem:
+                try:
+                    data = await self.answer_fn(question, self.k, key, self.scope(question))
+                except Exception:
+                    result["errors"] += 1
+                    return
+            # Offline placeholders and errors are not cached by the pipeline. An older entry under
+            # the same key may still exist, so only what this run stored goes into the manifest.
+            if data and data.get("cached"):
+                result["cached"] += 1
+                keys.append(key)
+            else:
+                result["uncached"] += 1
+
+        try:
+            await asyncio.gather(*(_one(q) for q, _ in questions))
+            if keys:
+                self._generated_at = time.time()
+                await self.cache.aset(MANIFEST_KEY, {
+                    "corpus_version": version,
+                    "generated_at": self._generated_at,
+                    "k": self.k,
+                    "translate_local": self.translate_local,
+                    "keys": keys,
+                })
+        finally:
+            self.state = "idle"
+        result.update(corpus_version=version, seconds=round(time.perf_counter() - t0, 2), finished_at=time.time())
+        self.last_run = result
+        return result
+
+    async def refresh_if_stale(self) -> bool:
+        """Regenerate when the corpus version differs from the manifest's; True if it ran.
+
+        Nothing is done while the version is unknown (RAG server unreachable):
+        warming would only queue placeholders, and the old answers keep serving.
+        """
+        version = await self.version_fn()
+        if version is None:
+            return False
+        manifest = await self.manifest()
+        if manifest is not None and manifest.get("corpus_version") == version:
+            return False
+        await self.warm(version=version)
+        return True
+
+    def start(self, interval: float = WARM_CACHE_CHECK_SECONDS) -> None:
+        """Check freshness now and then every `interval` seconds, in the background."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._refresh_loop(interval))
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            try:
+                if self.regenerate:
+                    await self.refresh_if_stale()
+                await self.reload_if_changed()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.state = "idle"
+                self.last_run = {"error": str(e), "finished_at": time.time()}
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {"state": self.state, "regenerate": self.regenerate, "preloaded": self.preloaded,
+                "generated_at": self._generated_at, "last_run": self.last_run}
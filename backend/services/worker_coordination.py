@@ -0,0 +1,163 @@
+"""Coordination between worker processes serving the same app on one box.
+
+With several workers (`API_WORKERS` for the API, `scripts/prefork.py` for the
+RAG server), everything shared on disk must tolerate concurrent processes:
+
+- SQLite (cache, offline queue): WAL mode, and every write batch runs in
+  `BEGIN IMMEDIATE`, so queue claims stay atomic across processes.
+- Background duties that should run once per box (queue draining, cache
+  eviction, cache warming) go to the worker holding `LeaderLock`. The lock is
+  an advisory `flock` released by the kernel when its holder dies, so another
+  worker takes over on its next `try_acquire`.
+- JSONL logs: appends and rotation happen under `FileLock`.
+
+`process_memory()` reports this process's RSS and, on Linux, its PSS / USS.
+Pages shared copy-on-write with the parent are counted in RSS but not in USS,
+so USS measures what each extra worker really costs.
+"""
+import os
+import threading
+from typing import Optional
+
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+API_LEADER_LOCK = os.getenv("API_LEADER_LOCK") or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "api_leader.lock")
+)
+API_LEADER_RETRY_SECONDS = float(os.getenv("API_LEADER_RETRY_SECONDS", "10"))
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only, locks are no-ops
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive advisory lock on `path` (created if missing); re-entrant within a thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._depth = 0
+        self._local_lock = threading.RLock()
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._local_lock.acquire(blocking):
+            return False
+        if self._depth == 0 and fcntl is not None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                self._local_lock.release()
+                return False
+            self._fd = fd
+        self._depth += 1
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._local_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class LeaderLock:
+    """Non-blocking leader election: the first worker to `try_acquire` keeps the lock until it exits."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1  # no flock: a single process is always the leader
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None and fd >= 0:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _read_kb(path: str, fields) -> dict:
+    out = {}
+    try:
+        with open(path, "r", encoding="ascii") as fh:
+            for line in fh:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    out[fields[name]] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return out
+
+
+def process_memory(pid: Optional[int] = None) -> dict:
+    """{"pid", "rss_bytes", "pss_bytes", "uss_bytes", "shared_bytes"} for `pid` (default: this process).
+
+    PSS / USS come from /proc/<pid>/smaps_rollup (Linux >= 4.14) and are None elsewhere.
+    """
+    proc = f"/proc/{pid}" if pid is not None else "/proc/self"
+    mem = {"pid": pid if pid is not None else os.getpid(),
+           "rss_bytes": None, "pss_bytes": None, "uss_bytes": None, "shared_bytes": None}
+    rollup = _read_kb(f"{proc}/smaps_rollup", {
+        "Rss": "rss_bytes", "Pss": "pss_bytes", "Private_Clean": "private_clean", "Private_Dirty": "private_dirty",
+        "Shared_Clean": "shared_clean", "Shared_Dirty": "shared_dirty",
+    })
+    if "rss_bytes" in rollup:
+        mem["rss_bytes"] = rollup["rss_bytes"]
+        mem["pss_bytes"] = rollup.get("pss_bytes")
+        mem["uss_bytes"] = rollup.get("private_clean", 0) + rollup.get("private_dirty", 0)
+        mem["shared_bytes"] = rollup.get("shared_clean", 0) + rollup.get("shared_dirty", 0)
+        return mem
+    status = _read_kb(f"{proc}/status", {"VmRSS": "rss_bytes"})
+    if status:
+        mem["rss_bytes"] = status["rss_bytes"]
+        return mem
+    if pid is not None and pid != os.getpid():
+        return mem
+    try:
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        mem["rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024  # peak, not current
+    except Exception:
+        pass
+    return mem
+
+
+def memory_samples():
+    """`process_memory_bytes{kind}` samples for a metrics callback."""
+    mem = process_memory()
+    return [({"kind": kind[:-6]}, mem[kind]) for kind in ("rss_bytes", "pss_bytes", "uss_bytes", "shared_bytes")
+            if mem[kind] is not None]
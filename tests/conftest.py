@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+# Keep the app's databases, logs and leader lock out of the working tree; set
+# before anything imports backend.services (they read these at import time)
+_STATE_DIR = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.update({
+    "CACHE_DB_PATH": os.path.join(_STATE_DIR, "backend_cache.db"),
+    "RAG_QUEUE_DB_PATH": os.path.join(_STATE_DIR, "rag_queue.db"),
+    "LOGS_DIR": os.path.join(_STATE_DIR, "logs"),
+    "API_LEADER_LOCK": os.path.join(_STATE_DIR, "api_leader.lock"),
+    "RAG_MOCK": "true",
+    "RAG_REMOTE_URL": "",
+    "RAG_REMOTE_URLS": "",
+})
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from backend.services import rag_service as rag_module  # noqa: E402
+from backend.services.remote_router import RemoteRouter  # noqa: E402
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    """A RAGService in mock mode whose offline queue lives in `tmp_path`."""
+    monkeypatch.setattr(rag_module, "QUEUE_DB_PATH", str(tmp_path / "queue.db"))
+    monkeypatch.setattr(rag_module, "RAG_BACKOFF_BASE", 0.0)
+    service = rag_module.RAGService()
+    service._init_queue_db()
+    return service
+
+
+@pytest.fixture
+def remote(rag):
+    """Switch `rag` to remote mode against a mock transport: `remote(handler, urls)`."""
+    def connect(handler, urls=("http://rag-a",)):
+        rag.remote_urls = list(urls)
+        rag.remote_url = rag.remote_urls[0]
+        rag.remote_mode, rag.mock_mode = True, False
+        rag.router = RemoteRouter(rag.remote_urls, health_interval=0)
+        rag._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return rag
+
+    return connect
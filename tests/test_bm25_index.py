@@ -0,0 +1,83 @@
+import json
+import math
+import os
+
+import pytest
+
+from bm25_index import BM25Index, is_stale, open_bm25_index, rrf_fuse, tokenize
+
+TEXTS = [
+    "Teff is sown in July after the first rains.",
+    "Maize needs nitrogen fertilizer; maize yields drop without it.",
+    "Sorghum tolerates drought better than maize.",
+    "",
+]
+
+
+@pytest.fixture
+def chunks_path(tmp_path):
+    path = tmp_path / "chunks.jsonl"
+    path.write_text("".join(json.dumps({"text": t}) + "\n" for t in TEXTS), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path, chunks_path):
+    return open_bm25_index(str(tmp_path / "bm25"), chunks_path)
+
+
+def _reference_score(query, doc, k1=1.5, b=0.75):
+    docs = [tokenize(t) for t in TEXTS]
+    avgdl = sum(len(d) for d in docs) / len(docs)
+    score = 0.0
+    for term in tokenize(query):
+        df = sum(term in d for d in docs)
+        tf = docs[doc].count(term)
+        if not tf:
+            continue
+        idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+        score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(docs[doc]) / avgdl))
+    return score
+
+
+def test_tokenize_drops_stopwords_and_folds_case():
+    assert tokenize("When is TEFF sown?") == ["teff", "sown"]
+
+
+def test_scores_match_the_bm25_formula(index):
+    query = "maize fertilizer"
+    scores = index.scores(query)
+    assert len(index) == 4 and index.manifest["terms"] > 0
+    for doc in range(len(TEXTS)):
+        assert scores[doc] == pytest.approx(_reference_score(query, doc), rel=1e-5)
+
+
+def test_search_returns_positive_hits_best_first(index):
+    ids, scores = index.search("maize fertilizer", k=4)
+    assert ids == [1, 2]
+    assert scores[0] > scores[1] > 0
+    assert index.search("unknown words", k=3) == ([], [])
+    assert index.search_batch(["teff", "drought"], k=1) == [[0], [2]]
+
+
+def test_index_is_rebuilt_when_chunks_change(tmp_path, chunks_path, index):
+    index_dir = str(tmp_path / "bm25")
+    assert not is_stale(index_dir, chunks_path)
+    with open(chunks_path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"text": "Barley grows in the highlands."}) + "\n")
+    os.utime(chunks_path, (0, 0))
+    assert is_stale(index_dir, chunks_path)
+
+    rebuilt = open_bm25_index(index_dir, chunks_path)
+    assert len(rebuilt) == 5 and rebuilt.search("barley", 1)[0] == [4]
+    assert not os.path.exists(index_dir + ".old")
+    assert BM25Index(index_dir).manifest["count"] == 5
+
+
+def test_rrf_fuse_rewards_agreement():
+    dense, sparse = [3, 1, 2], [1, 4, 3]
+    assert rrf_fuse([dense, sparse], k=4) == [1, 3, 4, 2]
+    assert rrf_fuse([dense, sparse], k=1) == [1]
+    # Ties break on the smaller chunk id
+    assert rrf_fuse([[5], [2]], k=2) == [2, 5]
+    assert rrf_fuse([], k=3) == []
@@ -0,0 +1,49 @@
+from backend.services.semantic_cache_service import HashingEmbedder, SemanticCacheService
+from backend.services.text_normalization import cache_scope, make_cache_key
+
+
+def test_scope_includes_language():
+    assert cache_scope(3, False, "en") != cache_scope(3, False, "am")
+    assert cache_scope(3, False, "am") != cache_scope(3, False, "ti")
+    assert cache_scope(3, False, "en") != cache_scope(5, False, "en")
+    assert cache_scope(3, False, "en") != cache_scope(3, True, "en")
+
+
+def test_cache_key_ignores_spelling_variants():
+    assert make_cache_key("What is Teff?", 3, False) == make_cache_key("  what is teff ", 3, False)
+    assert make_cache_key("What is teff?", 3, False) != make_cache_key("What is teff?", 5, False)
+
+
+def test_semantic_hit_stays_within_scope():
+    cache = SemanticCacheService(embedder=HashingEmbedder(), threshold=0.9, max_entries=8)
+    en = cache_scope(3, False, "en")
+    am = cache_scope(3, False, "am")
+    cache.add("how do i plant teff", en, "key-en")
+
+    key, score = cache.lookup("how do i plant teff", en)
+    assert key == "key-en" and score > 0.99
+    assert cache.lookup("how do i plant teff", am) is None
+    assert cache.lookup("how do i plant teff", cache_scope(5, False, "en")) is None
+
+
+def test_semantic_cache_same_question_in_two_scopes():
+    cache = SemanticCacheService(embedder=HashingEmbedder(), threshold=0.9, max_entries=8)
+    en = cache_scope(3, False, "en")
+    am = cache_scope(3, False, "am")
+    cache.add("teff", en, "key-en")
+    cache.add("teff", am, "key-am")
+
+    assert cache.lookup("teff", en)[0] == "key-en"
+    assert cache.lookup("teff", am)[0] == "key-am"
+
+
+def test_semantic_cache_ring_buffer_evicts_oldest():
+    cache = SemanticCacheService(embedder=HashingEmbedder(), threshold=0.9, max_entries=2)
+    scope = cache_scope(3, False, "en")
+    cache.add("first question about maize", scope, "k1")
+    cache.add("second question about sorghum", scope, "k2")
+    cache.add("third question about wheat", scope, "k3")
+
+    assert cache.lookup("first question about maize", scope) is None
+    assert cache.lookup("third question about wheat", scope)[0] == "k3"
+    assert cache.stats()["entries"] == 2
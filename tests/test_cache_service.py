@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from backend.services.cache_service import CacheService, MemoryLRU
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheService(db_path=str(tmp_path / "cache.db"), ttl_seconds=3600, max_rows=0, max_bytes=0)
+
+
+def _age(cache, key, seconds):
+    cache._store.execute("UPDATE cache SET updated_at = datetime('now', ?) WHERE key = ?", (f"-{seconds} seconds", key))
+    cache.memory.discard(key)
+
+
+def test_lru_evicts_least_recently_used():
+    lru = MemoryLRU(max_entries=2, max_bytes=1000)
+    lru.put("a", {"v": 1}, 10)
+    lru.put("b", {"v": 2}, 10)
+    lru.get("a")
+    lru.put("c", {"v": 3}, 10)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == {"v": 1} and lru.get("c") == {"v": 3}
+    assert lru.stats()["evictions"] == 1
+
+
+def test_lru_is_bounded_by_bytes():
+    lru = MemoryLRU(max_entries=100, max_bytes=25)
+    for key in "abc":
+        lru.put(key, {}, 10)
+    assert lru.stats()["entries"] == 2 and lru.stats()["bytes"] == 20
+    lru.put("huge", {}, 26)
+    assert lru.get("huge") is None
+
+
+def test_lru_entry_expires():
+    lru = MemoryLRU(max_entries=10, max_bytes=1000)
+    lru.put("old", {}, 1, expires_at=time.time() - 1)
+    lru.put("new", {}, 1, expires_at=time.time() + 60)
+    assert lru.get("old") is None
+    assert lru.get("new") == {}
+
+
+def test_get_falls_through_to_sqlite_and_refills_memory(cache):
+    cache.set("k", {"answer": "teff"})
+    cache.memory.clear()
+
+    assert cache.get("k") == {"answer": "teff"}
+    assert cache.stats()["sqlite"]["hits"] == 1
+    assert cache.memory.get("k") == {"answer": "teff"}
+
+
+def test_expired_sqlite_row_is_a_miss(cache):
+    cache.set("k", {"answer": "teff"})
+    _age(cache, "k", 7200)
+
+    assert cache.get("k") is None
+    assert cache.stats()["sqlite"]["expired"] == 1
+
+
+def test_evict_applies_ttl(cache):
+    cache.set("old", {})
+    cache.set("new", {})
+    _age(cache, "old", 7200)
+
+    assert cache.evict() == 1
+    assert cache.get("new") == {} and cache.get("old") is None
+
+
+def test_evict_applies_max_rows_oldest_first(tmp_path):
+    cache = CacheService(db_path=str(tmp_path / "rows.db"), ttl_seconds=0, max_rows=2, max_bytes=0)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.set(key, {"i": i})
+        _age(cache, key, 100 - i)
+
+    assert cache.evict() == 1
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+
+
+def test_evict_applies_max_bytes(tmp_path):
+    cache = CacheService(db_path=str(tmp_path / "bytes.db"), ttl_seconds=0, max_rows=0, max_bytes=110)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.set(key, {"text": "x" * 40})  # 53 bytes with its key
+        _age(cache, key, 100 - i)
+
+    assert cache.evict() == 1
+    assert cache.get("a") is None
+
+
+def test_delete_removes_both_tiers(cache):
+    cache.set("k", {"v": 1})
+    cache.delete("k")
+    assert cache.memory.get("k") is None and cache.get("k") is None
+
+
+def test_clear_empties_both_tiers(cache):
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.clear()
+    assert cache.memory.stats()["entries"] == 0
+    assert cache.get("a") is None and cache.get("b") is None
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from backend.app import main
+from backend.app.main import NOT_FOUND_ANSWER, ChatRequest, _sse
+
+
+def _parse(chunks):
+    events = []
+    for chunk in chunks:
+        assert chunk.endswith("\n\n")
+        event, data = chunk[:-2].split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def _stream(monkeypatch, events, question=None):
+    async def query_stream(question, k=3, queue_context=None):
+        for event in events:
+            yield event
+
+    monkeypatch.setattr(main.rag_service, "query_stream", query_stream)
+    request = ChatRequest(question=question or f"how to plant teff {uuid.uuid4()}", k=3)
+
+    async def collect():
+        return [chunk async for chunk in main._stream_events(request, "qid", None)]
+
+    return request, _parse(asyncio.run(collect()))
+
+
+def test_sse_framing():
+    assert _sse("token", "ሰላም") == 'event: token\ndata: "ሰላም"\n\n'
+    assert _sse("done", {"a": 1}) == 'event: done\ndata: {"a": 1}\n\n'
+
+
+def test_sources_then_tokens_then_done(monkeypatch):
+    sources = [{"text": "Teff is sown in July.", "metadata": {"source": "teff.pdf"}}]
+    request, events = _stream(monkeypatch, [
+        {"event": "sources", "data": sources},
+        {"event": "token", "data": "Sow "},
+        {"event": "token", "data": "in July."},
+        {"event": "done", "data": {"backend": "remote"}},
+    ])
+
+    assert [name for name, _ in events] == ["meta", "sources", "token", "token", "done"]
+    assert events[1][1] == sources
+    assert events[-1][1] == {"question_id": "qid", "backend": "remote", "from_cache": False}
+    cached = main.cache_service.get(main.make_cache_key(request.question, 3, False))
+    assert cached["answer"] == "Sow in July."
+
+
+def test_cached_answer_is_replayed(monkeypatch):
+    question = f"cached question {uuid.uuid4()}"
+    sources = [{"text": "t", "metadata": {}}]
+    _stream(monkeypatch, [{"event": "sources", "data": sources}, {"event": "token", "data": "answer"},
+                          {"event": "done", "data": {"backend": "remote"}}], question)
+
+    _, events = _stream(monkeypatch, [], question)
+    assert [name for name, _ in events] == ["meta", "sources", "token", "done"]
+    assert events[2][1] == "answer" and events[3][1]["from_cache"] is True
+
+
+def test_answer_without_sources_is_not_found(monkeypatch):
+    _, events = _stream(monkeypatch, [
+        {"event": "sources", "data": []},
+        {"event": "token", "data": "made up"},
+        {"event": "done", "data": {"backend": "remote"}},
+    ])
+    assert [data for name, data in events if name == "token"] == [NOT_FOUND_ANSWER]
+
+
+@pytest.mark.parametrize("backend", ["remote-offline", "error"])
+def test_placeholder_answer_is_passed_through_and_not_cached(monkeypatch, backend):
+    placeholder = "ML service is offline. Your question has been queued."
+    request, events = _stream(monkeypatch, [
+        {"event": "sources", "data": []},
+        {"event": "token", "data": placeholder},
+        {"event": "done", "data": {"backend": backend}},
+    ])
+
+    assert [data for name, data in events if name == "token"] == [placeholder]
+    assert main.cache_service.get(main.make_cache_key(request.question, 3, False)) is None
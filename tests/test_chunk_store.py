@@ -0,0 +1,72 @@
+import json
+import os
+import pickle
+
+import pytest
+
+from chunk_store import ChunkStore, build_chunk_store, is_stale, open_chunk_store, write_store
+
+
+@pytest.fixture
+def chunks(tmp_path):
+    path = tmp_path / "chunks.jsonl"
+    rows = [
+        {"text": "Teff is sown in July.", "source": "teff.pdf", "page": 3},
+        {"text": "ጤፍ በሐምሌ ይዘራል።", "source": "teff_am.pdf"},
+        {"text": "", "deleted": True},
+    ]
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows), encoding="utf-8")
+    return str(path), rows
+
+
+def test_round_trip_texts_and_metadata(tmp_path, chunks):
+    chunks_path, rows = chunks
+    store = open_chunk_store(str(tmp_path / "store"), chunks_path, None)
+    try:
+        assert len(store) == 3
+        assert [store[i] for i in range(3)] == [r["text"] for r in rows]
+        assert store.metadata(0) == {"source": "teff.pdf", "page": 3}
+        assert store.metadata(1) == {"source": "teff_am.pdf"}  # absent keys stay absent
+        assert store.metadata(2) == {"deleted": True}
+        with pytest.raises(IndexError):
+            store.text(3)
+    finally:
+        store.close()
+
+
+def test_metadata_pickle_takes_precedence(tmp_path, chunks):
+    chunks_path, _ = chunks
+    metadata_path = tmp_path / "metadata.pkl"
+    metadata_path.write_bytes(pickle.dumps([{"source": "a"}, {"source": "b"}, {"source": "c"}]))
+    store = open_chunk_store(str(tmp_path / "store"), chunks_path, str(metadata_path))
+    try:
+        assert [store.metadata(i)["source"] for i in range(3)] == ["a", "b", "c"]
+    finally:
+        store.close()
+
+
+def test_store_is_rebuilt_when_chunks_change(tmp_path, chunks):
+    chunks_path, _ = chunks
+    store_dir = str(tmp_path / "store")
+    assert is_stale(store_dir, chunks_path, None)
+    build_chunk_store(chunks_path, None, store_dir)
+    assert not is_stale(store_dir, chunks_path, None)
+
+    with open(chunks_path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"text": "Maize needs nitrogen."}) + "\n")
+    os.utime(chunks_path, (0, 0))
+    assert is_stale(store_dir, chunks_path, None)
+    store = open_chunk_store(store_dir, chunks_path, None)
+    try:
+        assert store[3] == "Maize needs nitrogen."
+    finally:
+        store.close()
+
+
+def test_empty_store(tmp_path):
+    write_store([], str(tmp_path / "empty"))
+    store = ChunkStore(str(tmp_path / "empty"))
+    try:
+        assert len(store) == 0
+    finally:
+        store.close()
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from backend.services.coalescing_service import RequestCoalescer
+
+
+def test_concurrent_identical_keys_run_once():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(coalescer.run("teff_3_False", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["answer"] * 5
+    assert sorted(coalesced for _, coalesced in results) == [False, True, True, True, True]
+    assert coalescer.stats() == {"inflight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_different_keys_do_not_coalesce():
+    coalescer = RequestCoalescer()
+
+    async def run():
+        return await asyncio.gather(coalescer.run("a", lambda: asyncio.sleep(0, "a")),
+                                    coalescer.run("b", lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(run()) == [("a", False), ("b", False)]
+
+
+def test_key_is_released_after_completion():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        first = await coalescer.run("k", work)
+        second = await coalescer.run("k", work)
+        return first, second
+
+    assert asyncio.run(run()) == ((1, False), (2, False))
+
+
+def test_failure_reaches_every_waiter_and_is_not_cached():
+    coalescer = RequestCoalescer()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("remote failed")
+
+    async def run():
+        return await asyncio.gather(*(coalescer.run("k", boom) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+    assert coalescer.stats()["inflight"] == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    coalescer = RequestCoalescer()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        leader = asyncio.ensure_future(coalescer.run("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(coalescer.run("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == ("answer", True)
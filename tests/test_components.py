@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from components import FAILED, PENDING, READY, ComponentRegistry
+
+
+def test_nothing_loads_until_first_use():
+    calls = []
+    registry = ComponentRegistry()
+    registry.register("index", lambda: calls.append("index") or "faiss")
+
+    assert registry["index"].state == PENDING and calls == []
+    assert registry.get("index") == "faiss"
+    assert registry.get("index") == "faiss"
+    assert calls == ["index"]
+    assert registry.ready()
+
+
+def test_concurrent_callers_wait_for_one_load():
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return "model"
+
+    registry = ComponentRegistry()
+    registry.register("generator", slow)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("generator"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    assert results == ["model"] * 4 and calls == [1]
+    assert registry.status()["generator"]["seconds"] >= 0.05
+
+
+def test_failed_load_is_reported_and_retried():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("weights missing")
+        return "ok"
+
+    registry = ComponentRegistry()
+    registry.register("embedder", flaky)
+    registry.load_all()
+    status = registry.status()["embedder"]
+    assert status["state"] == FAILED and "weights missing" in status["error"]
+    assert not registry.ready()
+
+    assert registry.get("embedder") == "ok"
+    assert registry.status()["embedder"]["state"] == READY
+
+
+def test_background_load_in_order():
+    order = []
+    registry = ComponentRegistry()
+    for name in ("index", "chunks", "embedder"):
+        registry.register(name, lambda name=name: order.append(name) or name)
+    registry.start_background(["index", "embedder"])
+    registry._thread.join(5)
+
+    assert order == ["index", "embedder"]
+    assert registry.ready(["index", "embedder"]) and not registry.ready()
+
+
+def test_set_installs_a_stand_in():
+    registry = ComponentRegistry()
+    registry.register("translator", lambda: pytest.fail("must not load"))
+    registry.set("translator", "identity")
+    assert registry.get("translator") == "identity"
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import rag_check
+from context_builder import build_contexts, dedup_chunks, split_sentences
+
+
+def word_count(texts):
+    return [len(t.split()) for t in texts]
+
+
+def keyword_embed(texts):
+    # One dimension per topic word, so the query "teff" scores teff sentences highest
+    return np.array([[("teff" in t.lower()) * 1.0, ("maize" in t.lower()) * 1.0, 0.1] for t in texts])
+
+
+def test_split_sentences_handles_ethiopic_punctuation():
+    assert split_sentences("ጤፍ ይዘራል። በሐምሌ ነው፧ Yes.\nNext line") == ["ጤፍ ይዘራል።", "በሐምሌ ነው፧", "Yes.", "Next line"]
+    assert split_sentences("") == []
+
+
+def test_dedup_drops_later_near_duplicate_chunks():
+    a = "teff is sown in july after the first rains"
+    assert dedup_chunks([a, a.upper() + "!", "maize needs nitrogen fertilizer"]) == [0, 2]
+    assert dedup_chunks([a, a], threshold=1.1) == [0, 1]
+
+
+def test_build_contexts_packs_best_sentences_in_original_order():
+    chunks = [
+        "Maize needs nitrogen. Teff is sown in July. Teff likes loam.",
+        "Maize needs nitrogen. Store teff dry.",
+    ]
+    query = keyword_embed(["teff"])
+    (out,) = build_contexts(query, [chunks], keyword_embed, word_count, budget=11, max_sentences=4)
+
+    assert out["contexts"] == ["Teff is sown in July. Teff likes loam.", "Store teff dry."]
+    assert out["tokens"] == 11
+    assert out["tokens_full"] == 17
+    assert out["chunks_dropped"] == 0
+
+
+def test_build_contexts_keeps_the_best_sentence_over_budget():
+    (out,) = build_contexts(keyword_embed(["teff"]), [["Teff is sown in July after rain."]],
+                            keyword_embed, word_count, budget=1)
+    assert out["contexts"] == ["Teff is sown in July after rain."] and out["tokens"] == 7
+
+
+def test_build_contexts_with_no_chunks():
+    out = build_contexts(keyword_embed(["teff", "maize"]), [[], []], keyword_embed, word_count)
+    assert out == [{"contexts": [], "tokens": 0, "tokens_full": 0, "chunks_dropped": 0}] * 2
+
+
+class Chunks:
+    def text(self, i):
+        return f"chunk {i}"
+
+
+def test_packing_off_skips_token_counting(monkeypatch):
+    monkeypatch.setattr(rag_check, "RAG_CONTEXT_TOKENS", 0)
+    monkeypatch.setattr(rag_check, "get_chunks", lambda: Chunks())
+
+    def fail(texts):
+        pytest.fail("chunks should not be tokenized with packing off")
+
+    monkeypatch.setattr(rag_check, "count_tokens", fail)
+    packed = rag_check.assemble_contexts(["q1", "q2"], [[1, 2], []])
+    assert packed == [
+        {"contexts": ["chunk 1", "chunk 2"], "tokens": None, "tokens_full": None, "chunks_dropped": 0},
+        {"contexts": [], "tokens": None, "tokens_full": None, "chunks_dropped": 0},
+    ]
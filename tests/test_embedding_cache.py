@@ -0,0 +1,69 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+class Encoder:
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[float(len(t))] * self.dim for t in texts])
+
+
+def test_misses_are_encoded_once_in_a_single_batch():
+    cache, encode = EmbeddingCache(8), Encoder()
+    out = cache.encode(["what is teff", "What is teff?", "maize"], encode)
+
+    assert encode.calls == [["what is teff", "maize"]]
+    assert out.dtype == np.float32 and out.shape == (3, 4)
+    assert np.array_equal(out[0], out[1])
+    assert cache.misses == 3 and cache.encoded == 2
+
+
+def test_hits_skip_the_encoder():
+    cache, encode = EmbeddingCache(8), Encoder()
+    first = cache.encode(["teff"], encode)
+    again = cache.encode(["TEFF"], encode)
+
+    assert len(encode.calls) == 1
+    assert np.array_equal(first, again)
+    assert cache.stats()["hits"] == 1 and cache.stats()["hit_rate"] == 0.5
+
+
+def test_least_recently_used_key_is_evicted():
+    cache, encode = EmbeddingCache(2), Encoder()
+    cache.encode(["a1", "b22"], encode)
+    cache.encode(["a1"], encode)
+    cache.encode(["c333"], encode)
+
+    assert cache.evictions == 1 and len(cache) == 2
+    encode.calls.clear()
+    cache.encode(["a1", "c333", "b22"], encode)
+    assert encode.calls == [["b22"]]
+    assert cache.stats()["bytes"] == 2 * 4 * 4
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "emb.npz")
+    cache, encode = EmbeddingCache(4, model_name="m", path=path), Encoder()
+    vectors = cache.encode(["teff", "maize"], encode)
+    assert cache.save() == path
+
+    restored = EmbeddingCache(4, model_name="m", path=path)
+    assert restored.load() == 2
+    encode.calls.clear()
+    assert np.array_equal(restored.encode(["teff", "maize"], encode), vectors)
+    assert encode.calls == []
+
+
+def test_load_ignores_a_file_for_another_model(tmp_path):
+    path = str(tmp_path / "emb.npz")
+    cache = EmbeddingCache(4, model_name="old", path=path)
+    cache.encode(["teff"], Encoder())
+    cache.save()
+
+    assert EmbeddingCache(4, model_name="new", path=path).load() == 0
+    assert EmbeddingCache(4, model_name="old", path=str(tmp_path / "missing.npz")).load() == 0
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from evaluate_rag import NOT_FOUND, compare, extractive_generate, keywords, share, summarize, token_f1
+
+
+def test_keywords_drop_stopwords_and_short_words():
+    assert keywords("What is the best fertilizer for teff in Ethiopia?") == {"fertilizer", "teff"}
+
+
+def test_share_of_an_empty_set_is_zero():
+    assert share({"a", "b"}, {"a", "b", "c", "d"}) == 0.5
+    assert share({"a"}, set()) == 0.0
+
+
+def test_token_f1():
+    assert token_f1("plant teff early", "plant teff early") == 1.0
+    assert token_f1("plant teff", "harvest maize") == 0.0
+    assert token_f1("plant teff early", "plant teff") == pytest.approx(0.8)
+    assert token_f1("", "") == 1.0 and token_f1("", "teff") == 0.0
+
+
+def test_extractive_generate_picks_sentences_sharing_question_keywords():
+    packed = [{"contexts": ["Maize needs rain. Teff is sown in July. Sorghum tolerates drought."]}, {"contexts": []}]
+    answers = extractive_generate(["When is teff sown?", "anything"], [[1], []], packed, max_sentences=1)
+    assert answers == ["Teff is sown in July.", NOT_FOUND]
+
+
+def test_summarize_averages_present_metrics_per_group():
+    records = [
+        {"lang": "en", "tokens": 10, "not_found": 0},
+        {"lang": "en", "tokens": 20, "not_found": 1},
+        {"lang": "am", "tokens": 5, "not_found": None},
+    ]
+    out = summarize(records, by="lang")
+    assert out["en"]["n"] == 2 and out["en"]["tokens"] == 15.0 and out["en"]["not_found"] == 0.5
+    assert out["am"]["not_found"] is None
+    assert summarize(records)["all"]["n"] == 3
+
+
+def test_compare_against_baseline(tmp_path):
+    baseline = {
+        "records": [
+            {"id": 1, "retrieved": [1, 2, 3], "answer": "teff in july"},
+            {"id": 2, "retrieved": [4, 5, 6], "answer": "maize"},
+        ],
+        "summary": {"overall": {"all": {"tokens": 12.0, "context_ms": 1.0, "generate_ms": 2.0}}},
+    }
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(baseline), encoding="utf-8")
+    records = [
+        {"id": 1, "retrieved": [1, 2, 3], "answer": "teff in july", "tokens": 10},
+        {"id": 2, "retrieved": [4, 7, 8], "answer": "sorghum", "tokens": 10},
+        {"id": 3, "retrieved": [9], "answer": "new question", "tokens": 10},
+    ]
+
+    out = compare(records, str(path), k=3)
+    assert out["questions"] == 2
+    assert out["retrieval_overlap"] == pytest.approx((1.0 + 1 / 3) / 2)
+    assert out["answer_f1"] == pytest.approx(0.5)
+    assert out["overall"]["tokens"] == (12.0, 10.0)
+    assert [row["id"] for row in out["changed"]] == [2]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from index_builder import (  # noqa: E402
+    INDEX_TYPES, build_index, default_nlist, evaluate, get_search_params, index_path, load_vectors, set_search_params,
+)
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    data = np.random.default_rng(0).standard_normal((400, 32)).astype("float32")
+    faiss.normalize_L2(data)
+    return data
+
+
+def test_index_paths(tmp_path):
+    assert index_path("flat", str(tmp_path)).endswith("faiss_index")
+    assert index_path("hnsw", str(tmp_path)).endswith("faiss_index.hnsw")
+
+
+def test_default_nlist_keeps_enough_training_points():
+    assert default_nlist(400) == 10
+    assert default_nlist(10) == 1
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_every_type_finds_the_query_itself(vectors, index_type):
+    index = build_index(vectors, index_type, nlist=8, pq_m=8, hnsw_m=16, ef_construction=64)
+    set_search_params(index, nprobe=8, ef_search=64)
+    _, ids = index.search(vectors[:20], 1)
+    hits = np.mean(ids[:, 0] == np.arange(20))
+    assert index.ntotal == len(vectors)
+    assert hits >= (0.7 if index_type == "ivf_pq" else 0.95)
+
+
+def test_search_params_are_clamped(vectors):
+    ivf = build_index(vectors, "ivf_flat", nlist=8)
+    assert set_search_params(ivf, nprobe=100) == {"nprobe": 8, "nlist": 8}
+    hnsw = build_index(vectors, "hnsw", hnsw_m=8, ef_construction=32)
+    assert set_search_params(hnsw, ef_search=0)["efSearch"] == 1
+    assert get_search_params(build_index(vectors, "flat")) == {}
+
+
+def test_pq_m_must_divide_dimension(vectors):
+    with pytest.raises(ValueError):
+        build_index(vectors, "ivf_pq", nlist=8, pq_m=5)
+
+
+def test_exact_search_has_full_recall(vectors):
+    flat = build_index(vectors, "flat")
+    _, truth = flat.search(vectors[:10], 5)
+    assert evaluate(flat, vectors[:10], truth, 5)["recall_at_k"] == 1.0
+
+
+def test_load_vectors_from_flat_index(tmp_path, vectors):
+    faiss.write_index(build_index(vectors, "flat"), index_path("flat", str(tmp_path)))
+    np.testing.assert_allclose(load_vectors(str(tmp_path)), vectors, atol=1e-6)
@@ -0,0 +1,189 @@
+import threading
+import time
+
+import pytest
+
+from components import Component, thread_load_seconds
+from inference_executor import InferenceExecutor, Overloaded
+
+
+def _echo(items):
+    return [f"done:{item}" for item in items]
+
+
+def _block(executor):
+    """Occupy the executor's only worker until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+        return "held"
+
+    job = executor.call(hold)
+    assert started.wait(5)
+    return job, release
+
+
+def test_batches_and_returns_results_in_order():
+    executor = InferenceExecutor(_echo, workers=1, max_queue=8, max_batch_size=4, max_wait_ms=20, name="test-batch")
+    held, release = _block(executor)
+    jobs = [executor.submit(i) for i in range(4)]
+    release.set()
+
+    assert [job.result(5) for job in jobs] == ["done:0", "done:1", "done:2", "done:3"]
+    assert held.result(5) == "held"
+    stats = executor.stats()
+    assert stats["completed"] == 5
+    assert stats["avg_batch_size"] > 1
+
+
+def test_cancelled_job_is_skipped():
+    seen = []
+
+    def batch_fn(items):
+        seen.extend(items)
+        return _echo(items)
+
+    executor = InferenceExecutor(batch_fn, workers=1, max_queue=8, name="test-cancel")
+    _, release = _block(executor)
+    cancelled = executor.submit("gone")
+    kept = executor.submit("kept")
+    assert cancelled.future.cancel()
+    release.set()
+
+    assert kept.result(5) == "done:kept"
+    assert seen == ["kept"]
+    assert executor.stats()["cancelled"] == 1
+    assert executor.stats()["failed"] == 0
+
+
+def test_job_expired_in_queue_is_dropped_before_compute():
+    seen = []
+
+    def batch_fn(items):
+        seen.extend(items)
+        return _echo(items)
+
+    executor = InferenceExecutor(batch_fn, workers=1, max_queue=8, name="test-expire")
+    _, release = _block(executor)
+    job = executor.submit("late", deadline=time.monotonic() + 0.05)
+    time.sleep(0.1)
+    release.set()
+
+    with pytest.raises(Overloaded) as err:
+        job.result(5)
+    assert err.value.reason == "deadline"
+    assert seen == []
+    assert executor.stats()["expired"] == 1
+
+
+def test_queue_full_is_rejected_at_once():
+    executor = InferenceExecutor(_echo, workers=1, max_queue=1, name="test-full")
+    _, release = _block(executor)
+    executor.submit("queued")
+    try:
+        with pytest.raises(Overloaded) as err:
+            executor.submit("one too many")
+        assert err.value.reason == "queue_full"
+        assert err.value.retry_after >= 1
+        assert executor.stats()["rejected"]["queue_full"] == 1
+    finally:
+        release.set()
+
+
+def test_deadline_shorter_than_a_batch_is_rejected():
+    def slow(items):
+        time.sleep(0.05)
+        return _echo(items)
+
+    executor = InferenceExecutor(slow, workers=1, max_queue=8, name="test-deadline")
+    executor.submit("warmup").result(5)  # gives the executor a service-time estimate
+    held, release = _block(executor)
+    try:
+        with pytest.raises(Overloaded) as err:
+            executor.check(deadline=time.monotonic() + 0.001)
+        assert err.value.reason == "deadline"
+        with pytest.raises(Overloaded):
+            executor.submit("hopeless", deadline=time.monotonic() + 0.001)
+        assert executor.stats()["rejected"]["deadline"] == 2
+    finally:
+        release.set()
+    held.result(5)
+    while executor.stats()["running"]:
+        time.sleep(0.001)
+
+    # Idle: admitted whatever the (stale, much too high) estimate says
+    executor._service, executor._service_at = 60.0, time.monotonic()
+    executor.check(deadline=time.monotonic() + 1)
+    assert executor.submit("fine", deadline=time.monotonic() + 1).result(5) == "done:fine"
+    assert executor.stats()["rejected"]["deadline"] == 2
+
+
+def test_estimate_decays_without_batches():
+    executor = InferenceExecutor(_echo, workers=1, name="test-decay", service_half_life=10)
+    executor._service, executor._service_at = 4.0, time.monotonic() - 20
+    assert executor.stats()["batch_ms_ewma"] == pytest.approx(1000.0, rel=0.01)
+
+
+def test_component_load_time_is_left_out_of_the_estimate():
+    model = Component("model", lambda: time.sleep(0.3) or "loaded")
+
+    def batch_fn(items):
+        model.get()
+        return _echo(items)
+
+    executor = InferenceExecutor(batch_fn, workers=1, name="test-load", setup_seconds=thread_load_seconds)
+    assert executor.submit("first").result(5) == "done:first"
+    assert executor.stats()["batch_ms_ewma"] < 100
+
+
+def test_retry_after_rounds_up_to_whole_batches():
+    executor = InferenceExecutor(_echo, workers=2, max_queue=8, name="test-drain")
+    _, release = _block(executor)
+    try:
+        executor._service, executor._service_at = 3.0, time.monotonic()
+        # One of two workers busy: the running batch still has to finish
+        assert executor.retry_after() == 3.0
+    finally:
+        release.set()
+
+
+def test_batch_fn_errors_fail_every_job_in_the_batch():
+    def broken(items):
+        raise ValueError("model crashed")
+
+    executor = InferenceExecutor(broken, workers=1, max_queue=8, max_batch_size=2, max_wait_ms=50, name="test-fail")
+    jobs = [executor.submit(i) for i in range(2)]
+    for job in jobs:
+        with pytest.raises(ValueError):
+            job.result(5)
+    assert executor.stats()["failed"] == 2
+
+
+def test_standalone_call_is_not_batched():
+    seen = []
+
+    def batch_fn(items):
+        seen.append(list(items))
+        return _echo(items)
+
+    executor = InferenceExecutor(batch_fn, workers=1, max_queue=8, max_batch_size=4, max_wait_ms=20, name="test-call")
+    held, release = _block(executor)
+    before = executor.submit("a")
+    alone = executor.call(lambda: "standalone")
+    after = executor.submit("b")
+    release.set()
+
+    assert (before.result(5), alone.result(5), after.result(5)) == ("done:a", "standalone", "done:b")
+    assert seen == [["a"], ["b"]]
+
+
+def test_call_outside_the_estimate_leaves_it_alone():
+    executor = InferenceExecutor(_echo, workers=1, max_queue=8, name="test-bulk")
+    executor.submit("request").result(5)
+    before = executor._service
+
+    assert executor.call(lambda: time.sleep(0.2) or "bulk", estimate=False).result(5) == "bulk"
+    assert executor._service == before
+    assert executor.stats()["batch_ms_ewma"] < 100
@@ -0,0 +1,95 @@
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from ingest import deleted_ids, ingest, read_state, status  # noqa: E402
+from index_builder import index_path  # noqa: E402
+
+DIM = 16
+
+
+def encode(texts):
+    """Deterministic stand-in for the sentence encoder; records what it was asked to embed."""
+    encode.calls.extend(texts)
+    rows = [np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(DIM) for t in texts]
+    return np.asarray(rows, dtype="float32")
+
+
+@pytest.fixture
+def paths(tmp_path):
+    encode.calls = []
+    (tmp_path / "chunks").mkdir()
+    (tmp_path / "vectors").mkdir()
+    return {
+        "chunks_path": str(tmp_path / "chunks" / "chunks.jsonl"),
+        "metadata_path": None,
+        "vector_dir": str(tmp_path / "vectors"),
+        "store_dir": str(tmp_path / "chunkstore"),
+        "bm25_dir": str(tmp_path / "bm25"),
+        "state_path": str(tmp_path / "ingest" / "state.json"),
+        "lock_path": str(tmp_path / "ingest" / ".lock"),
+    }
+
+
+def _doc(doc_id, *paragraphs):
+    # Long enough that each paragraph is its own chunk
+    return {"doc_id": doc_id, "text": "\n\n".join(f"{p} " + "word " * 30 for p in paragraphs)}
+
+
+def _chunks(paths):
+    with open(paths["chunks_path"], encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_removed_document_is_tombstoned(paths):
+    ingest([_doc("a", "alpha one", "alpha two"), _doc("b", "beta one")], encode_fn=encode, **paths)
+    report = ingest(remove=["a"], encode_fn=encode, **paths)
+
+    assert report["removed_documents"] == 1 and report["deleted"] == 2
+    chunks = _chunks(paths)
+    # Tombstones keep their line so chunk ids stay positions in every index
+    assert len(chunks) == 3
+    assert [c.get("deleted", False) for c in chunks] == [True, True, False]
+    assert chunks[0]["text"] == "" and chunks[0]["doc_id"] == "a"
+    assert deleted_ids(paths["state_path"]) == {0, 1}
+
+    index = faiss.read_index(index_path("flat", paths["vector_dir"]))
+    assert index.ntotal == 1
+    assert set(faiss.vector_to_array(index.id_map)) == {2}
+
+
+def test_edit_replaces_only_changed_chunks(paths):
+    ingest([_doc("a", "first paragraph", "second paragraph")], encode_fn=encode, **paths)
+    encode.calls.clear()
+    report = ingest([_doc("a", "first paragraph", "second paragraph edited")], encode_fn=encode, **paths)
+
+    assert report["kept"] == 1 and report["added"] == 1 and report["deleted"] == 1
+    assert len(encode.calls) == 1 and encode.calls[0].startswith("second paragraph edited")
+    chunks = _chunks(paths)
+    assert chunks[1].get("deleted") and chunks[2]["text"].startswith("second paragraph edited")
+    assert status(paths["chunks_path"], None, paths["vector_dir"], paths["state_path"])["live"] == 2
+
+
+def test_reingesting_unchanged_document_is_a_no_op(paths):
+    doc = _doc("a", "same text")
+    ingest([doc], encode_fn=encode, **paths)
+    generation = read_state(paths["state_path"])["generation"]
+    encode.calls.clear()
+
+    report = ingest([doc], encode_fn=encode, **paths)
+    assert report["unchanged_documents"] == 1 and report["deleted"] == 0
+    assert encode.calls == []
+    assert read_state(paths["state_path"])["generation"] == generation
+
+
+def test_text_moved_between_documents_reuses_its_vector(paths):
+    ingest([_doc("a", "shared paragraph")], encode_fn=encode, **paths)
+    encode.calls.clear()
+    report = ingest([_doc("b", "shared paragraph")], remove=[], encode_fn=encode, **paths)
+
+    assert report["added"] == 1 and report["reused"] == 1 and report["embedded"] == 0
+    assert encode.calls == []
@@ -0,0 +1,14 @@
+import bench_batching
+import load_bench
+
+
+def test_percentile_is_shared_by_both_benches():
+    assert load_bench.percentile is bench_batching.percentile
+
+
+def test_percentile_picks_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+    assert load_bench.percentile(values, 0) == 1
+    assert load_bench.percentile(values, 50) == 3
+    assert load_bench.percentile(values, 100) == 5
+    assert load_bench.percentile([], 95) == 0.0
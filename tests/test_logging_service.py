@@ -0,0 +1,83 @@
+import gzip
+import json
+import os
+import threading
+
+import pytest
+
+from backend.services.logging_service import BufferedJsonlWriter
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh]
+
+
+class _StalledWriter(BufferedJsonlWriter):
+    """Blocks inside its first flush until `release` is set, so the queue fills up."""
+
+    def __init__(self, **kwargs):
+        self.flushing, self.release = threading.Event(), threading.Event()
+        super().__init__(**kwargs)
+
+    def _flush(self, batch):
+        self.flushing.set()
+        self.release.wait(5)
+        super()._flush(batch)
+
+
+def test_records_are_written_on_close(tmp_path):
+    path = str(tmp_path / "query_log.jsonl")
+    writer = BufferedJsonlWriter(flush_interval=60, rotate_bytes=0, rotate_daily=False)
+    for i in range(5):
+        assert writer.write(path, {"i": i, "q": "ጤፍ"})
+    writer.close()
+
+    assert _read(path) == [{"i": i, "q": "ጤፍ"} for i in range(5)]
+    assert writer.stats()["written"] == 5
+    assert not writer.write(path, {"late": True})
+
+
+def test_batches_flush_on_size(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    writer = BufferedJsonlWriter(flush_batch=2, flush_interval=60, rotate_bytes=0, rotate_daily=False)
+    for i in range(4):
+        writer.write(path, {"i": i})
+    writer.close()
+    assert len(_read(path)) == 4
+    assert writer.stats()["flushes"] >= 2
+
+
+@pytest.mark.parametrize("policy, kept", [("drop_newest", [0, 1]), ("drop_oldest", [0, 2])])
+def test_full_queue_drops_by_policy(tmp_path, policy, kept):
+    path = str(tmp_path / "log.jsonl")
+    writer = _StalledWriter(max_queue=1, flush_batch=1, flush_interval=60, rotate_bytes=0, rotate_daily=False,
+                            drop_policy=policy)
+    writer.write(path, {"i": 0})
+    assert writer.flushing.wait(5)
+    writer.write(path, {"i": 1})
+    writer.write(path, {"i": 2})
+    writer.release.set()
+    writer.close()
+
+    assert [rec["i"] for rec in _read(path)] == kept
+    assert writer.stats()["dropped"] == 1
+
+
+def test_unknown_drop_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BufferedJsonlWriter(drop_policy="drop_everything")
+
+
+def test_rotation_by_size_compresses_old_file(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    writer = BufferedJsonlWriter(flush_batch=1, flush_interval=60, rotate_bytes=10, rotate_daily=False, compress=True)
+    writer.write(path, {"first": "x" * 20})
+    writer.write(path, {"second": True})
+    writer.close()
+
+    rotated = [name for name in os.listdir(tmp_path) if name.endswith(".jsonl.gz")]
+    assert len(rotated) == 1 and writer.stats()["rotations"] == 1
+    with gzip.open(tmp_path / rotated[0], "rt", encoding="utf-8") as fh:
+        assert json.loads(fh.read()) == {"first": "x" * 20}
+    assert _read(path) == [{"second": True}]
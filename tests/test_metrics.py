@@ -0,0 +1,66 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.services.metrics_service import MetricsRegistry
+
+
+def test_counter_and_labels_render():
+    registry = MetricsRegistry()
+    counter = registry.counter("chat_total", "Answered requests", ["backend"])
+    counter.inc(backend="remote")
+    counter.inc(2, backend='say "hi"\n')
+
+    text = registry.render()
+    assert "# TYPE chat_total counter" in text
+    assert 'chat_total{backend="remote"} 1' in text
+    assert 'chat_total{backend="say \\"hi\\"\\n"} 2' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    hist = registry.histogram("stage_seconds", "Stage latency", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        hist.observe(value, stage="rag")
+
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="rag",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="rag",le="1.0"} 2' in lines
+    assert 'stage_seconds_bucket{stage="rag",le="+Inf"} 3' in lines
+    assert 'stage_seconds_count{stage="rag"} 3' in lines
+    assert 'stage_seconds_sum{stage="rag"} 5.55' in lines
+
+
+def test_callback_is_read_at_scrape_time_and_errors_are_skipped():
+    registry = MetricsRegistry()
+    depth = [3]
+    registry.callback("queue_depth", "Queued questions", "gauge", lambda: [({}, depth[0])])
+    registry.callback("broken", "Raises", "gauge", lambda: 1 / 0)
+    assert "queue_depth 3" in registry.render()
+    depth[0] = 7
+    text = registry.render()
+    assert "queue_depth 7" in text and "broken" not in text
+
+
+def test_registering_a_name_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("c", "doc") is registry.counter("c", "doc")
+
+
+def test_streaming_request_is_timed_until_the_body_ends(monkeypatch):
+    async def query_stream(question, k=3, queue_context=None):
+        yield {"event": "sources", "data": [{"text": "t", "metadata": {}}]}
+        for token in ("slow ", "answer"):
+            await asyncio.sleep(0.1)
+            yield {"event": "token", "data": token}
+        yield {"event": "done", "data": {"backend": "remote"}}
+
+    monkeypatch.setattr(main.rag_service, "query_stream", query_stream)
+    before = main.HTTP_SECONDS._values.get(("/chat/stream", "200"), [0.0])[-1]
+
+    response = TestClient(main.app).post("/chat/stream", json={"question": "streamed timing question"})
+    assert response.status_code == 200 and "event: done" in response.text
+
+    elapsed = main.HTTP_SECONDS._values[("/chat/stream", "200")][-1] - before
+    assert elapsed >= 0.2
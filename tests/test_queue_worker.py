@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import httpx
+
+from backend.services.queue_worker import OfflineQueueWorker
+
+
+def _rows(service):
+    return service._queue_store.query("SELECT question, cache_key FROM pending ORDER BY id")
+
+
+def test_repeated_question_is_queued_once(rag):
+    async def queue():
+        for _ in range(3):
+            await rag._queue_request("what is teff", 3, {"cache_key": "what is teff_3_False"})
+        await rag._queue_request("another", 3, {"cache_key": "another_3_False"})
+
+    asyncio.run(queue())
+    assert _rows(rag) == [("what is teff", "what is teff_3_False"), ("another", "another_3_False")]
+
+
+def test_clear_queue_drops_pending_rows(rag):
+    asyncio.run(rag._queue_request("what is teff", 3))
+    asyncio.run(rag._queue_request("another", 3))
+    assert rag.clear_queue() == 2
+    assert rag.queue_depth() == 0
+
+
+def test_streamed_question_is_queued_with_its_context(remote):
+    service = remote(lambda request: httpx.Response(503))
+    context = {"original_question": "ጤፍ", "cache_key": "ጤፍ_3_False", "scope": "3_False_am"}
+
+    async def stream():
+        return [event async for event in service.query_stream("teff", 3, queue_context=context)]
+
+    for _ in range(2):
+        events = asyncio.run(stream())
+        assert events[-1]["data"]["backend"] == "remote-offline"
+    assert _rows(service) == [("teff", "ጤፍ_3_False")]
+    stored = json.loads(service._queue_store.query("SELECT context FROM pending")[0][0])
+    assert stored == context
+
+
+def test_drain_delivers_answers(rag, monkeypatch):
+    async def remote_answer(question, k, retries=1):
+        return {"answer": f"answer to {question}", "sources": []}
+
+    monkeypatch.setattr(rag, "_call_remote_with_retries_async", remote_answer)
+    delivered = []
+
+    async def on_result(context, result):
+        delivered.append((context["cache_key"], result["answer"]))
+
+    async def run():
+        await rag._queue_request("q1", 3, {"cache_key": "k1"})
+        await rag._queue_request("q2", 3, {"cache_key": "k2"})
+        return await OfflineQueueWorker(rag, on_result=on_result).drain()
+
+    assert asyncio.run(run()) == 2
+    assert sorted(delivered) == [("k1", "answer to q1"), ("k2", "answer to q2")]
+    assert _rows(rag) == []
+
+
+def test_drain_keeps_rows_while_remote_is_down(rag, monkeypatch):
+    async def remote_down(question, k, retries=1):
+        return None
+
+    monkeypatch.setattr(rag, "_call_remote_with_retries_async", remote_down)
+
+    async def run():
+        await rag._queue_request("q1", 3, {"cache_key": "k1"})
+        return await OfflineQueueWorker(rag, on_result=None).drain()
+
+    assert asyncio.run(run()) == 0
+    status, attempts = rag._queue_store.query("SELECT status, attempts FROM pending")[0]
+    assert status == "pending" and attempts == 1
+
+
+def test_rows_move_to_dead_letter_after_max_attempts(rag, monkeypatch):
+    async def remote_down(question, k, retries=1):
+        return None
+
+    monkeypatch.setattr(rag, "_call_remote_with_retries_async", remote_down)
+    worker = OfflineQueueWorker(rag, on_result=None, max_attempts=2)
+
+    async def run():
+        await rag._queue_request("q1", 3, {"cache_key": "k1"})
+        for _ in range(2):
+            await worker.drain()
+
+    asyncio.run(run())
+    assert _rows(rag) == []
+    assert rag._queue_store.query("SELECT question, attempts FROM dead_letter") == [("q1", 2)]
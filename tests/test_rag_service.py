@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import httpx
+
+
+def _answer(request):
+    body = json.loads(request.content)
+    return httpx.Response(200, json={"answer": f"about {body['question']}", "sources": [{"source": "manual.pdf"}]})
+
+
+def test_remote_answer_is_normalized(remote):
+    service = remote(_answer)
+    data = asyncio.run(service.query("teff", k=3))
+
+    assert data["answer"] == "about teff"
+    assert data["backend"] == "remote"
+    assert data["answer_local"] is None
+    assert isinstance(data["sources"], list)
+
+
+def test_concurrent_queries_share_one_client(remote):
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        return _answer(request)
+
+    service = remote(handler)
+    client = service._async_client
+
+    async def run():
+        return await asyncio.gather(*(service.query(f"q{i}") for i in range(10)))
+
+    results = asyncio.run(run())
+    assert [r["answer"] for r in results] == [f"about q{i}" for i in range(10)]
+    assert seen == ["/ask"] * 10
+    assert service._get_async_client() is client
+
+
+def test_failed_attempt_is_retried(remote):
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(500) if len(calls) == 1 else _answer(request)
+
+    service = remote(handler)
+    assert asyncio.run(service.query("maize"))["answer"] == "about maize"
+    assert len(calls) == 2
+
+
+def test_offline_remote_queues_and_returns_stub(remote):
+    service = remote(lambda request: httpx.Response(503))
+    data = asyncio.run(service.query("sorghum", queue_context={"cache_key": "sorghum_3_False"}))
+
+    assert data["backend"] == "remote-offline"
+    assert service.queue_depth() == 1
+
+
+def test_mock_mode_answers_without_remote(rag):
+    data = asyncio.run(rag.query("teff", k=2))
+    assert data["backend"] == "mock-rag"
+    assert data["answer"]
@@ -0,0 +1,213 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.services import remote_router
+from backend.services.remote_router import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, NoEndpointAvailable, RemoteRouter,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(remote_router.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.acquire()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.opens == 1
+    assert not breaker.available()
+    assert not breaker.acquire()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_admits_one_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.available()
+
+    assert breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.available()
+    assert not breaker.acquire()
+
+
+def test_half_open_trial_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+    assert breaker.acquire() and breaker.acquire()
+
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=10)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 10
+    breaker.acquire()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.opens == 2
+    assert not breaker.available()
+    clock.now += 10
+    assert breaker.available()
+
+
+def test_released_trial_can_be_retaken(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.acquire()
+    breaker.release()
+    assert breaker.acquire()
+
+
+def test_call_fails_fast_when_every_breaker_is_open():
+    router = RemoteRouter(["http://a", "http://b"], failure_threshold=1, reset_timeout=60)
+    for ep in router.endpoints:
+        ep.breaker.record_failure()
+
+    async def fn(ep):
+        raise AssertionError("no endpoint should be called")
+
+    with pytest.raises(NoEndpointAvailable):
+        asyncio.run(router.call(fn))
+    assert router.rejected == 1
+    assert not router.any_available()
+
+
+def test_call_failures_open_the_breaker():
+    router = RemoteRouter(["http://a"], failure_threshold=2, reset_timeout=60)
+
+    async def fn(ep):
+        raise httpx.ConnectError("down")
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(router.call(fn))
+    ep = router.endpoints[0]
+    assert ep.breaker.state == OPEN
+    assert ep.errors == 2 and ep.inflight == 0
+
+
+def test_reset_closes_breakers_and_clears_stats():
+    router = RemoteRouter(["http://a"], failure_threshold=1, reset_timeout=60)
+
+    async def fn(ep):
+        raise httpx.ConnectError("down")
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(router.call(fn))
+    with pytest.raises(NoEndpointAvailable):
+        asyncio.run(router.call(fn))
+
+    router.reset()
+    ep = router.endpoints[0]
+    assert ep.url == "http://a" and ep.breaker.state == CLOSED
+    assert ep.breaker.failure_threshold == 1 and ep.breaker.reset_timeout == 60
+    assert ep.requests == 0 and ep.errors == 0 and router.rejected == 0
+
+
+def test_hedge_to_second_endpoint_wins():
+    router = RemoteRouter(["http://a", "http://b"], hedge=True, hedge_default_ms=20, hedge_min_ms=20)
+    called = []
+
+    async def fn(ep):
+        called.append(ep.url)
+        if len(called) == 1:
+            await asyncio.sleep(5)
+        return ep.url
+
+    result = asyncio.run(router.call(fn))
+    assert len(called) == 2 and result == called[1]
+    assert router.hedged == 1 and router.hedge_wins == 1
+    winner = next(ep for ep in router.endpoints if ep.url == called[1])
+    loser = next(ep for ep in router.endpoints if ep.url == called[0])
+    assert winner.requests == 1 and winner.ewma_ms is not None
+    # The cancelled loser is neither a failure nor a latency sample, and not left in flight
+    assert loser.requests == 0 and loser.ewma_ms is None
+    assert loser.inflight == 0 and loser.errors == 0
+
+
+def test_cancelled_half_open_trial_does_not_close_the_breaker():
+    router = RemoteRouter(["http://a"], failure_threshold=1, reset_timeout=0)
+    ep = router.endpoints[0]
+    ep.breaker.record_failure()
+
+    async def run():
+        task = asyncio.ensure_future(router.call(lambda ep: asyncio.sleep(5)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert ep.breaker.state == HALF_OPEN and ep.requests == 0
+    # The trial slot was given back for the next request
+    assert ep.breaker.acquire()
+
+
+def test_no_hedge_when_primary_answers_in_time():
+    router = RemoteRouter(["http://a", "http://b"], hedge=True, hedge_default_ms=1000, hedge_min_ms=1000)
+
+    async def fn(ep):
+        return ep.url
+
+    asyncio.run(router.call(fn))
+    assert router.hedged == 0
+
+
+def _probe(router, handler):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await router.probe(client)
+
+    return asyncio.run(run())
+
+
+def test_probe_counts_only_2xx_as_healthy():
+    router = RemoteRouter(["http://ok", "http://missing"], failure_threshold=1, reset_timeout=60)
+
+    def handler(request):
+        return httpx.Response(200 if request.url.host == "ok" else 404)
+
+    assert _probe(router, handler)
+    ok, missing = router.endpoints
+    assert ok.breaker.state == CLOSED
+    assert missing.breaker.state == OPEN
+
+
+def test_probe_closes_recovered_endpoint():
+    router = RemoteRouter(["http://a"], failure_threshold=1, reset_timeout=60)
+    router.endpoints[0].breaker.record_failure()
+
+    assert _probe(router, lambda request: httpx.Response(200))
+    assert router.endpoints[0].breaker.state == CLOSED
@@ -0,0 +1,64 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.services.sqlite_store import SQLiteStore, get_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.db"))
+    store.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT UNIQUE)")
+    yield store
+    store.close()
+
+
+def test_concurrent_writes_are_all_committed(store):
+    async def write_all():
+        await asyncio.gather(*(store.aexecute("INSERT INTO t (v) VALUES (?)", (str(i),)) for i in range(200)))
+
+    asyncio.run(write_all())
+    assert store.query("SELECT COUNT(*) FROM t")[0][0] == 200
+    # Group commit: far fewer transactions than writes
+    assert store.commits < 200
+
+
+def test_failing_write_does_not_roll_back_its_batch(store):
+    ok1 = store.submit("INSERT INTO t (v) VALUES ('a')")
+    dup = store.submit("INSERT INTO t (v) VALUES ('a')")
+    ok2 = store.submit("INSERT INTO t (v) VALUES ('b')")
+
+    assert ok1.result(5) == 1 and ok2.result(5) == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        dup.result(5)
+    assert [row[0] for row in store.query("SELECT v FROM t ORDER BY v")] == ["a", "b"]
+
+
+def test_callable_runs_in_the_writer_transaction(store):
+    def claim(conn):
+        conn.execute("INSERT INTO t (v) VALUES ('x')")
+        return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+    assert store.execute(claim) == 1
+
+
+def test_reads_from_the_reader_pool(store):
+    store.execute("INSERT INTO t (v) VALUES ('r')")
+    assert asyncio.run(store.aquery("SELECT v FROM t")) == [("r",)]
+
+
+def test_writes_after_close_fail(store):
+    store.close()
+    with pytest.raises(RuntimeError):
+        store.execute("INSERT INTO t (v) VALUES ('late')")
+
+
+def test_connections_use_wal_and_are_reused(store):
+    assert store.query("PRAGMA journal_mode")[0][0] == "wal"
+    assert store._conn() is store._conn()
+
+
+def test_get_store_returns_one_store_per_path(tmp_path):
+    path = str(tmp_path / "shared.db")
+    assert get_store(path) is get_store(path)
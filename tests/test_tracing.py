@@ -0,0 +1,95 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.main import ChatRequest
+from backend.services.tracing_service import (
+    SamplingProfiler, Trace, TraceBuffer, parse_server_timing, record_server_timing, span, start_trace,
+)
+
+
+def test_spans_nest_under_the_current_trace():
+    with start_trace("q1", "/chat") as trace:
+        with span("answer"):
+            with span("rag_query"):
+                pass
+        record_server_timing("embed;dur=1.5, generate;dur=20")
+    names = {s["name"]: s["depth"] for s in trace.to_dict()["spans"]}
+    assert names == {"answer": 0, "rag_query": 1, "remote.embed": 0, "remote.generate": 0}
+
+
+def test_span_outside_a_trace_is_a_no_op():
+    with span("orphan"):
+        pass
+
+
+def test_trace_reaches_spawned_tasks():
+    async def handler():
+        with start_trace("q2") as trace:
+            async def child():
+                with span("coalesced_rag"):
+                    await asyncio.sleep(0)
+
+            await asyncio.ensure_future(child())
+        return trace
+
+    assert [s["name"] for s in asyncio.run(handler()).spans] == ["coalesced_rag"]
+
+
+def test_parse_server_timing():
+    assert parse_server_timing("search;dur=2.5;desc=faiss, bad;dur=x, ") == [
+        {"name": "search", "start_ms": 0.0, "duration_ms": 2.5, "depth": 0},
+        {"name": "bad", "start_ms": 0.0, "duration_ms": 0.0, "depth": 0},
+    ]
+
+
+def test_buffer_keeps_slowest_and_recent():
+    buffer = TraceBuffer(slowest_n=2, recent_n=2)
+    for i, total in enumerate([5.0, 50.0, 1.0, 20.0]):
+        trace = Trace(f"q{i}")
+        trace.total_ms = total
+        buffer.add(trace)
+
+    assert [t["total_ms"] for t in buffer.slowest()] == [50.0, 20.0]
+    assert [t["question_id"] for t in buffer.recent()] == ["q3", "q2"]
+    assert buffer.find("q1")["total_ms"] == 50.0
+    assert buffer.find("q0") is None
+
+
+def test_profiler_samples_one_in_n():
+    profiler = SamplingProfiler(sample_rate=2)
+    sampled = []
+    for _ in range(4):
+        with profiler.maybe_profile() as on:
+            sum(range(100))
+            sampled.append(on)
+
+    assert sampled == [False, True, False, True]
+    assert "function calls" in profiler.report(5, "tottime")
+    with pytest.raises(ValueError):
+        profiler.report(5, "no-such-key")
+
+
+def test_debug_profile_rejects_unknown_sort_key():
+    client = TestClient(main.app)
+    assert client.get("/debug/profile", params={"sort": "no-such-key"}).status_code == 400
+    assert client.get("/debug/profile", params={"sort": "tottime"}).status_code == 200
+
+
+def test_chat_detects_the_language_once(monkeypatch):
+    calls = []
+    detect = main.translation_service.detect_geez_script
+
+    def counting(text):
+        calls.append(text)
+        return detect(text)
+
+    monkeypatch.setattr(main.translation_service, "detect_geez_script", counting)
+    request = ChatRequest(question=f"when is teff planted {uuid.uuid4()}", k=3)
+    response = asyncio.run(main._chat(request, "qid", None))
+
+    assert response.backend == "mock-rag"
+    assert calls == [request.question]
@@ -0,0 +1,88 @@
+import asyncio
+
+from backend.services.translation_service import (
+    OfflineBackend, TranslationBackend, TranslationService, detect_language,
+)
+
+
+class Recorder(TranslationBackend):
+    name = "recorder"
+    blocking = False
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def translate_batch(self, texts, source, target):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("backend down")
+        return [t.upper() for t in texts]
+
+
+def test_detect_language_tells_amharic_from_tigrinya():
+    assert detect_language("How do I plant teff?") == "en"
+    assert detect_language("ጤፍ እንዴት ነው የሚዘራው?") == "am"
+    assert detect_language("ጤፍ ብኸመይ እዩ ዝዝራእ?") == "ti"
+    assert detect_language("ኣብ ትግራይ ጤፍ") == "ti"
+    # Ge'ez text with no marker words defaults to Amharic
+    assert detect_language("ጤፍ") == "am"
+
+
+def test_translate_many_batches_deduplicated_misses():
+    backend = Recorder()
+    service = TranslationService(backend, cache_size=10, batch_size=2)
+    out = service.translate_many(["a", "b", "a", " ", "c"], "am", "en")
+
+    assert out == ["A", "B", "A", " ", "C"]
+    assert backend.batches == [["a", "b"], ["c"]]
+    assert service.stats()["backend_calls"] == 2
+
+
+def test_cached_segments_skip_the_backend():
+    backend = Recorder()
+    service = TranslationService(backend, cache_size=10)
+    service.translate_many(["a", "b"], "am", "en")
+    assert service.translate_many(["b", "a", "d"], "am", "en") == ["B", "A", "D"]
+    assert backend.batches == [["a", "b"], ["d"]]
+    stats = service.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 3 and stats["entries"] == 3
+
+
+def test_cache_is_bounded_and_keyed_by_direction():
+    backend = Recorder()
+    service = TranslationService(backend, cache_size=2)
+    service.translate_many(["a", "b", "c"], "am", "en")
+    assert service.stats()["entries"] == 2
+    service.translate_many(["a"], "am", "en")
+    service.translate_many(["b"], "ti", "en")
+    assert backend.batches[1:] == [["a"], ["b"]]
+
+
+def test_backend_errors_serve_source_text_uncached():
+    backend = Recorder(fail=True)
+    service = TranslationService(backend, cache_size=10)
+    assert service.translate_many(["a"], "am", "en") == ["a"]
+    assert service.translate_many(["a"], "am", "en") == ["a"]
+    assert len(backend.batches) == 2 and service.stats()["backend_errors"] == 2
+
+
+def test_translate_keeps_sentence_separators():
+    backend = Recorder()
+    service = TranslationService(backend)
+    assert service.translate("ጤፍ ይዘራል። መቼ?\nአሁን", "am", "en") == "ጤፍ ይዘራል። መቼ?\nአሁን".upper()
+    assert backend.batches == [["ጤፍ ይዘራል", "መቼ", "አሁን"]]
+    assert service.translate("same", "en", "en") == "same"
+
+
+def test_offline_backend_round_trips_the_glossary():
+    service = TranslationService(OfflineBackend(), cache_size=0)
+    local = asyncio.run(service.atranslate_from_english("Plant teff after rain.", "am"))
+    assert local == "ተክል ጤፍ after ዝናብ."
+    assert asyncio.run(service.atranslate_to_english(local)) == "plant teff after rain."
+
+
+def test_unknown_backend_falls_back_to_identity():
+    service = TranslationService("no-such-backend")
+    assert service.backend.name == "none" and service.backend_error
+    assert service.translate("ጤፍ", "am", "en") == "ጤፍ"
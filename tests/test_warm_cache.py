@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.services.cache_service import CacheService
+from backend.services.text_normalization import cache_scope, make_cache_key
+from backend.services.warm_cache import MANIFEST_KEY, CacheWarmer, mine_questions
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheService(db_path=str(tmp_path / "cache.db"))
+
+
+def _warmer(cache, answered, version="v1", scopes=None):
+    """A warmer whose pipeline caches the questions in `answered` and queues the rest."""
+    async def answer_fn(question, k, cache_key, scope):
+        if scopes is not None:
+            scopes[question] = scope
+        if question not in answered:
+            return {"response": "queued", "cached": False}
+        await cache.aset(cache_key, {"response": f"answer to {question}"})
+        return {"response": f"answer to {question}", "cached": True}
+
+    async def version_fn():
+        return version
+
+    return CacheWarmer(cache, answer_fn, version_fn, questions_fn=lambda: [], k=3, concurrency=2)
+
+
+def test_manifest_lists_only_answers_cached_by_this_run(cache):
+    stale_key = make_cache_key("offline question", 3, False)
+    cache.set(stale_key, {"response": "answer from an older corpus"})
+    warmer = _warmer(cache, answered={"fresh question", "another one"})
+
+    result = asyncio.run(warmer.warm([("fresh question", 5), ("another one", 3), ("offline question", 2)]))
+
+    assert result["cached"] == 2 and result["uncached"] == 1 and result["errors"] == 0
+    manifest = asyncio.run(warmer.manifest())
+    assert manifest["corpus_version"] == "v1"
+    assert sorted(manifest["keys"]) == sorted([make_cache_key("fresh question", 3, False),
+                                               make_cache_key("another one", 3, False)])
+    assert stale_key not in manifest["keys"]
+
+
+def test_no_manifest_when_nothing_was_cached(cache):
+    warmer = _warmer(cache, answered=set())
+    result = asyncio.run(warmer.warm([("offline question", 2)]))
+    assert result["uncached"] == 1
+    assert asyncio.run(warmer.manifest()) is None
+
+
+def test_errors_are_counted_not_listed(cache):
+    async def answer_fn(question, k, cache_key, scope):
+        raise RuntimeError("pipeline failed")
+
+    async def version_fn():
+        return "v1"
+
+    warmer = CacheWarmer(cache, answer_fn, version_fn, questions_fn=lambda: [])
+    assert asyncio.run(warmer.warm([("q", 1)]))["errors"] == 1
+    assert asyncio.run(warmer.manifest()) is None
+
+
+def test_scope_carries_the_question_language(cache):
+    scopes = {}
+    warmer = _warmer(cache, answered={"how to plant teff", "ጤፍ እንዴት ይዘራል"}, scopes=scopes)
+    asyncio.run(warmer.warm([("how to plant teff", 1), ("ጤፍ እንዴት ይዘራል", 1)]))
+
+    assert scopes["how to plant teff"] == cache_scope(3, False, "en")
+    assert scopes["ጤፍ እንዴት ይዘራል"] != cache_scope(3, False, "en")
+
+
+def test_refresh_only_when_corpus_version_changes(cache):
+    warmer = _warmer(cache, answered={"q"})
+    warmer.questions_fn = lambda: [("q", 3)]
+
+    assert asyncio.run(warmer.refresh_if_stale())
+    assert not asyncio.run(warmer.refresh_if_stale())
+
+    changed = _warmer(cache, answered={"q"}, version="v2")
+    changed.questions_fn = warmer.questions_fn
+    assert asyncio.run(changed.refresh_if_stale())
+    assert asyncio.run(changed.manifest())["corpus_version"] == "v2"
+
+
+def test_no_refresh_while_version_is_unknown(cache):
+    warmer = _warmer(cache, answered={"q"}, version=None)
+    assert not asyncio.run(warmer.refresh_if_stale())
+    assert asyncio.run(warmer.manifest()) is None
+
+
+def test_preload_counts_manifest_entries(cache):
+    warmer = _warmer(cache, answered={"a", "b"})
+    asyncio.run(warmer.warm([("a", 1), ("b", 1)]))
+    cache.memory.clear()
+
+    assert asyncio.run(warmer.preload()) == 2
+    assert cache.memory.get(make_cache_key("a", 3, False)) is not None
+    assert cache.get(MANIFEST_KEY)["keys"]
+
+
+def test_mine_questions_groups_spellings_and_pins_eval(tmp_path):
+    log = tmp_path / "query_log.jsonl"
+    log.write_text("\n".join(json.dumps({"question": q}) for q in
+                             ["What is teff?", "what is teff", "What is teff?", "rare question"]), encoding="utf-8")
+    eval_path = tmp_path / "questions.jsonl"
+    eval_path.write_text(json.dumps({"question": "Pinned question"}) + "\n", encoding="utf-8")
+
+    mined = mine_questions([str(log)], eval_path=str(eval_path), top_n=10, min_count=2)
+    assert mined[0] == ("What is teff?", 3)
+    assert ("Pinned question", 0) in mined
+    assert all(q != "rare question" for q, _ in mined)
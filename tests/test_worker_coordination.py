@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from backend.services.worker_coordination import FileLock, LeaderLock, memory_samples, process_memory
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="flock-based locks")
+
+
+def test_only_one_leader(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    first, second = LeaderLock(path), LeaderLock(path)
+
+    assert first.try_acquire() and first.held
+    assert first.try_acquire()  # already held
+    assert not second.try_acquire() and not second.held
+    with open(path, encoding="ascii") as fh:
+        assert fh.read() == str(os.getpid())
+
+    first.release()
+    assert not first.held
+    assert second.try_acquire()
+    second.release()
+
+
+def test_leadership_passes_on_when_the_holder_exits(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    child = subprocess.Popen(
+        [sys.executable, "-c",
+         "import sys; from backend.services.worker_coordination import LeaderLock; "
+         "lock = LeaderLock(sys.argv[1]); print(lock.try_acquire(), flush=True); sys.stdin.read()", path],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    try:
+        assert child.stdout.readline().strip() == "True"
+        lock = LeaderLock(path)
+        assert not lock.try_acquire()
+    finally:
+        child.stdin.close()
+        child.wait(timeout=10)
+    assert lock.try_acquire()
+    lock.release()
+
+
+def test_file_lock_is_reentrant_and_exclusive(tmp_path):
+    path = str(tmp_path / "log.lock")
+    lock, other = FileLock(path), FileLock(path)
+    with lock:
+        with lock:
+            assert not other.acquire(blocking=False)
+        assert not other.acquire(blocking=False)
+
+    assert other.acquire(blocking=False)
+    other.release()
+
+
+def test_file_lock_serializes_threads(tmp_path):
+    lock = FileLock(str(tmp_path / "log.lock"))
+    entered = threading.Event()
+    acquired = []
+
+    with lock:
+        t = threading.Thread(target=lambda: (entered.set(), acquired.append(lock.acquire(blocking=False))))
+        t.start()
+        t.join()
+    assert entered.is_set() and acquired == [False]
+    assert lock.acquire(blocking=False)
+    lock.release()
+
+
+def test_process_memory_reports_this_process():
+    mem = process_memory()
+    assert mem["pid"] == os.getpid()
+    assert mem["rss_bytes"] and mem["rss_bytes"] > 0
+    kinds = {labels["kind"] for labels, _ in memory_samples()}
+    assert "rss" in kinds